@@ -0,0 +1,22 @@
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+class PydanticJSONResponse(Response):
+    """直接把已校验的 Pydantic 模型序列化为 JSON bytes。
+
+    路由返回 Response 实例时 FastAPI 不会再按 response_model 校验/序列化一遍，
+    因此模型只在构造时校验一次，序列化由 pydantic-core 一步完成。
+    response_model 仍保留在路由上，用于生成 OpenAPI 文档。
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        if isinstance(content, bytes):
+            return content
+        raise TypeError(f"PydanticJSONResponse expects a BaseModel, got {type(content).__name__}")
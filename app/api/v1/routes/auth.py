@@ -1,11 +1,16 @@
 
+import json
+from typing import Union
+
 from fastapi import APIRouter, Request, Response, status, HTTPException, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
-from app.db.session import get_db
-from app.schemas.user import UserLogin, UserOut, UserUpdate
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.rate_limit import rate_limit
+from app.core.security import password_hasher
+from app.api.v1.responses import PydanticJSONResponse
+from app.db.session import get_async_db
+from app.schemas.user import UserLogin, UserLoginOut, UserOut, UserUpdate
 from app.services import auth as auth_service
-from app.services.user_service import get_user_by_username, update_user, delete_user
+from app.services.user_service import update_user, delete_user
 from app.services.auth import get_current_user_from_context as get_current_user, require_roles
 
 router = APIRouter()
@@ -17,55 +22,49 @@ router = APIRouter()
 @router.get("/me", response_model=UserOut)
 @require_roles(["user", "family", "volunteer", "expert", "admin"])
 async def read_users_me(current_user=Depends(get_current_user)):
-    # 敏感字段按角色脱敏示例
-    if hasattr(current_user, 'dict'):
-        user_dict = current_user.dict()
-    elif hasattr(current_user, '__dict__'):
-        user_dict = vars(current_user)
-    else:
-        user_dict = {}
-    # 只依赖 schema 校验，roles 必为 List[str]
-    if "admin" not in current_user.roles and "expert" not in current_user.roles:
-        user_dict.pop("phone", None)
-    return user_dict
+    # 直接从 ORM 对象校验一次并输出 JSON bytes；UserOut 不含 phone 等敏感字段，
+    # 按角色脱敏通过 Schema 分离实现
+    return PydanticJSONResponse(UserOut.model_validate(current_user))
 
 
 # 仅允许本人或管理员修改
 @router.put("/me", response_model=UserOut)
 @require_roles(["user", "family", "admin"])
-async def update_me(payload: UserUpdate, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def update_me(payload: UserUpdate, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
     data = payload.dict(exclude_unset=True)
     if "password" in data:
         data.pop("password")
-    user = update_user(db, current_user, data)
-    return user
+    user = await update_user(db, current_user, data)
+    return PydanticJSONResponse(UserOut.model_validate(user))
 
 
 # 仅允许本人或管理员注销
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
 @require_roles(["user", "family", "admin"])
-async def delete_me(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    delete_user(db, current_user)
+async def delete_me(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    await delete_user(db, current_user)
     return None
 
 
 # 登录接口：成功后写 session 表，Web 端 set_cookie，App 端返回 session_id
-@router.post("/login", response_model=UserOut)
-async def login(user_in: UserLogin, response: Response, request: Request):
-    user, session_id = await auth_service.login(user_in, request)
+# 限流依赖先于处理函数执行，超限请求不会触发 argon2 校验与数据库查询
+@router.post("/login", response_model=Union[UserOut, UserLoginOut], dependencies=[Depends(rate_limit("login"))])
+async def login(user_in: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)):
+    user, session_id = await auth_service.login(user_in, request, db)
     user_agent = request.headers.get("user-agent", "")
     # 简单判断：web端用cookie，app端返回session_id
     if "web" in user_agent.lower():
+        response = PydanticJSONResponse(user)
         response.set_cookie(key="session_id", value=session_id, httponly=True)
-        return user
+        return response
     else:
-        return {"user": user, "session_id": session_id}
+        return PydanticJSONResponse(UserLoginOut(user=user, session_id=session_id))
 
 
 # 登出接口：清理 session 表记录，清除 Cookie/Header
 @router.post("/logout")
-async def logout(request: Request, response: Response):
-    await auth_service.logout(request)
+async def logout(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    await auth_service.logout(request, db)
     user_agent = request.headers.get("user-agent", "")
     if "web" in user_agent.lower():
         response.delete_cookie(key="session_id")
@@ -74,24 +73,23 @@ async def logout(request: Request, response: Response):
 
 # 分角色注册接口：支持多角色、profile 创建、详细返回
 from app.services import user_service
+from app.services.directory_service import sync_skill_tags
 from app.schemas.user import UserRegisterRequest
 
-@router.post("/register", response_model=UserOut)
-async def register(user_in: UserRegisterRequest):
+@router.post("/register", response_model=UserOut, dependencies=[Depends(rate_limit("register"))])
+async def register(user_in: UserRegisterRequest, db: AsyncSession = Depends(get_async_db)):
     """
     注册接口：支持多角色注册，自动创建 profile，事务一致性，返回详细信息。
     管理员/维护人员注册拦截。
     """
-    from sqlalchemy.orm import Session
-    from app.db.session import get_db
-
-    db: Session = next(get_db())
     # 拦截管理员/维护人员注册
     if any(role in ["admin", "maintainer"] for role in user_in.roles):
         raise HTTPException(status_code=403, detail="管理员/维护人员仅允许后台创建")
+    # argon2 哈希在专用线程池中完成，避免阻塞事件循环
+    password_hash = await password_hasher.hash(user_in.password)
     try:
         # 事务开始
-        user = user_service.create_user(db, user_in)
+        user = await user_service.create_user(db, user_in, password_hash=password_hash)
         volunteer_profile = None
         expert_profile = None
         if "volunteer" in user_in.roles and user_in.volunteer_info is not None:
@@ -103,11 +101,12 @@ async def register(user_in: UserRegisterRequest):
                 phone=getattr(v, "phone", None),
                 public_email=getattr(v, "public_email", None),
                 is_public_visible=getattr(v, "is_public_visible", False),
-                skills=str(getattr(v, "skills", []) or []),
+                skills=json.dumps(getattr(v, "skills", []) or [], ensure_ascii=False),
                 status="pending",
                 work_status="offline"
             )
             db.add(volunteer_profile)
+            await sync_skill_tags(db, "volunteer", user.id, getattr(v, "skills", []))
         if "expert" in user_in.roles and user_in.expert_info is not None:
             from app.models.user import ExpertProfile
             e = user_in.expert_info
@@ -118,52 +117,27 @@ async def register(user_in: UserRegisterRequest):
                 public_email=getattr(e, "public_email", None),
                 title=getattr(e, "title", None),
                 org=getattr(e, "org", None),
-                skills=str(getattr(e, "skills", []) or []),
+                skills=json.dumps(getattr(e, "skills", []) or [], ensure_ascii=False),
                 status="pending"
             )
             db.add(expert_profile)
-        db.commit()
-        db.refresh(user)
+            await sync_skill_tags(db, "expert", user.id, getattr(e, "skills", []))
+        await db.commit()
+        await db.refresh(user)
         # 查询 profile 详细信息
         if volunteer_profile:
-            db.refresh(volunteer_profile)
+            await db.refresh(volunteer_profile)
         if expert_profile:
-            db.refresh(expert_profile)
+            await db.refresh(expert_profile)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=f"注册失败: {e}")
     
-    # 构造返回
-    from app.schemas.user import UserOut, VolunteerProfileOut, ExpertProfileOut
-    # 用 dict 构造，避免 from_orm
-    user_dict = {**user.__dict__}
-    import json
-    # 兼容 roles 字段为 JSON 字符串的情况
-    roles = user_dict.get("roles")
-    if isinstance(roles, str):
-        try:
-            user_dict["roles"] = json.loads(roles)
-        except Exception:
-            user_dict["roles"] = []
+    # 构造返回：ORM 对象直接校验一次，profile 的 skills 由 schema 解析
+    from app.schemas.user import VolunteerProfileOut, ExpertProfileOut
+    user_out = UserOut.model_validate(user)
     if volunteer_profile:
-        # 修正 skills 字段类型为 list
-        volunteer_profile_dict = dict(volunteer_profile.__dict__)
-        if isinstance(volunteer_profile_dict.get("skills"), str):
-            import json
-            try:
-                volunteer_profile_dict["skills"] = json.loads(volunteer_profile_dict["skills"])
-            except Exception:
-                volunteer_profile_dict["skills"] = []
-        user_dict["volunteer_profile"] = VolunteerProfileOut(**volunteer_profile_dict)
+        user_out.volunteer_profile = VolunteerProfileOut.model_validate(volunteer_profile)
     if expert_profile:
-        # 修正 skills 字段类型为 list
-        expert_profile_dict = dict(expert_profile.__dict__)
-        if isinstance(expert_profile_dict.get("skills"), str):
-            import json
-            try:
-                expert_profile_dict["skills"] = json.loads(expert_profile_dict["skills"])
-            except Exception:
-                expert_profile_dict["skills"] = []
-        user_dict["expert_profile"] = ExpertProfileOut(**expert_profile_dict)
-    user_out = UserOut(**user_dict)
-    return user_out
+        user_out.expert_profile = ExpertProfileOut.model_validate(expert_profile)
+    return PydanticJSONResponse(user_out)
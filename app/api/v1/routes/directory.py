@@ -0,0 +1,33 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.responses import PydanticJSONResponse
+from app.db.session import get_async_db
+from app.schemas.user import DirectoryPageOut
+from app.services.directory_service import list_directory
+
+router = APIRouter()
+
+
+# 志愿者/专家公开名录：只列出已审核通过的资料，可按技能、在线状态过滤，keyset 翻页（next_cursor 传回 cursor）
+@router.get("", response_model=DirectoryPageOut)
+async def read_directory(
+    profile_type: Literal["volunteer", "expert"] = "volunteer",
+    skill: Optional[str] = Query(None, max_length=64),
+    work_status: Optional[Literal["online", "busy", "offline"]] = None,
+    cursor: Optional[int] = Query(None, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    page = await list_directory(
+        db,
+        profile_type=profile_type,
+        skill=skill,
+        status="approved",
+        work_status=work_status,
+        cursor=cursor,
+        limit=limit,
+    )
+    return PydanticJSONResponse(DirectoryPageOut.model_validate(page))
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+
+from app.core.rate_limit import rate_limiter
+from app.db.session import pool_status
+from app.knowledge.answer_cache import answer_cache
+from app.knowledge.embedding_cache import embedding_cache
+from app.knowledge import rag_pipeline, retriever
+from app.services.auth import require_internal_access
+from app.services.presence import presence
+
+# 所有内部接口都需要 INTERNAL_API_TOKEN 或 admin 会话
+router = APIRouter(dependencies=[Depends(require_internal_access)])
+
+
+# 内部运维接口：数据库连接池状态（不出现在 OpenAPI 文档中）
+@router.get("/db/pool", include_in_schema=False)
+async def db_pool():
+    return pool_status()
+
+
+# RAG 延迟（TTFT / 总耗时）与各级缓存命中率
+@router.get("/rag", include_in_schema=False)
+async def rag_stats():
+    return {
+        "latency": rag_pipeline.rag_metrics.stats(),
+        "singleflight": rag_pipeline.inflight_answers.stats(),
+        "retrieval_stage_failures": dict(retriever.stage_failures),
+        "answer_cache": answer_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+    }
+
+
+# 志愿者在线状态：在线/忙碌人数、匹配命中与 work_status 写回情况
+@router.get("/presence", include_in_schema=False)
+async def presence_stats():
+    return presence.stats()
+
+
+# 登录/注册限流：放行与拒绝次数
+@router.get("/rate_limit", include_in_schema=False)
+async def rate_limit_stats():
+    return rate_limiter.stats()
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import registry, stats_collector
+from app.core.rate_limit import rate_limiter
+from app.core.security import password_hasher
+from app.db.session import pool_status
+from app.knowledge import rag_pipeline
+from app.knowledge.answer_cache import answer_cache
+from app.knowledge.embedding_cache import embedding_cache
+from app.services.auth import require_internal_access
+from app.services.presence import presence
+from app.services.session_cache import session_cache, session_cache_sync
+from app.services.session_reaper import session_reaper
+
+router = APIRouter()
+
+# 各模块已有的统计在抓取时读取
+registry.add_collector(stats_collector("db_pool", pool_status, label="engine"))
+registry.add_collector(stats_collector("session_cache", session_cache.stats))
+registry.add_collector(stats_collector("session_cache_sync", session_cache_sync.stats))
+registry.add_collector(stats_collector("session_reaper", session_reaper.stats))
+registry.add_collector(stats_collector("password_hasher", password_hasher.stats))
+registry.add_collector(stats_collector("rate_limit", rate_limiter.stats))
+registry.add_collector(stats_collector("presence", presence.stats))
+registry.add_collector(stats_collector("rag", rag_pipeline.rag_metrics.stats))
+registry.add_collector(stats_collector("rag_singleflight", rag_pipeline.inflight_answers.stats))
+registry.add_collector(stats_collector("answer_cache", answer_cache.stats))
+registry.add_collector(stats_collector("embedding_cache", embedding_cache.stats))
+
+
+# Prometheus 抓取接口（文本格式 0.0.4），与 /internal 一样需要 INTERNAL_API_TOKEN 或 admin 会话
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_internal_access)])
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
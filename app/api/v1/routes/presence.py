@@ -0,0 +1,69 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.responses import PydanticJSONResponse
+from app.db.session import get_async_db
+from app.models.user import VolunteerProfile
+from app.schemas.presence import HeartbeatIn, MatchOut, PresenceOut
+from app.services.auth import get_current_user_from_context as get_current_user, require_roles
+from app.services.directory_service import get_skill_tags
+from app.services.presence import OFFLINE, presence
+
+router = APIRouter()
+
+# 认领冲突（已被其它 worker 匹配）时换人重试的次数
+MATCH_ATTEMPTS = 3
+
+
+# 志愿者心跳：首次心跳（或超时离线后）才查库校验审核状态并加载技能，之后只更新内存
+@router.post("/heartbeat", response_model=PresenceOut)
+@require_roles(["volunteer"])
+async def heartbeat(payload: HeartbeatIn, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    skills = None
+    if current_user.id not in presence:
+        profile_status = await db.scalar(
+            select(VolunteerProfile.status).where(VolunteerProfile.user_id == current_user.id)
+        )
+        if profile_status != "approved":
+            raise HTTPException(status_code=403, detail="志愿者资料未通过审核")
+        skills = await get_skill_tags(db, "volunteer", current_user.id)
+    status = presence.heartbeat(current_user.id, payload.status, skills=skills)
+    return PydanticJSONResponse(PresenceOut(user_id=current_user.id, work_status=status))
+
+
+# 志愿者主动下线
+@router.post("/offline", response_model=PresenceOut)
+@require_roles(["volunteer"])
+async def go_offline(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    presence.set_offline(current_user.id)
+    return PydanticJSONResponse(PresenceOut(user_id=current_user.id, work_status=OFFLINE))
+
+
+# 为家庭匹配一名在线空闲志愿者（可按技能），被选中的志愿者置为 busy
+@router.post("/match", response_model=MatchOut)
+@require_roles(["family", "admin"])
+async def match(
+    skill: Optional[str] = Query(None, max_length=64),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    skill_key = skill.strip() if skill else None
+    for _ in range(MATCH_ATTEMPTS):
+        user_id = presence.pick(skill_key)
+        if user_id is None:
+            break
+        # 同一志愿者可能同时登记在多个 worker 中，以库中的条件更新为准
+        if await presence.claim(db, user_id):
+            return PydanticJSONResponse(MatchOut(user_id=user_id, skill=skill))
+    raise HTTPException(status_code=404, detail="暂无可用志愿者")
+
+
+# 志愿者结束服务，恢复为在线空闲
+@router.post("/release", response_model=PresenceOut)
+@require_roles(["volunteer"])
+async def release(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    presence.release(current_user.id)
+    return PydanticJSONResponse(PresenceOut(user_id=current_user.id, work_status=presence.status(current_user.id)))
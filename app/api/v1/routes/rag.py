@@ -0,0 +1,42 @@
+import json
+import logging
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_async_db
+from app.knowledge.rag_pipeline import stream_answer
+from app.schemas.rag import RAGAskIn
+from app.services.auth import get_current_user_from_context as get_current_user, require_roles
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _event_stream(query: str, top_k: int):
+    try:
+        async for event, data in stream_answer(query, top_k=top_k):
+            yield _sse(event, data)
+    except Exception:
+        logger.exception("RAG answer stream failed")
+        # 响应头已发出，无法再改状态码，以 error 事件通知前端（不透出异常细节）
+        yield _sse("error", {"detail": "回答生成失败，请稍后重试"})
+
+
+# 知识库问答：SSE 流式返回。事件顺序 sources -> token* -> done（失败时为 error）
+@router.post("/ask")
+@require_roles(["user", "family", "volunteer", "expert", "admin"])
+async def ask(payload: RAGAskIn, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    # 鉴权完成后即归还数据库连接，流式生成期间（可能数十秒）不占用连接池
+    await db.close()
+    return StreamingResponse(
+        _event_stream(payload.query, payload.top_k),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,24 +1,156 @@
+from typing import Optional, Tuple
+
+from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings
 
+_RATE_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate_limit_rule(rule: str) -> Optional[Tuple[int, float]]:
+    """"10/minute" -> (容量 10, 每秒补充 10/60)；空字符串返回 None，格式错误抛 ValueError。"""
+    rule = rule.strip()
+    if not rule:
+        return None
+    count, _, period = rule.partition("/")
+    seconds = _RATE_PERIODS.get(period.strip().lower().rstrip("s"))
+    try:
+        capacity = int(count)
+    except ValueError:
+        capacity = 0
+    if seconds is None or capacity <= 0:
+        raise ValueError(f"invalid rate limit rule: {rule!r}")
+    return capacity, capacity / seconds
+
 
 class Settings(BaseSettings):
     APP_NAME: str = "心青年智能体平台 - Backend"
     DB_URL: str = "sqlite:///./dev.db"
-    VECTOR_STORE: str = "chroma"
+    # 异步驱动 URL；留空时由 DB_URL 推导（sqlite -> aiosqlite，mysql -> aiomysql，postgresql -> asyncpg）
+    ASYNC_DB_URL: Optional[str] = None
+    # 连接池（同步/异步引擎各一套，SQLite 内存库不使用连接池参数）
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # 秒，池满时等待连接的上限
+    DB_POOL_RECYCLE: int = 1800  # 秒，超过该时长的连接在下次取出时重建
+    DB_POOL_PRE_PING: bool = True
+    # SQLite 连接参数，在每个新连接上通过 PRAGMA 设置
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # 测试模式：请求结束后仍有未归还的数据库连接时抛错
+    DB_LEAK_CHECK: bool = False
+    # 向量库后端：numpy（进程内，默认）；索引类型 auto 在条目数达到阈值后切换到 IVF
+    VECTOR_STORE: str = "numpy"
+    VECTOR_METRIC: str = "cosine"
+    VECTOR_INDEX_TYPE: str = "auto"
+    VECTOR_IVF_NLIST: int = 0  # 0 表示按 4*sqrt(n) 自动选择
+    VECTOR_IVF_NPROBE: int = 8
+    VECTOR_IVF_THRESHOLD: int = 100000
+    VECTOR_STORE_PATH: str = ""  # 非空时启动加载该目录下的索引
+    # 检查 VECTOR_STORE_PATH 下索引是否被其它进程（如导入脚本）更新的间隔，0 表示不检查
+    VECTOR_STORE_RELOAD_SECONDS: float = 5.0
+    # 向量模型：hashing 为本地特征哈希实现，不依赖外部模型
+    EMBEDDING_MODEL: str = "hashing"
+    EMBEDDING_DIM: int = 384
+    # 向量缓存：内存 LRU 条目上限；EMBEDDING_CACHE_PATH 非空时启用 SQLite 磁盘层
+    EMBEDDING_CACHE_MAXSIZE: int = 50000
+    EMBEDDING_CACHE_PATH: str = ""
+    # 知识库导入：按字符切块（块间重叠），分批计算向量
+    INGEST_CHUNK_SIZE: int = 500
+    INGEST_CHUNK_OVERLAP: int = 50
+    INGEST_BATCH_SIZE: int = 64
+    INGEST_WORKERS: int = 2
+    INGEST_MANIFEST_PATH: str = ""  # 为空时使用 VECTOR_STORE_PATH/manifest.json
+    # 已删除条目占比超过该值时在后台压缩向量库
+    VECTOR_COMPACT_THRESHOLD: float = 0.2
+    # 检索：dense / sparse（BM25）/ hybrid（两路结果按 RRF 融合，每路先取 FETCH_K 条）
+    RETRIEVAL_MODE: str = "hybrid"
+    RETRIEVAL_FETCH_K: int = 20
+    RETRIEVAL_RRF_K: int = 60
+    RETRIEVAL_STAGE_TIMEOUT_SECONDS: float = 2.0  # dense / sparse 每路检索的超时
+    # 重排：先多取 RERANK_FETCH_K 条候选，分批打分后只把前 top_k 条交给 LLM
+    # RERANK_MODEL 为 lexical（无模型）或 cross-encoder 模型名（需 sentence-transformers）
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "lexical"
+    RERANK_FETCH_K: int = 20
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_TIMEOUT_SECONDS: float = 2.0
+    # 语义答案缓存：问题向量余弦相似度不低于阈值时复用历史答案；任一容量/TTL 设为 0 即关闭
+    ANSWER_CACHE_MAXSIZE: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    # LLM：fake 为本地占位实现；openai 为任意 OpenAI 兼容的 /chat/completions 接口
+    LLM_PROVIDER: str = "fake"
+    LLM_BASE_URL: str = "https://api.openai.com/v1"
+    LLM_API_KEY: str = ""
+    LLM_MODEL: str = "gpt-4o-mini"
+    LLM_TIMEOUT_SECONDS: float = 60
+    LLM_IDLE_TIMEOUT_SECONDS: float = 30  # 流式生成中两个 token 之间的最长等待
 
     # auth settings
     SECRET_KEY: str = "dev-secret-change-me"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # argon2 参数（修改后旧哈希仍可校验，登录时不会自动重哈希）
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536  # KiB
+    ARGON2_PARALLELISM: int = 4
+    # 密码哈希线程池：工作线程数与最大排队数（超出返回 503）
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
     # session/cookie 策略
     SESSION_COOKIE_NAME: str = "session_id"
     SESSION_COOKIE_HTTPONLY: bool = True
     SESSION_COOKIE_SECURE: bool = False
     SESSION_EXPIRE_MINUTES: int = 60 * 24  # 默认 24 小时
+    # 进程内 session -> user 缓存；任一项设为 0 即关闭缓存
+    SESSION_CACHE_MAXSIZE: int = 10000
+    SESSION_CACHE_TTL_SECONDS: int = 60
+    # 多 worker 时各进程按此间隔读取 session_revocations，清除其他 worker 登出/改资料后的缓存条目
+    SESSION_CACHE_SYNC_SECONDS: float = 1.0
+    # 过期 session 后台清理
+    SESSION_REAPER_ENABLED: bool = True
+    SESSION_REAPER_INTERVAL_SECONDS: int = 300
+    SESSION_REAPER_BATCH_SIZE: int = 1000
+    # 志愿者在线状态：心跳超时、work_status 批量写回间隔与每批条数
+    PRESENCE_ENABLED: bool = True
+    PRESENCE_TTL_SECONDS: int = 90
+    PRESENCE_FLUSH_INTERVAL_SECONDS: float = 5.0
+    PRESENCE_FLUSH_BATCH_SIZE: int = 500
+    # 登录/注册限流（令牌桶），规则格式 "次数/周期"，周期为 second/minute/hour/day，空字符串不限
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN_IP: str = "30/minute"
+    RATE_LIMIT_LOGIN_USER: str = "5/minute"
+    RATE_LIMIT_REGISTER_IP: str = "10/hour"
+    # 设置后改用 Redis 存储令牌桶（多实例共享），需安装 redis
+    RATE_LIMIT_REDIS_URL: str = ""
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # 部署在反向代理之后时，按 X-Forwarded-For 第一跳识别客户端 IP
+    RATE_LIMIT_TRUST_FORWARDED: bool = False
+    # 请求延迟/SQL 统计中间件与 Prometheus /metrics 接口
+    METRICS_ENABLED: bool = True
+    # /internal/* 与 /metrics 的访问令牌（Authorization: Bearer <token>）；
+    # 未配置时只允许 admin 会话访问
+    INTERNAL_API_TOKEN: str = ""
 
     class Config:
         env_file = ".env"
 
+    @model_validator(mode="after")
+    def _check_chunking(self):
+        # 配置错误在启动时报出，而不是在导入文档时
+        if not 0 <= self.INGEST_CHUNK_OVERLAP < self.INGEST_CHUNK_SIZE:
+            raise ValueError("INGEST_CHUNK_OVERLAP must be in [0, INGEST_CHUNK_SIZE)")
+        return self
+
+    @field_validator("RATE_LIMIT_LOGIN_IP", "RATE_LIMIT_LOGIN_USER", "RATE_LIMIT_REGISTER_IP")
+    @classmethod
+    def _check_rate_limit_rule(cls, value: str) -> str:
+        # 规则写错时启动即失败，而不是每次登录/注册请求都报错
+        parse_rate_limit_rule(value)
+        return value
+
 
 settings = Settings()
@@ -0,0 +1,299 @@
+"""进程内指标与 Prometheus 文本格式导出。
+
+- Counter / Gauge / Histogram：带标签、线程安全，写入只做一次加锁累加。
+- MetricsMiddleware：按路由模板（而非实际路径，避免标签爆炸）记录请求数、延迟直方图、
+  在途请求数，以及本次请求内执行的 SQL 条数与耗时。
+- SQL 计数通过 SQLAlchemy 的 before/after_cursor_execute 事件实现，按 ContextVar
+  归属到当前请求；to_thread 与 async 引擎的 greenlet 都会继承请求的上下文。
+- 各模块已有的 stats()（session 缓存、连接池、RAG 等）以 collector 形式在抓取时读取，
+  不在请求路径上增加开销。
+"""
+
+import contextvars
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# (指标名, 类型, 说明, [(标签, 值)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            for key, value in items:
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数（非累计）, 总和, 总数]
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self, **labels) -> Optional[Dict]:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            if state is None:
+                return None
+            return {"count": state[2], "sum": state[1]}
+
+    def _render_value(self, key, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state[0]):
+            cumulative += count
+            le = 'le="' + _number(bound) + '"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_number(state[1])}")
+        lines.append(f"{self.name}_count{labels} {state[2]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """注册抓取时调用的 collector，返回 (name, type, help, [(labels, value)]) 序列。"""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    names = sorted(labels)
+                    lines.append(f"{name}{_labels(names, [labels[n] for n in names])} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def stats_collector(prefix: str, stats: Callable[[], Dict], label: Optional[str] = None) -> Callable[[], List[Family]]:
+    """把已有的 stats() 字典转成 collector：每个数值字段导出为 `{prefix}_{字段}`。
+
+    label 不为空时 stats() 返回 {标签值: 字典}（如连接池的 sync/async）。
+    非数值字段（时间戳、列表等）忽略。
+    """
+
+    def collect() -> List[Family]:
+        data = stats()
+        groups = data.items() if label else [(None, data)]
+        samples: Dict[str, List[Tuple[Dict[str, str], float]]] = {}
+        for group, values in groups:
+            labels = {label: group} if label else {}
+            for key, value in values.items():
+                if isinstance(value, (int, float)):
+                    samples.setdefault(key, []).append((labels, value))
+        return [(f"{prefix}_{key}", "gauge", f"{prefix} {key}", rows) for key, rows in samples.items()]
+
+    return collect
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency (until the response body is sent).", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being processed.", ("method",)
+)
+http_request_db_queries = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+http_request_db_seconds = registry.histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request.", ("method", "route")
+)
+db_queries_total = registry.counter("db_queries_total", "SQL statements executed.", ("engine",))
+db_query_seconds_total = registry.counter("db_query_seconds_total", "Time spent executing SQL.", ("engine",))
+
+
+class _QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_request_queries: contextvars.ContextVar[Optional[_QueryStats]] = contextvars.ContextVar("request_queries", default=None)
+
+
+def instrument_queries(engine, name: str) -> None:
+    """在同步引擎（async 引擎传 .sync_engine）上挂 SQL 计时事件。"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        db_queries_total.inc(engine=name)
+        db_query_seconds_total.inc(elapsed, engine=name)
+        stats = _request_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    # 未匹配到路由（404）的请求统一归为一类，避免任意路径产生新的时间序列
+    return path or "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status_code = 500
+        stats = _QueryStats()
+        token = _request_queries.set(stats)
+        # 在途数只按方法统计：路由要进入下游路由匹配后才能确定
+        http_requests_in_flight.inc(method=method)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_queries.reset(token)
+            http_requests_in_flight.dec(method=method)
+            route = _route_label(scope)
+            http_requests_total.inc(method=method, route=route, status=str(status_code))
+            http_request_duration_seconds.observe(elapsed, method=method, route=route)
+            http_request_db_queries.observe(stats.count, method=method, route=route)
+            http_request_db_seconds.observe(stats.seconds, method=method, route=route)
@@ -0,0 +1,190 @@
+"""令牌桶限流。
+
+登录/注册每次请求都要做 argon2 计算，撞库类突发流量会占满 CPU。
+这里以依赖项的形式在路由处理函数之前限流：依赖只读取客户端 IP 与已缓存的请求体，
+超限时直接返回 429 + Retry-After，不做任何哈希与数据库操作。
+
+- 规则写在 Settings 中，格式为 "次数/周期"（如 "10/minute"），容量即次数，
+  按周期匀速补充；空字符串表示不限。格式错误在加载配置时即报错。
+- 存储接口只有一个原子操作 consume：默认为进程内实现，多实例部署时可换成
+  RedisTokenBucketStore（同一段逻辑以 Lua 脚本在 Redis 端原子执行）。
+"""
+
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Protocol, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import parse_rate_limit_rule, settings
+
+# 规则已在 Settings 中校验，这里只缓存解析结果
+parse_rule = lru_cache(maxsize=None)(parse_rate_limit_rule)
+
+
+class TokenBucketStore(Protocol):
+    async def consume(self, key: str, capacity: int, refill_per_second: float, cost: int = 1) -> float:
+        """扣除 cost 个令牌；成功返回 0，不足时不扣除并返回需等待的秒数。"""
+        ...
+
+
+class InMemoryTokenBucketStore:
+    """进程内令牌桶，key 数量有上限（LRU 淘汰，被淘汰的 key 相当于桶已满）。"""
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (剩余令牌, 上次更新时间)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def consume(self, key: str, capacity: int, refill_per_second: float, cost: int = 1) -> float:
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - updated) * refill_per_second)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / refill_per_second
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+_REDIS_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(wait)
+"""
+
+
+class RedisTokenBucketStore:
+    """基于 redis.asyncio 客户端的令牌桶，多实例共享限额。"""
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def consume(self, key: str, capacity: int, refill_per_second: float, cost: int = 1) -> float:
+        wait = await self.client.eval(
+            _REDIS_SCRIPT, 1, self.prefix + key, capacity, refill_per_second, cost, time.time()
+        )
+        return float(wait)
+
+
+def create_store() -> TokenBucketStore:
+    if settings.RATE_LIMIT_REDIS_URL:
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:  # pragma: no cover - 可选依赖
+            raise RuntimeError("RATE_LIMIT_REDIS_URL requires the redis package") from exc
+        return RedisTokenBucketStore(redis.from_url(settings.RATE_LIMIT_REDIS_URL))
+    return InMemoryTokenBucketStore(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else ""
+
+
+class RateLimiter:
+    def __init__(self, store: Optional[TokenBucketStore] = None):
+        self._store = store
+        self.allowed = 0
+        self.rejected: Dict[str, int] = {}
+
+    @property
+    def store(self) -> TokenBucketStore:
+        if self._store is None:
+            self._store = create_store()
+        return self._store
+
+    @store.setter
+    def store(self, store: TokenBucketStore) -> None:
+        self._store = store
+
+    async def hit(self, name: str, rule: str, identity: str) -> None:
+        """按规则扣一个令牌，超限抛 429。"""
+        parsed = parse_rule(rule)
+        if parsed is None or not identity:
+            return
+        capacity, refill = parsed
+        wait = await self.store.consume(f"{name}:{identity}", capacity, refill)
+        if wait > 0:
+            self.rejected[name] = self.rejected.get(name, 0) + 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="请求过于频繁，请稍后再试",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+        self.allowed += 1
+
+    def stats(self) -> Dict:
+        return {
+            "allowed": self.allowed,
+            "rejected": dict(self.rejected),
+            "keys": len(self._store) if isinstance(self._store, InMemoryTokenBucketStore) else None,
+        }
+
+
+rate_limiter = RateLimiter()
+
+
+async def _username(request: Request) -> str:
+    # FastAPI 已在解析依赖前读取并缓存请求体，这里不会再次读网络
+    try:
+        payload = json.loads(await request.body() or b"{}")
+    except ValueError:
+        return ""
+    username = payload.get("username") if isinstance(payload, dict) else None
+    if not isinstance(username, str) or not username:
+        return ""
+    # 只以摘要作为 key，存储中不保留明文用户名
+    return hashlib.sha1(username.strip().lower().encode("utf-8")).hexdigest()
+
+
+def rate_limit(route: str):
+    """路由级限流依赖：按 IP 限流，登录接口额外按用户名限流。
+
+    规则在请求时读取 Settings，`RATE_LIMIT_{ROUTE}_IP` / `RATE_LIMIT_{ROUTE}_USER`。
+    """
+    route = route.upper()
+
+    async def dependency(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        ip_rule = getattr(settings, f"RATE_LIMIT_{route}_IP", "")
+        await rate_limiter.hit(f"{route.lower()}:ip", ip_rule, client_ip(request))
+        user_rule = getattr(settings, f"RATE_LIMIT_{route}_USER", "")
+        if user_rule:
+            await rate_limiter.hit(f"{route.lower()}:user", user_rule, await _username(request))
+
+    return dependency
@@ -0,0 +1,40 @@
+"""测试模式下的数据库连接泄漏检测。
+
+ASGI 中间件：请求（含依赖的清理阶段）结束后，如果没有其它并发请求仍在处理，
+两个引擎的连接池中就不应再有被占用的连接；否则说明该请求没有正确关闭 session。
+仅在 Settings.DB_LEAK_CHECK 开启时挂载（测试环境），生产环境不启用。
+"""
+
+import threading
+
+from app.db.session import checked_out_connections
+
+
+class ConnectionLeakError(RuntimeError):
+    pass
+
+
+class ConnectionLeakMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with self._lock:
+            self._in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                idle = self._in_flight == 0
+        if idle:
+            leaked = checked_out_connections()
+            if any(leaked.values()):
+                raise ConnectionLeakError(
+                    f"{scope['method']} {scope['path']} 结束后仍有未归还的数据库连接：{leaked}"
+                )
@@ -0,0 +1,65 @@
+"""启动时执行的轻量 schema 迁移。
+
+create_all 只建新表，不会给已存在的表加列；这里补齐后续加入的列并回填数据，
+每一步都先检查当前 schema，可重复执行。
+"""
+
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+def _add_roles_mask(engine: Engine) -> None:
+    """users.roles_mask：加列后按 roles 回填位掩码。"""
+    from app.models.user import normalize_roles, roles_to_mask
+
+    inspector = inspect(engine)
+    if not inspector.has_table("users"):
+        return
+    if "roles_mask" in {c["name"] for c in inspector.get_columns("users")}:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE users ADD COLUMN roles_mask BIGINT NOT NULL DEFAULT 0"))
+        updates = []
+        for user_id, roles in conn.execute(text("SELECT id, roles FROM users")):
+            # 无法解析的历史 roles 由 normalize_roles 按无角色处理，与 require_roles 的判定一致
+            mask = roles_to_mask(normalize_roles(roles))
+            if mask:
+                updates.append({"id": user_id, "mask": mask})
+        if updates:
+            conn.execute(text("UPDATE users SET roles_mask = :mask WHERE id = :id"), updates)
+    logger.info("added users.roles_mask and backfilled %d users", len(updates))
+
+
+def _add_presence_lease(engine: Engine) -> None:
+    """volunteer_profiles.presence_owner / presence_expires_at：可为空，无需回填。"""
+    from app.models.user import VolunteerProfile
+
+    inspector = inspect(engine)
+    if not inspector.has_table("volunteer_profiles"):
+        return
+    existing = {c["name"] for c in inspector.get_columns("volunteer_profiles")}
+    columns = [
+        VolunteerProfile.__table__.c[name]
+        for name in ("presence_owner", "presence_expires_at")
+        if name not in existing
+    ]
+    if not columns:
+        return
+    with engine.begin() as conn:
+        for column in columns:
+            # 列类型按当前方言编译（如 DateTime 在 PostgreSQL 上为 TIMESTAMP）
+            ddl = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE volunteer_profiles ADD COLUMN {column.name} {ddl}"))
+    logger.info("added volunteer_profiles presence lease columns")
+
+
+MIGRATIONS = [_add_roles_mask, _add_presence_lease]
+
+
+def run_migrations(engine: Engine) -> None:
+    for migration in MIGRATIONS:
+        migration(engine)
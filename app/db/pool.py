@@ -0,0 +1,140 @@
+"""连接池配置与统计。
+
+- 由 Settings 生成连接池参数（SQLite 内存库不使用 QueuePool，跳过池参数）。
+- SQLite 在建立连接时设置 WAL / synchronous / busy_timeout。
+- 统计 checkout/checkin 次数、当前占用与溢出连接数，以及从池中取连接的等待时间。
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+
+class PoolStats:
+    """单个引擎的连接池计数器。"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_seconds_total += seconds
+            if seconds > self.wait_seconds_max:
+                self.wait_seconds_max = seconds
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        # 非 QueuePool（如 SQLite 内存库的 StaticPool）没有这些方法
+        def call(name):
+            fn = getattr(pool, name, None)
+            return fn() if callable(fn) else None
+
+        return {
+            "pool_class": type(pool).__name__,
+            "size": call("size"),
+            "checked_in": call("checkedin"),
+            "checked_out": call("checkedout"),
+            "overflow": call("overflow"),
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "wait_count": self.wait_count,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_avg": self.wait_seconds_total / self.wait_count if self.wait_count else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+
+class _TimedPoolMixin:
+    """记录每次从池中取连接（可能因池满而阻塞）的耗时。"""
+
+    stats: PoolStats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - started)
+
+    def recreate(self):
+        # dispose() 会重建连接池，统计对象需要跟随
+        new_pool = super().recreate()
+        new_pool.stats = self.stats
+        return new_pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """create_engine / create_async_engine 的连接池参数。"""
+    if _is_sqlite_memory(url):
+        return {}
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        if settings.SQLITE_JOURNAL_MODE:
+            cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        if settings.SQLITE_SYNCHRONOUS:
+            cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    finally:
+        cursor.close()
+
+
+def instrument_engine(engine: Engine, name: str) -> PoolStats:
+    """为（同步）引擎注册 SQLite 调优与连接池统计；异步引擎传入 async_engine.sync_engine。"""
+    stats = PoolStats(name)
+    engine.pool.stats = stats
+    url = engine.url
+    if url.get_backend_name() == "sqlite" and not _is_sqlite_memory(url.render_as_string()):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+
+    return stats
@@ -1,10 +1,68 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import instrument_queries
+from app.db.pool import engine_options, instrument_engine
 
-engine = create_engine(settings.DB_URL, future=True)
+# 同步驱动 -> 异步驱动
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """由同步 DB_URL 推导异步驱动 URL；已是异步驱动或未知驱动时原样返回。"""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+engine = create_engine(settings.DB_URL, future=True, **engine_options(settings.DB_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎：供 async 路由使用，避免在事件循环中执行阻塞的数据库调用
+ASYNC_DB_URL = settings.ASYNC_DB_URL or to_async_url(settings.DB_URL)
+try:
+    async_engine = create_async_engine(ASYNC_DB_URL, **engine_options(ASYNC_DB_URL, is_async=True))
+except ModuleNotFoundError as exc:
+    raise RuntimeError(
+        f"异步数据库驱动 {exc.name!r} 未安装（ASYNC_DB_URL={make_url(ASYNC_DB_URL).drivername}）。"
+        "请安装对应的可选依赖（pip install '.[mysql]' 或 '.[postgresql]'），"
+        "或通过 ASYNC_DB_URL 显式指定已安装的异步驱动。"
+    ) from exc
+# expire_on_commit=False：提交后仍可直接读取对象属性，避免在 async 场景下触发隐式懒加载
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+sync_pool_stats = instrument_engine(engine, "sync")
+async_pool_stats = instrument_engine(async_engine.sync_engine, "async")
+# SQL 条数与耗时，按请求归集到 /metrics
+instrument_queries(engine, "sync")
+instrument_queries(async_engine.sync_engine, "async")
+
+
+def pool_status():
+    """两个引擎的连接池状态与累计统计。"""
+    return {
+        "sync": sync_pool_stats.snapshot(engine.pool),
+        "async": async_pool_stats.snapshot(async_engine.sync_engine.pool),
+    }
+
+
+def checked_out_connections():
+    """当前被占用（未归还连接池）的连接数。"""
+    return {
+        "sync": engine.pool.checkedout() if hasattr(engine.pool, "checkedout") else 0,
+        "async": async_engine.sync_engine.pool.checkedout() if hasattr(async_engine.sync_engine.pool, "checkedout") else 0,
+    }
+
 
 def get_db():
     db = SessionLocal()
@@ -14,12 +72,19 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
-    # attempt to import models to ensure metadata is registered
-    try:
-        from app.models import Base
+    from app.db.migrations import run_migrations
+    from app.models import Base
 
-        Base.metadata.create_all(bind=engine)
-    except Exception:
-        # if no models defined yet, ignore
-        pass
+    Base.metadata.create_all(bind=engine)
+    # create_all 不会给已存在的表加列，先迁移再补索引（索引可能建在新列上）
+    run_migrations(engine)
+    # create_all 不会给已存在的表补建索引，这里逐个补齐
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,103 @@
+"""语义答案缓存。
+
+家长的提问大量重复或只有措辞差异：把问题向量与历史问题做余弦比对，
+相似度不低于阈值且未过期时直接返回历史答案，跳过检索和 LLM 调用。
+
+- 条目存放在固定容量的环形矩阵中（满了覆盖最早的条目），查找为一次矩阵-向量乘法。
+- 知识库重新导入后调用 invalidate()：代数（generation）加一，旧代条目全部失效。
+- 导入脚本在另一个进程中运行时 invalidate() 无法通知服务进程，因此条目还记录写入时的
+  知识库版本（见 vectorstore.knowledge_version，含磁盘上索引的代标识），查找时版本不同即不命中。
+"""
+
+import threading
+import time
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class SemanticAnswerCache:
+    def __init__(self, maxsize: int = 1000, ttl_seconds: float = 3600, threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.generation = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._entries = [None] * maxsize  # (deadline, generation, version, top_k, answer)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, query_vector, top_k: int, version: Hashable = None) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        query = self._normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            if self._count == 0 or self._vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+            scores = self._vectors[: self._count] @ query
+            # 从最相似的开始检查，跳过过期、旧代、知识库版本或 top_k 不同的条目
+            for slot in np.argsort(-scores).tolist():
+                if scores[slot] < self.threshold:
+                    break
+                deadline, generation, entry_version, entry_top_k, answer = self._entries[slot]
+                if deadline > now and generation == self.generation and entry_version == version and entry_top_k == top_k:
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def set(self, query_vector, top_k: int, answer: Dict, version: Hashable = None) -> None:
+        if not self.enabled:
+            return
+        query = self._normalize(query_vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self._vectors = np.zeros((self.maxsize, query.shape[0]), dtype=np.float32)
+                self._next = self._count = 0
+            slot = self._next
+            self._vectors[slot] = query
+            self._entries[slot] = (time.time() + self.ttl_seconds, self.generation, version, top_k, answer)
+            self._next = (slot + 1) % self.maxsize
+            self._count = min(self._count + 1, self.maxsize)
+
+    def invalidate(self) -> None:
+        """知识库内容变化后调用，之前缓存的答案全部作废。"""
+        with self._lock:
+            self.generation += 1
+            self._next = self._count = 0
+            self._entries = [None] * self.maxsize
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._count,
+            "maxsize": self.maxsize,
+            "generation": self.generation,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+answer_cache = SemanticAnswerCache(
+    maxsize=settings.ANSWER_CACHE_MAXSIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+)
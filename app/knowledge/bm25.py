@@ -0,0 +1,131 @@
+"""BM25 稀疏检索：紧凑的内存倒排索引。
+
+- 词表：term -> term_id；每个 term 的倒排表为两条 array('I')（文档行号、词频），
+  追加写入无需重排，检索时用 np.frombuffer 零拷贝转成 NumPy 向量化打分。
+- 文档删除只打标记，死文档过半时 compact() 过滤倒排表并重排行号。
+- 分词复用 tokenizer.tokenize（中文单字 + 二元组，英文按词）。
+"""
+
+import math
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.knowledge.tokenizer import tokenize
+
+_UINT = np.dtype(np.uintc)
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._term_ids: Dict[str, int] = {}
+        self._post_rows: List[array] = []
+        self._post_tfs: List[array] = []
+        self._doc_ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._live = bytearray()
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    @property
+    def dead_count(self) -> int:
+        return len(self._doc_ids) - len(self._rows)
+
+    def add(self, doc_id: str, text: str) -> None:
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self.remove(doc_id)
+            row = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._rows[doc_id] = row
+            length = sum(counts.values())
+            self._lengths.append(length)
+            self._live.append(1)
+            self._total_length += length
+            for term, tf in counts.items():
+                term_id = self._term_ids.get(term)
+                if term_id is None:
+                    term_id = self._term_ids[term] = len(self._post_rows)
+                    self._post_rows.append(array("I"))
+                    self._post_tfs.append(array("I"))
+                self._post_rows[term_id].append(row)
+                self._post_tfs[term_id].append(tf)
+
+    def remove(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._rows.pop(doc_id, None)
+            if row is None:
+                return False
+            self._live[row] = 0
+            self._doc_ids[row] = None
+            self._total_length -= self._lengths[row]
+            return True
+
+    def compact(self) -> int:
+        """从倒排表中去掉已删除文档并重排行号，返回回收的文档数。"""
+        with self._lock:
+            dead = self.dead_count
+            if not dead:
+                return 0
+            live = np.frombuffer(self._live, dtype=bool).copy()
+            remap = np.cumsum(live, dtype=np.int64) - 1
+            for term_id in range(len(self._post_rows)):
+                rows = np.frombuffer(self._post_rows[term_id], dtype=_UINT)
+                tfs = np.frombuffer(self._post_tfs[term_id], dtype=_UINT)
+                keep = live[rows]
+                new_rows = array("I", remap[rows[keep]].astype(_UINT).tobytes())
+                new_tfs = array("I", tfs[keep].tobytes())
+                del rows, tfs
+                self._post_rows[term_id] = new_rows
+                self._post_tfs[term_id] = new_tfs
+            lengths = np.frombuffer(self._lengths, dtype=_UINT)[live]
+            self._lengths = array("I", lengths.tobytes())
+            self._doc_ids = [doc_id for doc_id in self._doc_ids if doc_id is not None]
+            self._rows = {doc_id: row for row, doc_id in enumerate(self._doc_ids)}
+            self._live = bytearray(b"\x01" * len(self._doc_ids))
+            return dead
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        with self._lock:
+            n_live = len(self._rows)
+            term_ids = [self._term_ids[t] for t in terms if t in self._term_ids]
+            if not n_live or not term_ids or top_k <= 0:
+                return []
+            # frombuffer 视图只在持锁期间存在；array 有导出的 buffer 时不能扩容
+            live = np.frombuffer(self._live, dtype=bool)
+            lengths = np.frombuffer(self._lengths, dtype=_UINT).astype(np.float32)
+            avgdl = self._total_length / n_live or 1.0
+            norm = self.k1 * (1 - self.b + self.b * lengths / avgdl)
+            scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+            rows = None
+            for term_id in term_ids:
+                rows = np.frombuffer(self._post_rows[term_id], dtype=_UINT)
+                tfs = np.frombuffer(self._post_tfs[term_id], dtype=_UINT).astype(np.float32)
+                df = int(live[rows].sum())
+                if not df:
+                    continue
+                idf = math.log(1 + (n_live - df + 0.5) / (df + 0.5))
+                # 同一 term 的倒排表中行号不重复，可直接按下标累加
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+            scores[~live] = 0
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > top_k:
+                part = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                candidates = candidates[part]
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+            result = [(self._doc_ids[row], float(scores[row])) for row in order.tolist()]
+            del live, rows
+            return result
@@ -0,0 +1,152 @@
+"""文本向量缓存。
+
+key 为 (model_id, 归一化文本的 sha1)：NFKC 归一化并压缩空白后再哈希，
+写法上的细微差异（全角/半角、多余空格）共用同一条缓存。
+两级缓存：进程内 LRU（热数据）+ 可选 SQLite 文件（跨进程、跨重启复用），
+未命中的文本在一次 embed 调用中批量计算后回填两级缓存。
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def text_key(text: str) -> str:
+    normalized = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, maxsize: int = 50000, path: Optional[str] = None):
+        self.maxsize = maxsize
+        self.path = path
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, key))"
+            )
+            self._db.commit()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_many(self, model_id: str, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """返回命中的 key -> 向量；未命中的 key 不在结果中。"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._entries.get((model_id, key))
+                if vector is None:
+                    missing.append(key)
+                else:
+                    self._entries.move_to_end((model_id, key))
+                    found[key] = vector
+            self.hits += len(keys) - len(missing)
+            if missing and self._db is not None:
+                unique = list(dict.fromkeys(missing))
+                for start in range(0, len(unique), 500):
+                    part = unique[start : start + 500]
+                    rows = self._db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(part))})",
+                        [model_id, *part],
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        found[key] = vector
+                        self._remember((model_id, key), vector)
+                still_missing = [key for key in missing if key not in found]
+                self.disk_hits += len(missing) - len(still_missing)
+                missing = still_missing
+            self.misses += len(missing)
+        return found
+
+    def set_many(self, model_id: str, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, vector in items.items():
+                self._remember((model_id, key), np.asarray(vector, dtype=np.float32))
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                    [(model_id, key, np.asarray(v, dtype=np.float32).tobytes()) for key, v in items.items()],
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class CachedEmbedder:
+    """包装任意 Embedder：先查缓存，只对未命中的文本调用底层模型。"""
+
+    def __init__(self, embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+        self.model_id = embedder.model_id
+        self.dim = embedder.dim
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [text_key(t) for t in texts]
+        found = self.cache.get_many(self.model_id, keys)
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+        if pending:
+            computed = self.embedder.embed(list(pending.values()))
+            fresh = dict(zip(pending.keys(), computed))
+            self.cache.set_many(self.model_id, fresh)
+            found.update(fresh)
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            out[i] = found[key]
+        return out
+
+
+embedding_cache = EmbeddingCache(
+    maxsize=settings.EMBEDDING_CACHE_MAXSIZE,
+    path=settings.EMBEDDING_CACHE_PATH or None,
+)
@@ -0,0 +1,72 @@
+"""文本向量化。
+
+Embedder 协议：model_id 标识模型（用于缓存键），dim 为向量维度，
+embed(texts) 返回 (len(texts), dim) 的 float32 矩阵。
+默认的 HashingEmbedder 用特征哈希把分词结果映射到固定维度，无需下载模型，
+适合开发、测试和小规模部署；接入真实模型时实现同一协议即可。
+"""
+
+import zlib
+from typing import Dict, Optional, Protocol, Sequence, Type
+
+import numpy as np
+
+from app.core.config import settings
+from app.knowledge.embedding_cache import CachedEmbedder, embedding_cache
+from app.knowledge.tokenizer import tokenize
+
+
+class Embedder(Protocol):
+    model_id: str
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class HashingEmbedder:
+    """特征哈希向量：每个 token 按 crc32 落到一个维度，并用另一位决定正负号。"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model_id = f"hashing-{dim}"
+
+    def _embed_one(self, text: str, out: np.ndarray) -> None:
+        tokens = tokenize(text)
+        if not tokens:
+            return
+        hashes = np.fromiter((zlib.crc32(t.encode("utf-8")) for t in tokens), dtype=np.uint64, count=len(tokens))
+        index = (hashes % self.dim).astype(np.int64)
+        sign = np.where((hashes >> 31) & 1, -1.0, 1.0).astype(np.float32)
+        np.add.at(out, index, sign)
+        norm = np.linalg.norm(out)
+        if norm:
+            out /= norm
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            self._embed_one(text, vectors[i])
+        return vectors
+
+
+_EMBEDDERS: Dict[str, Type] = {"hashing": HashingEmbedder}
+
+
+def create_embedder(model: Optional[str] = None) -> Embedder:
+    name = (model or settings.EMBEDDING_MODEL).lower()
+    cls = _EMBEDDERS.get(name)
+    if cls is None:
+        raise ValueError(f"unsupported EMBEDDING_MODEL: {name!r}")
+    return cls(dim=settings.EMBEDDING_DIM)
+
+
+_default_embedder: Optional[Embedder] = None
+
+
+def get_embedder() -> Embedder:
+    """进程内共享的默认 Embedder，外层套向量缓存。"""
+    global _default_embedder
+    if _default_embedder is None:
+        _default_embedder = CachedEmbedder(create_embedder(), embedding_cache)
+    return _default_embedder
@@ -1,17 +1,372 @@
-"""Placeholder for knowledge ingestion utilities.
+"""Knowledge ingestion pipeline.
 
-Functions to add:
-- load files (markdown, html, txt)
-- chunk/split text
-- compute embeddings and add to vectorstore
+Documents flow through generators end to end so memory stays bounded:
+
+    iter_documents (md/html/txt, one file at a time)
+      -> iter_chunks (overlapping chunks, content-hash ids)
+      -> batched (INGEST_BATCH_SIZE)
+      -> embed in a thread pool (at most 2 * INGEST_WORKERS batches in flight)
+      -> vector store
+
+Chunk ids are ``<doc_id>:<sha1(chunk)[:16]>``; chunks already present in the
+store are skipped before embedding, so re-ingesting an unchanged file is a no-op.
+
+With an ``IngestManifest`` the refresh is incremental: unchanged documents are
+skipped before chunking, stale chunks of changed documents are tombstoned, and
+(with ``prune=True``) documents missing from the input are removed. Compaction
+of tombstones runs in a background thread.
+
+    python -m app.knowledge.ingest docs/knowledge --store data/vectors
 """
 
-from typing import Iterable
+import argparse
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from app.core.config import settings
+from app.knowledge.answer_cache import answer_cache
+from app.knowledge.embeddings import Embedder, get_embedder
+from app.knowledge.manifest import IngestManifest, default_manifest_path
+from app.knowledge.vectorstore import VectorStore, create_vector_store, get_vector_store
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_SUFFIXES = (".md", ".markdown", ".html", ".htm", ".txt")
+# 切块时优先在这些字符之后断开
+_BOUNDARY_CHARS = "\n。！？!?；;."
+
+
+@dataclass
+class Document:
+    doc_id: str
+    text: str
+    source: str = ""
+    metadata: Dict = field(default_factory=dict)
+
+
+@dataclass
+class Chunk:
+    chunk_id: str
+    doc_id: str
+    text: str
+    index: int
+    metadata: Dict = field(default_factory=dict)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# ---------- 加载 ----------
+
+
+class _HTMLTextExtractor(HTMLParser):
+    _SKIP = {"script", "style", "noscript"}
+    _BLOCK = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    parser = _HTMLTextExtractor()
+    parser.feed(html)
+    parser.close()
+    return _normalize_whitespace("".join(parser.parts))
+
+
+_MD_PATTERNS = [
+    (re.compile(r"```[^\n]*\n"), ""),  # 代码块围栏（保留代码内容）
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),  # 图片
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),  # 链接
+    (re.compile(r"^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+", re.M), ""),  # 标题、引用、列表标记
+    (re.compile(r"(\*\*|__|\*|_|`)"), ""),  # 强调与行内代码
+]
+
+
+def markdown_to_text(markdown: str) -> str:
+    for pattern, repl in _MD_PATTERNS:
+        markdown = pattern.sub(repl, markdown)
+    return _normalize_whitespace(markdown)
+
+
+def _normalize_whitespace(text: str) -> str:
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    return re.sub(r"\s*\n\s*(\n\s*)*", "\n", text).strip()
+
+
+def load_document(path: str, base_dir: Optional[str] = None) -> Document:
+    """读取单个文件；doc_id 为相对 base_dir 的路径（统一用 / 分隔）。"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in (".html", ".htm"):
+        text = html_to_text(raw)
+    elif suffix in (".md", ".markdown"):
+        text = markdown_to_text(raw)
+    else:
+        text = _normalize_whitespace(raw)
+    doc_id = os.path.relpath(path, base_dir) if base_dir else path
+    return Document(doc_id=doc_id.replace(os.sep, "/"), text=text, source=path)
+
+
+def iter_documents(paths: Union[str, Iterable[str]]) -> Iterator[Document]:
+    """逐个产出文件/目录（递归）中受支持的文档，不会一次性读入全部内容。"""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        path = os.fspath(path)
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SUPPORTED_SUFFIXES):
+                        yield load_document(os.path.join(root, name), base_dir=path)
+        elif path.lower().endswith(SUPPORTED_SUFFIXES):
+            yield load_document(path, base_dir=os.path.dirname(path) or None)
+
+
+# ---------- 切块 ----------
+
+
+def chunk_text(text: str, chunk_size: int = None, overlap: int = None) -> Iterator[str]:
+    """按字符滑动窗口切块，窗口末尾 20% 范围内有句子边界时在边界处断开。"""
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    overlap = settings.INGEST_CHUNK_OVERLAP if overlap is None else overlap
+    # 在调用时立即校验，而不是等到首次迭代
+    if overlap < 0 or overlap >= chunk_size:
+        raise ValueError("chunk overlap must be in [0, chunk size)")
+    return _sliding_chunks(text, chunk_size, overlap)
+
+
+def _sliding_chunks(text: str, chunk_size: int, overlap: int) -> Iterator[str]:
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            floor = start + int(chunk_size * 0.8)
+            cut = max(text.rfind(ch, floor, end) for ch in _BOUNDARY_CHARS)
+            if cut >= floor:
+                end = cut + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+        if end >= length:
+            break
+        # 在句子边界提前断开时 end - overlap 可能不前进，至少推进一个字符
+        start = max(end - overlap, start + 1)
+
+
+def iter_chunks(documents: Iterable[Document], chunk_size: int = None, overlap: int = None) -> Iterator[Chunk]:
+    for doc in documents:
+        for index, text in enumerate(chunk_text(doc.text, chunk_size, overlap)):
+            yield Chunk(
+                chunk_id=f"{doc.doc_id}:{content_hash(text)[:16]}",
+                doc_id=doc.doc_id,
+                text=text,
+                index=index,
+                metadata={**doc.metadata, "doc_id": doc.doc_id, "source": doc.source, "chunk_index": index},
+            )
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------- 导入 ----------
+
+
+def _as_document(item: Union[str, Document]) -> Document:
+    if isinstance(item, Document):
+        return item
+    # 纯文本：以内容哈希作为 doc_id
+    return Document(doc_id=f"text-{content_hash(item)[:16]}", text=item)
+
+
+_compaction_lock = threading.Lock()
+_compaction_thread: Optional[threading.Thread] = None
+
+
+def schedule_compaction(store: VectorStore) -> bool:
+    """在后台线程压缩向量库；已有压缩在进行时返回 False。"""
+    global _compaction_thread
+    if not _compaction_lock.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            removed = store.compact()
+            logger.info("vector store compacted: %d tombstones removed", removed)
+        except Exception:
+            logger.exception("vector store compaction failed")
+        finally:
+            _compaction_lock.release()
+
+    _compaction_thread = threading.Thread(target=run, name="vector-compact", daemon=True)
+    _compaction_thread.start()
+    return True
+
+
+def wait_for_compaction(timeout: Optional[float] = None) -> None:
+    if _compaction_thread is not None:
+        _compaction_thread.join(timeout)
+
+
+def ingest_documents(
+    docs: Iterable[Union[str, Document]],
+    store: Optional[VectorStore] = None,
+    embedder: Optional[Embedder] = None,
+    batch_size: int = None,
+    workers: int = None,
+    manifest: Optional[IngestManifest] = None,
+    prune: bool = False,
+    persist_path: Optional[str] = None,
+) -> Dict:
+    """把文档流切块、分批向量化并写入向量库，返回各阶段计数。
+
+    docs 可以是纯文本或 Document（文件请先经过 iter_documents / ingest_paths）。
+    传入 manifest 时做增量导入；prune=True 时删除本次输入中不存在的文档。
+    传入 persist_path 时先把向量库写入该目录，成功后才保存清单，
+    避免持久化失败时清单记录了磁盘上并不存在的 chunk。
+    """
+    store = store if store is not None else get_vector_store()
+    embedder = embedder or get_embedder()
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    workers = workers or settings.INGEST_WORKERS
+    stats = {
+        "ingested": 0,
+        "unchanged": 0,
+        "chunks": 0,
+        "embedded": 0,
+        "skipped": 0,
+        "deleted": 0,
+        "removed_docs": 0,
+        "compacting": False,
+    }
+    seen_docs = set()
+
+    def new_chunks():
+        seen = set()
+        for item in docs:
+            doc = _as_document(item)
+            stats["ingested"] += 1
+            seen_docs.add(doc.doc_id)
+            doc_hash = content_hash(doc.text)
+            if manifest is not None and manifest.doc_hash(doc.doc_id) == doc_hash:
+                stats["unchanged"] += 1
+                continue
+            # 单个文档的 chunk 列表常驻内存，整体流程仍按文档流式处理
+            doc_chunks = list(iter_chunks([doc]))
+            if manifest is not None:
+                chunk_ids = [c.chunk_id for c in doc_chunks]
+                stale = set(manifest.chunk_ids(doc.doc_id)) - set(chunk_ids)
+                stats["deleted"] += store.delete(sorted(stale))
+                manifest.update(doc.doc_id, doc_hash, chunk_ids)
+            for chunk in doc_chunks:
+                stats["chunks"] += 1
+                if chunk.chunk_id in seen or chunk.chunk_id in store:
+                    stats["skipped"] += 1
+                    continue
+                seen.add(chunk.chunk_id)
+                yield chunk
+
+    def embed(batch: Sequence[Chunk]):
+        return batch, embedder.embed([c.text for c in batch])
+
+    def flush(future):
+        batch, vectors = future.result()
+        store.add_documents([c.chunk_id for c in batch], vectors, [c.metadata for c in batch], [c.text for c in batch])
+        stats["embedded"] += len(batch)
+
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+        for batch in batched(new_chunks(), batch_size):
+            in_flight.append(executor.submit(embed, batch))
+            # 限制同时在内存中的批次数，按提交顺序写入向量库
+            if len(in_flight) >= workers * 2:
+                flush(in_flight.popleft())
+        while in_flight:
+            flush(in_flight.popleft())
+
+    if manifest is not None:
+        if prune:
+            for doc_id in manifest:
+                if doc_id not in seen_docs:
+                    stats["deleted"] += store.delete(manifest.remove(doc_id))
+                    stats["removed_docs"] += 1
+    if stats["embedded"] or stats["deleted"]:
+        # 知识库内容有变化，之前缓存的答案可能已过时
+        answer_cache.invalidate()
+    if persist_path:
+        # persist 会先压缩掉墓碑，不需要再安排后台压缩
+        store.persist(persist_path)
+    elif stats["deleted"] and store.tombstone_ratio > settings.VECTOR_COMPACT_THRESHOLD:
+        stats["compacting"] = schedule_compaction(store)
+    if manifest is not None:
+        manifest.save()
+    return stats
+
+
+def ingest_paths(paths: Union[str, Iterable[str]], **kwargs) -> Dict:
+    """导入文件或目录下的全部 md/html/txt 文档。"""
+    return ingest_documents(iter_documents(paths), **kwargs)
+
+
+def sync_paths(paths: Union[str, Iterable[str]], manifest: Optional[IngestManifest] = None, **kwargs) -> Dict:
+    """按清单增量同步：只处理新增/变化的文档，并删除源目录中已不存在的文档。"""
+    manifest = manifest if manifest is not None else IngestManifest(default_manifest_path())
+    return ingest_documents(iter_documents(paths), manifest=manifest, prune=True, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="增量导入知识库文档（md/html/txt）到向量库")
+    parser.add_argument("paths", nargs="+", help="文件或目录")
+    parser.add_argument("--store", default=settings.VECTOR_STORE_PATH, help="向量库目录（默认 VECTOR_STORE_PATH）")
+    parser.add_argument("--manifest", default=None, help="清单路径（默认 <store>/manifest.json）")
+    args = parser.parse_args(argv)
+    if not args.store:
+        parser.error("--store is required when VECTOR_STORE_PATH is not set")
+
+    store = create_vector_store()
+    if os.path.exists(os.path.join(args.store, "meta.json")):
+        store = type(store).load(args.store)
+    manifest = IngestManifest(args.manifest or os.path.join(args.store, "manifest.json"))
+    stats = sync_paths(args.paths, manifest=manifest, store=store, persist_path=args.store)
+    print(stats)
 
 
-def ingest_documents(docs: Iterable[str]):
-    """Stub: accept iterable of strings and return count."""
-    count = 0
-    for _ in docs:
-        count += 1
-    return {"ingested": count}
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""LLM clients.
+
+Every client exposes ``stream(messages)`` as an async iterator of text deltas,
+so callers can forward tokens as soon as they arrive.
+
+- ``FakeLLMClient``: deterministic local stand-in for development and tests.
+- ``OpenAICompatibleClient``: any ``/chat/completions`` endpoint that supports
+  ``stream=True`` (OpenAI, vLLM, Ollama, most hosted gateways). One pooled
+  ``httpx.AsyncClient`` is reused for all requests.
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Optional, Protocol
+
+import httpx
+
+from app.core.config import settings
+
+
+class LLMClient(Protocol):
+    model: str
+
+    def stream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        ...
+
+
+class FakeLLMClient:
+    model = "fake"
+
+    def __init__(self, answer: Optional[str] = None, delay: float = 0.0, chunk_size: int = 4):
+        self.answer = answer
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    async def stream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        self.calls += 1
+        text = self.answer or "这是一个占位回答；真实实现会调用模型并附带来源"
+        for start in range(0, len(text), self.chunk_size):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield text[start : start + self.chunk_size]
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAICompatibleClient:
+    def __init__(self, base_url: str, api_key: str, model: str, timeout: float = 60.0):
+        self.model = model
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            timeout=httpx.Timeout(timeout, connect=10.0),
+        )
+
+    async def stream(self, messages: List[Dict]) -> AsyncIterator[str]:
+        payload = {"model": self.model, "messages": messages, "stream": True}
+        async with self._client.stream("POST", "/chat/completions", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                delta = choices[0].get("delta", {}).get("content") if choices else None
+                if delta:
+                    yield delta
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+def create_llm_client(provider: Optional[str] = None) -> LLMClient:
+    name = (provider or settings.LLM_PROVIDER).lower()
+    if name == "fake":
+        return FakeLLMClient()
+    if name in ("openai", "openai-compatible"):
+        return OpenAICompatibleClient(
+            base_url=settings.LLM_BASE_URL,
+            api_key=settings.LLM_API_KEY,
+            model=settings.LLM_MODEL,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+        )
+    raise ValueError(f"unsupported LLM_PROVIDER: {name!r}")
+
+
+_default_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    global _default_client
+    if _default_client is None:
+        _default_client = create_llm_client()
+    return _default_client
+
+
+def set_llm_client(client: Optional[LLMClient]) -> None:
+    global _default_client
+    _default_client = client
+
+
+async def close_llm_client() -> None:
+    global _default_client
+    if _default_client is not None:
+        await _default_client.aclose()
+        _default_client = None
@@ -0,0 +1,63 @@
+"""知识库导入清单：doc_id -> 内容哈希 -> chunk ids。
+
+重新导入时据此判断文档是否变化：未变化的文档直接跳过（不切块、不计算向量），
+变化的文档只对新增 chunk 计算向量并删除旧 chunk，源文件已删除的文档整体删除。
+"""
+
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+from app.core.config import settings
+
+
+class IngestManifest:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.documents: Dict[str, Dict] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.documents = json.load(f).get("documents", {})
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.documents
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.documents))
+
+    def doc_hash(self, doc_id: str) -> Optional[str]:
+        entry = self.documents.get(doc_id)
+        return entry["hash"] if entry else None
+
+    def chunk_ids(self, doc_id: str) -> List[str]:
+        entry = self.documents.get(doc_id)
+        return list(entry["chunks"]) if entry else []
+
+    def update(self, doc_id: str, doc_hash: str, chunk_ids: List[str]) -> None:
+        self.documents[doc_id] = {"hash": doc_hash, "chunks": list(chunk_ids)}
+
+    def remove(self, doc_id: str) -> List[str]:
+        entry = self.documents.pop(doc_id, None)
+        return list(entry["chunks"]) if entry else []
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+
+def default_manifest_path() -> Optional[str]:
+    """INGEST_MANIFEST_PATH 优先，否则放在 VECTOR_STORE_PATH 目录下。"""
+    if settings.INGEST_MANIFEST_PATH:
+        return settings.INGEST_MANIFEST_PATH
+    if settings.VECTOR_STORE_PATH:
+        return os.path.join(settings.VECTOR_STORE_PATH, "manifest.json")
+    return None
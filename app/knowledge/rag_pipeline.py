@@ -1,19 +1,208 @@
-"""Simple RAG pipeline placeholder.
+"""RAG pipeline: retrieval + LLM generation.
 
-Combines retrieval results with an LLM client (to be implemented).
+``stream_answer`` yields ``(event, data)`` pairs — ``sources`` first, then one
+``token`` per LLM delta, then ``done`` with timings — so the HTTP layer can
+forward them as Server-Sent Events. ``answer_query`` collects the same stream
+into a single dict. Answers are served from the semantic answer cache when a
+near-identical question was asked before and the knowledge base has not been
+re-ingested since.
+
+Retrieval fans out concurrently (see ``retriever.aretrieve``), an optional
+rerank stage prunes the over-fetched candidates to ``top_k``, the LLM stream
+is bounded by an idle timeout between tokens, and concurrent identical
+questions are coalesced: one retrieval and one LLM call feed every subscriber.
 """
 
-from typing import List, Dict
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.knowledge.answer_cache import answer_cache
+from app.knowledge.embedding_cache import text_key
+from app.knowledge.embeddings import get_embedder
+from app.knowledge.llm import LLMClient, get_llm_client
+from app.knowledge.rerank import get_reranker, rerank
+from app.knowledge.retriever import aretrieve
+from app.knowledge.singleflight import StreamGroup
+from app.knowledge.vectorstore import get_vector_store, knowledge_version
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = (
+    "你是“心青年”平台的助手，面向孤独症家庭提供咨询。"
+    "请仅依据给出的参考资料作答；资料不足时如实说明，并建议咨询专业人士。"
+)
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RAGMetrics:
+    """流式回答的延迟统计：首 token 时间（TTFT）与总耗时，保留最近 window 个样本算分位数。"""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._ttft = deque(maxlen=window)
+        self._total = deque(maxlen=window)
+        self.requests = 0
+        self.cached = 0
+        self.errors = 0
+
+    def record(self, ttft: Optional[float], total: float, cached: bool, error: bool = False) -> None:
+        with self._lock:
+            self.requests += 1
+            self.cached += int(cached)
+            self.errors += int(error)
+            if ttft is not None:
+                self._ttft.append(ttft)
+            self._total.append(total)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            ttft, total = list(self._ttft), list(self._total)
+            return {
+                "requests": self.requests,
+                "cached": self.cached,
+                "errors": self.errors,
+                "ttft_seconds_p50": _percentile(ttft, 0.5),
+                "ttft_seconds_p95": _percentile(ttft, 0.95),
+                "total_seconds_p50": _percentile(total, 0.5),
+                "total_seconds_p95": _percentile(total, 0.95),
+            }
+
+
+rag_metrics = RAGMetrics()
 
-from app.knowledge.retriever import retrieve
 
+def build_messages(query: str, docs: List[Dict]) -> List[Dict]:
+    context = "\n\n".join(f"[{i}] {doc['text']}" for i, doc in enumerate(docs, start=1))
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"参考资料：\n{context}\n\n问题：{query}"},
+    ]
 
-def answer_query(query: str, top_k: int = 3) -> Dict:
-    docs = retrieve(query, top_k=top_k)
-    # fake LLM response for now
-    response = {
-        "query": query,
-        "answer": "这是一个占位回答；真实实现会调用模型并附带来源",
-        "sources": docs,
+
+def _public_source(doc: Dict) -> Dict:
+    metadata = doc.get("metadata", {})
+    source = metadata.get("source")
+    return {
+        "id": doc["id"],
+        "text": doc["text"],
+        "score": doc["score"],
+        "doc_id": metadata.get("doc_id"),
+        # metadata 中的 source 是服务器上的绝对路径，对外只给文件名
+        "source": os.path.basename(source.replace("\\", "/")) if source else None,
     }
+
+
+def _rerank(query: str, candidates: List[Dict], top_k: int) -> List[Dict]:
+    # 模型在工作线程中首次加载，不阻塞事件循环；加载失败由调用方退回检索排序
+    reranker = get_reranker()
+    if reranker is None:
+        return candidates[:top_k]
+    return rerank(query, candidates, top_k, reranker)
+
+
+inflight_answers = StreamGroup()
+
+
+async def _generate(query: str, top_k: int, query_vector, llm: LLMClient, version=None) -> AsyncIterator[Tuple[str, Dict]]:
+    """检索 + 生成，产出 sources / token / answer 事件；由 single-flight 在并发的相同问题间共享。"""
+    if not settings.RERANK_ENABLED:
+        docs = await aretrieve(query, top_k)
+    else:
+        candidates = await aretrieve(query, max(top_k, settings.RERANK_FETCH_K))
+        try:
+            docs = await asyncio.wait_for(
+                asyncio.to_thread(_rerank, query, candidates, top_k),
+                timeout=settings.RERANK_TIMEOUT_SECONDS,
+            )
+        except Exception as exc:
+            # 重排失败、超时或模型无法加载时退回检索排序
+            logger.warning("rerank failed: %r", exc)
+            docs = candidates[:top_k]
+    sources = [_public_source(doc) for doc in docs]
+    yield "sources", {"sources": sources, "cached": False}
+    parts = []
+    tokens = llm.stream(build_messages(query, docs)).__aiter__()
+    try:
+        while True:
+            try:
+                delta = await asyncio.wait_for(tokens.__anext__(), timeout=settings.LLM_IDLE_TIMEOUT_SECONDS)
+            except StopAsyncIteration:
+                break
+            parts.append(delta)
+            yield "token", {"text": delta}
+    finally:
+        # 超时或出错时关闭底层流（释放 HTTP 连接）
+        aclose = getattr(tokens, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    answer = "".join(parts)
+    # 以开始检索时的知识库版本入缓存，生成期间索引被替换时该条目不会再命中
+    answer_cache.set(query_vector, top_k, {"answer": answer, "sources": sources}, version)
+    yield "answer", {"answer": answer}
+
+
+async def stream_answer(query: str, top_k: int = 3, llm: Optional[LLMClient] = None) -> AsyncIterator[Tuple[str, Dict]]:
+    started = time.perf_counter()
+    ttft = None
+    cached = False
+    failed = False
+    try:
+        # 向量化是 CPU 计算，放到线程中执行，不阻塞事件循环
+        query_vector = (await asyncio.to_thread(get_embedder().embed, [query]))[0]
+        # 获取默认向量库可能触发重新加载，同样放到线程中
+        version = knowledge_version(await asyncio.to_thread(get_vector_store))
+        hit = answer_cache.get(query_vector, top_k, version)
+        if hit is not None:
+            cached = True
+            events = _replay(hit)
+        else:
+            llm = llm or get_llm_client()
+            key = (text_key(query), top_k, id(llm), version)
+            events = inflight_answers.subscribe(key, lambda: _generate(query, top_k, query_vector, llm, version))
+        answer = ""
+        async for event, data in events:
+            if event == "answer":
+                answer = data["answer"]
+                continue
+            if event == "token" and ttft is None:
+                ttft = time.perf_counter() - started
+            yield event, data
+        yield "done", {
+            "answer": answer,
+            "cached": cached,
+            "ttft_ms": round((ttft or 0.0) * 1000, 2),
+            "total_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+    except Exception:
+        failed = True
+        raise
+    finally:
+        rag_metrics.record(ttft, time.perf_counter() - started, cached, error=failed)
+
+
+async def _replay(hit: Dict) -> AsyncIterator[Tuple[str, Dict]]:
+    yield "sources", {"sources": hit["sources"], "cached": True}
+    yield "token", {"text": hit["answer"]}
+    yield "answer", {"answer": hit["answer"]}
+
+
+async def answer_query(query: str, top_k: int = 3, llm: Optional[LLMClient] = None) -> Dict:
+    response = {"query": query}
+    async for event, data in stream_answer(query, top_k=top_k, llm=llm):
+        if event == "sources":
+            response["sources"] = data["sources"]
+        elif event == "done":
+            response.update(answer=data["answer"], cached=data["cached"])
     return response
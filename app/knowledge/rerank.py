@@ -0,0 +1,108 @@
+"""Rerank stage.
+
+The pipeline over-fetches ``RERANK_FETCH_K`` candidates, scores every
+(query, chunk) pair with a reranker in batches of ``RERANK_BATCH_SIZE`` and
+keeps only the best ``top_k`` for the prompt.
+
+- ``LexicalReranker``: dependency-free token-overlap scorer, used as the
+  default and as a deterministic stand-in in tests.
+- ``CrossEncoderReranker``: a local cross-encoder on CPU; needs the optional
+  ``sentence-transformers`` package.
+"""
+
+import threading
+from typing import Dict, List, Optional, Protocol, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+from app.knowledge.tokenizer import tokenize
+
+
+class Reranker(Protocol):
+    model_id: str
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        ...
+
+
+class LexicalReranker:
+    """按查询 token 在候选文本中的覆盖率打分（兼顾长度），无需模型。"""
+
+    model_id = "lexical"
+
+    def __init__(self):
+        self.batches = 0
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        self.batches += 1
+        query_tokens = set(tokenize(query))
+        if not query_tokens:
+            return np.zeros(len(texts), dtype=np.float32)
+        scores = np.empty(len(texts), dtype=np.float32)
+        for i, text in enumerate(texts):
+            tokens = set(tokenize(text))
+            overlap = len(query_tokens & tokens)
+            scores[i] = overlap / len(query_tokens) + 0.1 * overlap / (len(tokens) or 1)
+        return scores
+
+
+class CrossEncoderReranker:
+    def __init__(self, model_name: str, device: str = "cpu"):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise ImportError(
+                "RERANK_MODEL 指定了 cross-encoder 模型，需要安装 sentence-transformers"
+            ) from exc
+        self.model_id = model_name
+        self._model = CrossEncoder(model_name, device=device)
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        pairs = [(query, text) for text in texts]
+        return np.asarray(self._model.predict(pairs, batch_size=len(pairs), show_progress_bar=False), dtype=np.float32)
+
+
+def rerank(query: str, docs: List[Dict], top_n: int, reranker: Reranker, batch_size: int = None) -> List[Dict]:
+    """分批打分后保留 top_n，结果中的 score 替换为重排分数（原分数保留在 retrieval_score）。"""
+    if not docs:
+        return []
+    batch_size = batch_size or settings.RERANK_BATCH_SIZE
+    texts = [doc["text"] for doc in docs]
+    scores = np.concatenate([
+        reranker.score(query, texts[start : start + batch_size])
+        for start in range(0, len(texts), batch_size)
+    ])
+    order = np.argsort(-scores, kind="stable")[:top_n]
+    return [{**docs[i], "score": float(scores[i]), "retrieval_score": docs[i]["score"]} for i in order.tolist()]
+
+
+def create_reranker(model: Optional[str] = None) -> Reranker:
+    name = model or settings.RERANK_MODEL
+    if name.lower() in ("lexical", "fake"):
+        return LexicalReranker()
+    return CrossEncoderReranker(name)
+
+
+_default_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Optional[Reranker]:
+    """RERANK_ENABLED 关闭时返回 None（流水线跳过重排）。
+
+    模型加载较慢，应在工作线程中调用；并发的首次调用只加载一次。
+    """
+    global _default_reranker
+    if not settings.RERANK_ENABLED:
+        return None
+    if _default_reranker is None:
+        with _reranker_lock:
+            if _default_reranker is None:
+                _default_reranker = create_reranker()
+    return _default_reranker
+
+
+def set_reranker(reranker: Optional[Reranker]) -> None:
+    global _default_reranker
+    _default_reranker = reranker
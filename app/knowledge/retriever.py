@@ -1,11 +1,185 @@
-"""Placeholder retriever module.
+"""Retrieval strategies: dense, sparse (BM25) and hybrid.
 
-Implement different retrieval strategies (dense, sparse, hybrid) here.
+- dense: embed the query (through the shared embedding cache) and search the
+  vector store.
+- sparse: BM25 over an in-memory inverted index derived from the vector store's
+  chunk texts; it is synced lazily whenever ``store.version`` changes.
+- hybrid: both of the above, fused with reciprocal rank fusion (RRF).
+
+``retrieve(query, top_k)`` dispatches on ``settings.RETRIEVAL_MODE``;
+``aretrieve`` is the async variant used by the RAG pipeline: the dense and
+sparse stages run concurrently in worker threads, each bounded by
+``RETRIEVAL_STAGE_TIMEOUT_SECONDS``. In hybrid mode a failed or slow stage is
+dropped and the other stage's results are returned on their own.
 """
 
-from typing import List, Dict
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.knowledge.bm25 import BM25Index
+from app.knowledge.embeddings import Embedder, get_embedder
+from app.knowledge.vectorstore import VectorStore, get_vector_store
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalError(RuntimeError):
+    pass
+
+
+def _to_doc(doc_id: str, metadata: Dict, score: float, text: str) -> Dict:
+    return {"id": doc_id, "text": text, "score": score, "metadata": metadata}
+
+
+def dense_retrieve(
+    query: str,
+    top_k: int = 5,
+    store: Optional[VectorStore] = None,
+    embedder: Optional[Embedder] = None,
+) -> List[Dict]:
+    store = store if store is not None else get_vector_store()
+    embedder = embedder or get_embedder()
+    if len(store) == 0:
+        return []
+    query_vector = embedder.embed([query])[0]
+    return [
+        _to_doc(hit["id"], hit["metadata"], hit["score"], hit.get("text", ""))
+        for hit in store.search(query_vector, top_k=top_k)
+    ]
+
+
+class SparseIndex:
+    """跟随向量库的 BM25 索引：store.version 变化时按 id 差集增量同步。"""
+
+    def __init__(self):
+        self.index = BM25Index()
+        self._metadatas: Dict[str, Dict] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def sync(self, store: VectorStore) -> None:
+        version = store.version
+        if version == self._version and version != -1:
+            return
+        with self._lock:
+            if version == self._version and version != -1:
+                return
+            current = dict(store.items())
+            for doc_id in [d for d in self._metadatas if d not in current]:
+                self.index.remove(doc_id)
+                del self._metadatas[doc_id]
+            changed = [doc_id for doc_id, metadata in current.items() if self._metadatas.get(doc_id) is not metadata]
+            # 只为新增/变化的条目读取文本
+            for doc_id, text in zip(changed, store.get_texts(changed)):
+                self.index.add(doc_id, text)
+                self._metadatas[doc_id] = current[doc_id]
+            if self.index.dead_count > len(self.index):
+                self.index.compact()
+            self._version = version
+
+    def search(self, store: VectorStore, query: str, top_k: int) -> List[Dict]:
+        self.sync(store)
+        hits = self.index.search(query, top_k)
+        texts = store.get_texts([doc_id for doc_id, _ in hits])
+        return [_to_doc(doc_id, self._metadatas[doc_id], score, text) for (doc_id, score), text in zip(hits, texts)]
+
+
+# 每个向量库一份 BM25 索引；向量库被回收时索引随之释放
+_sparse_indexes: "weakref.WeakKeyDictionary[VectorStore, SparseIndex]" = weakref.WeakKeyDictionary()
+_sparse_lock = threading.Lock()
+
+
+def get_sparse_index(store: VectorStore) -> SparseIndex:
+    with _sparse_lock:
+        sparse = _sparse_indexes.get(store)
+        if sparse is None:
+            sparse = _sparse_indexes[store] = SparseIndex()
+        return sparse
+
+
+def sparse_retrieve(query: str, top_k: int = 5, store: Optional[VectorStore] = None) -> List[Dict]:
+    store = store if store is not None else get_vector_store()
+    return get_sparse_index(store).search(store, query, top_k)
+
+
+def rrf_fuse(result_lists: Sequence[List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """Reciprocal rank fusion：score = Σ 1 / (k + rank)，rank 从 1 开始。"""
+    fused: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            fused.setdefault(doc["id"], doc)
+            scores[doc["id"]] = scores.get(doc["id"], 0.0) + 1.0 / (k + rank)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{**fused[doc_id], "score": scores[doc_id]} for doc_id in ranked]
+
+
+def hybrid_retrieve(
+    query: str,
+    top_k: int = 5,
+    store: Optional[VectorStore] = None,
+    embedder: Optional[Embedder] = None,
+) -> List[Dict]:
+    store = store if store is not None else get_vector_store()
+    fetch_k = max(top_k, settings.RETRIEVAL_FETCH_K)
+    dense = dense_retrieve(query, fetch_k, store=store, embedder=embedder)
+    sparse = sparse_retrieve(query, fetch_k, store=store)
+    return rrf_fuse([dense, sparse], top_k=top_k, k=settings.RETRIEVAL_RRF_K)
 
 
 def retrieve(query: str, top_k: int = 5) -> List[Dict]:
-    """Return list of fake documents for now."""
-    return [{"id": i, "text": f"Fake doc {i}", "score": 1.0} for i in range(top_k)]
+    """Return the top_k chunks for query: [{"id", "text", "score", "metadata"}]."""
+    mode = settings.RETRIEVAL_MODE.lower()
+    if mode == "dense":
+        return dense_retrieve(query, top_k=top_k)
+    if mode == "sparse":
+        return sparse_retrieve(query, top_k=top_k)
+    if mode == "hybrid":
+        return hybrid_retrieve(query, top_k=top_k)
+    raise ValueError(f"unsupported RETRIEVAL_MODE: {mode!r}")
+
+
+# 各检索阶段的超时/失败计数
+stage_failures: Dict[str, int] = {"dense": 0, "sparse": 0}
+
+
+async def _run_stage(name: str, fn, *args, **kwargs) -> Optional[List[Dict]]:
+    # 超时只是不再等待结果，线程中的计算会继续跑完
+    try:
+        return await asyncio.wait_for(
+            asyncio.to_thread(fn, *args, **kwargs),
+            timeout=settings.RETRIEVAL_STAGE_TIMEOUT_SECONDS,
+        )
+    except Exception as exc:
+        stage_failures[name] += 1
+        logger.warning("retrieval stage %s failed: %r", name, exc)
+        return None
+
+
+async def aretrieve(
+    query: str,
+    top_k: int = 5,
+    store: Optional[VectorStore] = None,
+    embedder: Optional[Embedder] = None,
+) -> List[Dict]:
+    # 默认向量库可能需要从磁盘（重新）加载，不在事件循环中执行
+    store = store if store is not None else await asyncio.to_thread(get_vector_store)
+    mode = settings.RETRIEVAL_MODE.lower()
+    if mode not in ("dense", "sparse", "hybrid"):
+        raise ValueError(f"unsupported RETRIEVAL_MODE: {mode!r}")
+    fetch_k = top_k if mode != "hybrid" else max(top_k, settings.RETRIEVAL_FETCH_K)
+    stages = []
+    if mode in ("dense", "hybrid"):
+        stages.append(_run_stage("dense", dense_retrieve, query, fetch_k, store=store, embedder=embedder))
+    if mode in ("sparse", "hybrid"):
+        stages.append(_run_stage("sparse", sparse_retrieve, query, fetch_k, store=store))
+    results = [r for r in await asyncio.gather(*stages) if r is not None]
+    if not results:
+        raise RetrievalError("all retrieval stages failed")
+    if len(stages) == 1:
+        return results[0]
+    return rrf_fuse(results, top_k=top_k, k=settings.RETRIEVAL_RRF_K)
@@ -0,0 +1,83 @@
+"""请求合并（single-flight）。
+
+同一个 key 的并发请求只启动一个生产者：生产者作为独立 task 运行，
+产出的每一项追加到共享缓冲区，所有订阅者（包括第一个）从头回放并等待后续项。
+某个订阅者断开不会取消生产者，其它订阅者照常收到完整结果。
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+
+class _Flight:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def push(self, item) -> None:
+        async with self._changed:
+            self.items.append(item)
+            self._changed.notify_all()
+
+    async def finish(self, error: Optional[BaseException] = None) -> None:
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def iterate(self) -> AsyncIterator[Any]:
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.items) or self.done)
+                pending = self.items[index:]
+                finished = self.done
+            for item in pending:
+                yield item
+            index += len(pending)
+            if finished and index >= len(self.items):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class StreamGroup:
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def _produce(self, key: Hashable, flight: _Flight, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                await flight.push(item)
+        except BaseException as exc:
+            await flight.finish(exc)
+            if not isinstance(exc, Exception):
+                raise
+        else:
+            await flight.finish()
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def subscribe(self, key: Hashable, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """订阅 key 对应的结果流；没有进行中的生产者时用 factory() 启动一个。"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._produce(key, flight, factory()))
+            self.started += 1
+        else:
+            self.coalesced += 1
+        async for item in flight.iterate():
+            yield item
+
+    def stats(self) -> Dict:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
@@ -0,0 +1,26 @@
+"""中英文混合文本的轻量分词。
+
+不依赖分词词典：拉丁字母/数字按单词切分并转小写，
+连续的中日韩字符输出单字与相邻二元组（unigram + bigram），
+对中文检索的召回与精度已足够，且速度快、结果稳定。
+"""
+
+import re
+from typing import List
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+
+def _is_cjk(segment: str) -> bool:
+    return not segment[0].isascii()
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for segment in _TOKEN_RE.findall(text.lower()):
+        if not _is_cjk(segment):
+            tokens.append(segment)
+            continue
+        tokens.extend(segment)
+        tokens.extend(segment[i : i + 2] for i in range(len(segment) - 1))
+    return tokens
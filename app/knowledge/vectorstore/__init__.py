@@ -1,9 +1,146 @@
-"""Vector store implementations should implement a common interface:
-- add_documents
-- search
-- persist/load
+"""Vector store backends.
 
-This package will host adapters for FAISS/Chroma/Redis/etc.
+All backends implement ``VectorStore`` (add_documents / search / search_batch /
+persist / load). ``create_vector_store()`` picks one according to
+``settings.VECTOR_STORE``; extra adapters (FAISS/Chroma/Redis/...) can be
+plugged in with ``register_backend``.
+
+The default store follows ``VECTOR_STORE_PATH``: when another process (e.g. the
+ingest CLI) persists a new generation there, ``get_vector_store()`` picks it up
+within ``VECTOR_STORE_RELOAD_SECONDS``.
 """
 
-__all__ = []
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple, Type
+
+from app.core.config import settings
+from app.knowledge.vectorstore.base import VectorStore
+from app.knowledge.vectorstore.numpy_store import NumpyVectorStore
+
+logger = logging.getLogger(__name__)
+
+_BACKENDS: Dict[str, Type[VectorStore]] = {
+    "numpy": NumpyVectorStore,
+    "local": NumpyVectorStore,
+}
+
+
+def register_backend(name: str, cls: Type[VectorStore]) -> None:
+    _BACKENDS[name.lower()] = cls
+
+
+def create_vector_store(backend: Optional[str] = None, **kwargs) -> VectorStore:
+    """按名称（默认取 settings.VECTOR_STORE）创建向量库实例。"""
+    name = (backend or settings.VECTOR_STORE).lower()
+    cls = _BACKENDS.get(name)
+    if cls is None:
+        raise ValueError(f"unsupported VECTOR_STORE: {name!r} (available: {sorted(_BACKENDS)})")
+    if cls is NumpyVectorStore:
+        options = {
+            "metric": settings.VECTOR_METRIC,
+            "index_type": settings.VECTOR_INDEX_TYPE,
+            "nlist": settings.VECTOR_IVF_NLIST,
+            "nprobe": settings.VECTOR_IVF_NPROBE,
+            "ivf_threshold": settings.VECTOR_IVF_THRESHOLD,
+        }
+        options.update(kwargs)
+        return cls(**options)
+    return cls(**kwargs)
+
+
+_default_store: Optional[VectorStore] = None
+_default_lock = threading.Lock()
+# 默认向量库加载自的 meta.json（inode, mtime），以及下次检查时间；
+# 通过 set_vector_store 显式指定的向量库不会被自动替换
+_loaded_stamp: Optional[Tuple[int, int]] = None
+_next_check = 0.0
+_pinned = False
+
+
+def _meta_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(os.path.join(path, "meta.json"))
+    except OSError:
+        return None
+    # persist 以 os.replace 替换 meta.json，inode 与 mtime 都会变化
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _load_default() -> VectorStore:
+    global _loaded_stamp
+    store = create_vector_store()
+    path = settings.VECTOR_STORE_PATH
+    stamp = _meta_stamp(path) if path else None
+    if stamp is not None:
+        store = type(store).load(path)
+    _loaded_stamp = stamp
+    return store
+
+
+def _maybe_reload() -> None:
+    """VECTOR_STORE_PATH 下的索引被其它进程重新持久化后，换成新加载的向量库。"""
+    global _default_store, _next_check
+    interval = settings.VECTOR_STORE_RELOAD_SECONDS
+    if _pinned or interval <= 0 or not settings.VECTOR_STORE_PATH:
+        return
+    now = time.monotonic()
+    if now < _next_check:
+        return
+    with _default_lock:
+        if now < _next_check:
+            return
+        # 先推迟下次检查，加载期间其它调用方继续使用旧的向量库
+        _next_check = now + interval
+        stamp = _meta_stamp(settings.VECTOR_STORE_PATH)
+        if stamp is None or stamp == _loaded_stamp:
+            return
+        try:
+            store = _load_default()
+        except Exception:
+            logger.exception("reloading vector store from %s failed", settings.VECTOR_STORE_PATH)
+            return
+        _default_store = store
+        logger.info("reloaded vector store generation %s", store.generation)
+
+
+def get_vector_store() -> VectorStore:
+    """进程内共享的默认向量库；配置了 VECTOR_STORE_PATH 且目录存在时从磁盘加载。
+
+    每隔 VECTOR_STORE_RELOAD_SECONDS 检查一次 meta.json，索引被导入脚本等其它进程更新后
+    自动重新加载。加载可能较慢，在事件循环中请经 to_thread 调用。
+    """
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = _load_default()
+    else:
+        _maybe_reload()
+    return _default_store
+
+
+def set_vector_store(store: Optional[VectorStore]) -> None:
+    """替换默认向量库（测试或重新加载索引时使用）；传 None 则下次访问时重新创建。"""
+    global _default_store, _pinned
+    with _default_lock:
+        _default_store = store
+        _pinned = store is not None
+
+
+def knowledge_version(store: VectorStore) -> Tuple:
+    """知识库内容的版本：磁盘代标识 + 进程内修改计数；答案缓存以此判断条目是否过时。"""
+    return store.generation, id(store), store.version
+
+
+__all__ = [
+    "VectorStore",
+    "NumpyVectorStore",
+    "create_vector_store",
+    "register_backend",
+    "get_vector_store",
+    "set_vector_store",
+    "knowledge_version",
+]
@@ -0,0 +1,81 @@
+"""向量库公共接口。
+
+所有后端（本地 NumPy、将来的 Chroma/FAISS 等适配器）实现同一组方法：
+add_documents / delete / search / search_batch / persist / load。
+检索结果统一为 dict：{"id", "score", "metadata", "text"}，分数越大越相似；
+块文本与元数据分开保存，后端可以只在命中时读取文本。
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class VectorStore(ABC):
+    @abstractmethod
+    def add_documents(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        metadatas: Optional[Sequence[Dict]] = None,
+        texts: Optional[Sequence[str]] = None,
+    ) -> None:
+        """写入（或按 id 覆盖）一批向量及其元数据、块文本。"""
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]) -> int:
+        """删除一批 id，返回实际删除的条数；不存在的 id 忽略。"""
+
+    def compact(self) -> int:
+        """回收已删除条目占用的空间；不需要压缩的后端直接返回 0。"""
+        return 0
+
+    @property
+    def tombstone_ratio(self) -> float:
+        """已删除但尚未回收的条目占比。"""
+        return 0.0
+
+    @abstractmethod
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5) -> List[List[Dict]]:
+        """批量检索：输入 (n, dim) 矩阵，返回每个查询的 top_k 结果。"""
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict]:
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        return self.search_batch(query, top_k=top_k)[0]
+
+    @abstractmethod
+    def persist(self, path: str) -> None:
+        """把索引写入目录 path。"""
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str) -> "VectorStore":
+        """从目录 path 加载索引。"""
+
+    @abstractmethod
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        """遍历现存条目的 (id, metadata)，用于由向量库派生其它索引（如 BM25）。"""
+
+    def get_texts(self, ids: Sequence[str]) -> List[str]:
+        """按 id 读取块文本，不存在的 id 返回空字符串。"""
+        metadatas = dict(self.items())
+        return [metadatas.get(doc_id, {}).get("text", "") for doc_id in ids]
+
+    @property
+    def generation(self) -> Optional[str]:
+        """磁盘上索引的代标识，persist/load 时更新；不同进程据此判断索引是否被替换。不支持的后端返回 None。"""
+        return None
+
+    @property
+    def version(self) -> int:
+        """每次写入/删除后变化；派生索引据此判断是否需要同步。不支持的后端返回 -1。"""
+        return -1
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @abstractmethod
+    def __contains__(self, doc_id: str) -> bool:
+        ...
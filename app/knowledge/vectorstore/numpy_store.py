@@ -0,0 +1,532 @@
+"""进程内 NumPy 向量库。
+
+- 所有向量保存在一块连续的 float32 矩阵中（按容量倍增扩展），检索为一次矩阵乘法，
+  再用 argpartition 取 top-k，不需要外部服务。
+- 语料较大时（默认 >= 10 万条）可切换到 IVF：先用球面 k-means 把向量划分到 nlist 个簇，
+  检索时只扫描与查询最相近的 nprobe 个簇。
+- metric="cosine" 时写入和查询都做 L2 归一化，内积即余弦相似度。
+- 删除只打墓碑标记（检索时跳过），compact() 在后台重建连续矩阵回收空间。
+- 持久化为裸 float32 文件 + 紧凑元数据文件，加载时 memmap 零拷贝映射（见 persist/load）。
+- 块文本不放在元数据里，单独存为按偏移索引的文本文件，只在命中时按行解码。
+"""
+
+import json
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.knowledge.vectorstore.base import VectorStore
+
+FORMAT_VERSION = 3
+_VECTORS_FILE = "vectors.f32"
+_CENTROIDS_FILE = "centroids.f32"
+_ASSIGNMENTS_FILE = "assignments.i32"
+_TEXTS_FILE = "texts.bin"
+_TEXT_OFFSETS_FILE = "texts.idx"
+_META_FILE = "meta.json"
+_GENERATION_PREFIX = "gen-"
+
+# 单次矩阵乘法的分数矩阵上限（元素个数），超过则按查询分块计算，控制峰值内存
+_MAX_SCORE_ELEMENTS = 1 << 25
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """对 (m, n) 分数矩阵按行取 top-k，返回按分数降序排列的 (下标, 分数)。"""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < n:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(n), scores.shape).copy()
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _read_generation(meta_path: str) -> Optional[str]:
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f).get("generation")
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_stale_generations(path: str, keep) -> None:
+    """删除当前代与上一代以外的代目录（上一代可能正被其它进程加载）。"""
+    for name in os.listdir(path):
+        if name.startswith(_GENERATION_PREFIX) and name not in keep:
+            # 已映射旧代的进程仍持有文件；无法删除（如 Windows 上）时留到下次
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    # 格式 3 之前直接写在根目录下的数据文件
+    for name in (_VECTORS_FILE, _CENTROIDS_FILE, _ASSIGNMENTS_FILE, _TEXTS_FILE, _TEXT_OFFSETS_FILE):
+        try:
+            os.remove(os.path.join(path, name))
+        except OSError:
+            pass
+
+
+class NumpyVectorStore(VectorStore):
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        metric: str = "cosine",
+        index_type: str = "auto",
+        nlist: int = 0,
+        nprobe: int = 8,
+        ivf_threshold: int = 100_000,
+    ):
+        if metric not in ("cosine", "ip"):
+            raise ValueError(f"unsupported metric: {metric}")
+        if index_type not in ("auto", "flat", "ivf"):
+            raise ValueError(f"unsupported index_type: {index_type}")
+        self.dim = dim
+        self.metric = metric
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_threshold = ivf_threshold
+        self._vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self._ids: List[str] = []
+        self._metadatas: List[Dict] = []
+        # 每行的块文本：str 为进程内文本，int 为 texts.bin 中的行号（加载后惰性解码）
+        self._texts: List[Union[str, int]] = []
+        self._text_data = np.empty(0, dtype=np.uint8)
+        self._text_offsets = np.zeros(1, dtype=np.int64)
+        self._id_to_row: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        # IVF 状态：簇中心、每行所属簇、按簇分组的行号（惰性构建）
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._lists: Optional[List[np.ndarray]] = None
+        self._ivf_built_size = 0
+        # 墓碑：_live[row] 为 False 的行已删除；_version 在每次修改后递增，供后台压缩检测并发写入
+        self._live = np.ones(0, dtype=bool)
+        self._deleted_count = 0
+        self._version = 0
+        self._generation: Optional[str] = None
+
+    def __len__(self) -> int:
+        return self._size - self._deleted_count
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._id_to_row
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: self._size]
+
+    # ---------- 写入 ----------
+
+    def _prepare(self, embeddings) -> np.ndarray:
+        vecs = np.asarray(embeddings, dtype=np.float32)
+        if vecs.ndim == 1:
+            vecs = vecs.reshape(1, -1)
+        if self.dim is None:
+            self.dim = vecs.shape[1]
+            self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        if vecs.shape[1] != self.dim:
+            raise ValueError(f"embedding dim mismatch: expected {self.dim}, got {vecs.shape[1]}")
+        if self.metric == "cosine":
+            vecs = _normalize(vecs)
+        return np.ascontiguousarray(vecs, dtype=np.float32)
+
+    def _ensure_writable(self) -> None:
+        """从 memmap 加载的数组是只读的，第一次修改前复制到进程内存。"""
+        if not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors, dtype=np.float32)
+        if not self._assignments.flags.writeable:
+            self._assignments = np.array(self._assignments, dtype=np.int32)
+
+    def _reserve(self, needed: int) -> None:
+        self._ensure_writable()
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        grown = np.empty((new_capacity, self.dim), dtype=np.float32)
+        grown[: self._size] = self._vectors[: self._size]
+        self._vectors = grown
+        assignments = np.full(new_capacity, -1, dtype=np.int32)
+        assignments[: self._size] = self._assignments[: self._size]
+        self._assignments = assignments
+        live = np.ones(new_capacity, dtype=bool)
+        live[: self._size] = self._live[: self._size]
+        self._live = live
+
+    def add_documents(
+        self,
+        ids: Sequence[str],
+        embeddings,
+        metadatas: Optional[Sequence[Dict]] = None,
+        texts: Optional[Sequence[str]] = None,
+    ) -> None:
+        vecs = self._prepare(embeddings)
+        if len(ids) != vecs.shape[0]:
+            raise ValueError("ids and embeddings length mismatch")
+        if metadatas is not None and len(metadatas) != len(ids):
+            raise ValueError("ids and metadatas length mismatch")
+        if texts is not None and len(texts) != len(ids):
+            raise ValueError("ids and texts length mismatch")
+        with self._lock:
+            rows = np.empty(len(ids), dtype=np.int64)
+            next_row = self._size
+            for i, doc_id in enumerate(ids):
+                row = self._id_to_row.get(doc_id)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                    self._id_to_row[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._metadatas.append({})
+                    self._texts.append("")
+                rows[i] = row
+                if metadatas is not None:
+                    metadata = dict(metadatas[i])
+                    # 兼容旧调用方把文本放在 metadata["text"] 中
+                    text = metadata.pop("text", None)
+                    if texts is None and text is not None:
+                        self._texts[row] = str(text)
+                    self._metadatas[row] = metadata
+                if texts is not None:
+                    self._texts[row] = texts[i]
+            self._reserve(next_row)
+            self._vectors[rows] = vecs
+            self._size = next_row
+            self._version += 1
+            if self._centroids is not None:
+                self._assignments[rows] = self._assign(vecs)
+                self._lists = None
+
+    def delete(self, ids: Sequence[str]) -> int:
+        with self._lock:
+            removed = 0
+            for doc_id in ids:
+                row = self._id_to_row.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._live[row] = False
+                self._metadatas[row] = {}
+                self._texts[row] = ""
+                removed += 1
+            if removed:
+                self._deleted_count += removed
+                self._version += 1
+            return removed
+
+    def compact(self) -> int:
+        """去掉墓碑行，重建连续矩阵；返回回收的行数。
+
+        复制存活行的耗时部分不持锁，检索可并发进行；期间若有写入则在锁内重做一次。
+        """
+        with self._lock:
+            if not self._deleted_count:
+                return 0
+            version = self._version
+            live_rows = np.flatnonzero(self._live[: self._size])
+            vectors, assignments = self._vectors, self._assignments
+        new_vectors = np.ascontiguousarray(vectors[live_rows])
+        new_assignments = assignments[live_rows].astype(np.int32)
+        with self._lock:
+            if self._version != version:
+                live_rows = np.flatnonzero(self._live[: self._size])
+                new_vectors = np.ascontiguousarray(self._vectors[live_rows])
+                new_assignments = self._assignments[live_rows].astype(np.int32)
+            removed = self._size - len(live_rows)
+            self._ids = [self._ids[row] for row in live_rows.tolist()]
+            self._metadatas = [self._metadatas[row] for row in live_rows.tolist()]
+            self._texts = [self._texts[row] for row in live_rows.tolist()]
+            self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._vectors = new_vectors
+            self._assignments = new_assignments
+            self._size = len(live_rows)
+            self._live = np.ones(self._size, dtype=bool)
+            self._deleted_count = 0
+            self._lists = None
+            self._version += 1
+            return removed
+
+    def items(self) -> Iterator[Tuple[str, Dict]]:
+        with self._lock:
+            snapshot = [(doc_id, self._metadatas[row]) for doc_id, row in self._id_to_row.items()]
+        return iter(snapshot)
+
+    def _text(self, row: int) -> str:
+        value = self._texts[row]
+        if isinstance(value, str):
+            return value
+        start, end = self._text_offsets[value], self._text_offsets[value + 1]
+        return self._text_data[start:end].tobytes().decode("utf-8")
+
+    def _text_bytes(self, row: int) -> bytes:
+        value = self._texts[row]
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return self._text_data[self._text_offsets[value] : self._text_offsets[value + 1]].tobytes()
+
+    def get_texts(self, ids: Sequence[str]) -> List[str]:
+        with self._lock:
+            return [self._text(self._id_to_row[doc_id]) if doc_id in self._id_to_row else "" for doc_id in ids]
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def generation(self) -> Optional[str]:
+        return self._generation
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return self._deleted_count / self._size if self._size else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "rows": self._size,
+            "live": len(self),
+            "deleted": self._deleted_count,
+            "dim": self.dim,
+            "ivf": self._centroids is not None,
+        }
+
+    # ---------- IVF ----------
+
+    def _assign(self, vecs: np.ndarray) -> np.ndarray:
+        out = np.empty(vecs.shape[0], dtype=np.int32)
+        step = max(1, _MAX_SCORE_ELEMENTS // max(len(self._centroids), 1))
+        for start in range(0, vecs.shape[0], step):
+            chunk = vecs[start : start + step]
+            out[start : start + step] = np.argmax(chunk @ self._centroids.T, axis=1)
+        return out
+
+    def build_ivf(self, nlist: Optional[int] = None, n_iter: int = 10, seed: int = 0) -> None:
+        """用球面 k-means 训练簇中心并把现有向量划分到各簇。"""
+        with self._lock:
+            n = self._size
+            live_rows = np.flatnonzero(self._live[:n])
+            if len(live_rows) == 0:
+                return
+            nlist = nlist or self.nlist or int(4 * math.sqrt(len(live_rows)))
+            nlist = max(1, min(nlist, len(live_rows)))
+            rng = np.random.default_rng(seed)
+            data = self.vectors
+            # 每簇约 256 个样本即可训练出稳定的簇中心
+            sample_size = min(len(live_rows), nlist * 256)
+            sample = data[rng.choice(live_rows, sample_size, replace=False)]
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(n_iter):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                counts = np.bincount(labels, minlength=nlist)
+                empty = counts == 0
+                # 空簇保留原中心
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+            self._centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+            self._ensure_writable()
+            self._assignments[:n] = self._assign(data)
+            self._lists = None
+            self._ivf_built_size = len(live_rows)
+
+    def _ivf_lists(self) -> List[np.ndarray]:
+        if self._lists is None:
+            assignments = self._assignments[: self._size]
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=len(self._centroids))
+            self._lists = np.split(order, np.cumsum(counts)[:-1])
+        return self._lists
+
+    def _use_ivf(self) -> bool:
+        if self.index_type == "flat":
+            return False
+        if self.index_type == "auto" and len(self) < self.ivf_threshold:
+            return False
+        # 首次使用或数据量较训练时增长 4 倍以上时重新训练
+        if self._centroids is None or len(self) > 4 * self._ivf_built_size:
+            self.build_ivf()
+        return True
+
+    # ---------- 检索 ----------
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray) -> List[Dict]:
+        return [
+            {"id": self._ids[row], "score": float(score), "metadata": self._metadatas[row], "text": self._text(row)}
+            for row, score in zip(rows.tolist(), scores.tolist())
+            if score != -np.inf
+        ]
+
+    def search_batch(self, query_embeddings, top_k: int = 5) -> List[List[Dict]]:
+        if len(self) == 0:
+            return [[] for _ in range(np.atleast_2d(query_embeddings).shape[0])]
+        queries = self._prepare(query_embeddings)
+        with self._lock:
+            if self._use_ivf():
+                return self._search_ivf(queries, top_k)
+            return self._search_flat(queries, top_k)
+
+    def _search_flat(self, queries: np.ndarray, top_k: int) -> List[List[Dict]]:
+        data = self.vectors
+        results: List[List[Dict]] = []
+        step = max(1, _MAX_SCORE_ELEMENTS // len(data))
+        for start in range(0, len(queries), step):
+            scores = queries[start : start + step] @ data.T
+            if self._deleted_count:
+                scores[:, ~self._live[: self._size]] = -np.inf
+            rows, top_scores = _top_k(scores, top_k)
+            results.extend(self._hits(r, s) for r, s in zip(rows, top_scores))
+        return results
+
+    def _search_ivf(self, queries: np.ndarray, top_k: int) -> List[List[Dict]]:
+        data = self.vectors
+        lists = self._ivf_lists()
+        nprobe = min(self.nprobe, len(lists))
+        probes, _ = _top_k(queries @ self._centroids.T, nprobe)
+        results: List[List[Dict]] = []
+        for query, probe in zip(queries, probes):
+            candidates = np.concatenate([lists[j] for j in probe])
+            if self._deleted_count:
+                candidates = candidates[self._live[candidates]]
+            if len(candidates) == 0:
+                results.append([])
+                continue
+            scores = (data[candidates] @ query).reshape(1, -1)
+            idx, top_scores = _top_k(scores, top_k)
+            results.append(self._hits(candidates[idx[0]], top_scores[0]))
+        return results
+
+    # ---------- 持久化 ----------
+    #
+    # 目录布局：
+    #   meta.json          紧凑 JSON：格式版本、当前代目录名、形状、参数、ids 与 metadatas（不含文本）
+    #   gen-<id>/          一次 persist 写出的数据文件，写完后才由 meta.json 指向：
+    #     vectors.f32      行优先的裸 little-endian float32 矩阵，从偏移 0 开始（页对齐）
+    #     centroids.f32    IVF 簇中心（仅在已训练时存在）
+    #     assignments.i32  每行所属簇
+    #     texts.bin        各行块文本的 UTF-8 字节首尾相接
+    #     texts.idx        (count + 1) 个 little-endian int64 偏移，第 i 行文本为 [idx[i], idx[i+1])
+    # meta.json 以 os.replace 原子替换，是唯一的提交点：加载方要么读到旧代、要么读到新代，
+    # 不会把新 meta 与旧数据（或反之）拼在一起。保留上一代目录，供正在加载的进程读完。
+    # 加载时用 np.memmap 只读映射，多个 worker 进程共享同一份页缓存；
+    # 文本只在检索命中时按行解码，meta.json 的大小与正文长度无关。
+
+    def persist(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, _META_FILE)
+        previous = _read_generation(meta_path)
+        # 每次持久化写入新的代目录，已加载旧代的进程不受影响
+        generation = f"{_GENERATION_PREFIX}{time.time_ns():x}-{uuid.uuid4().hex[:8]}"
+        gen_path = os.path.join(path, generation)
+        os.makedirs(gen_path)
+        with self._lock:
+            # 墓碑不落盘
+            self.compact()
+            n = self._size
+            files = {_VECTORS_FILE: self.vectors.astype("<f4", copy=False)}
+            if self._centroids is not None:
+                files[_CENTROIDS_FILE] = self._centroids.astype("<f4", copy=False)
+                files[_ASSIGNMENTS_FILE] = self._assignments[:n].astype("<i4", copy=False)
+            meta = {
+                "format_version": FORMAT_VERSION,
+                "generation": generation,
+                "count": n,
+                "dim": self.dim,
+                "metric": self.metric,
+                "index_type": self.index_type,
+                "nlist": self.nlist,
+                "nprobe": self.nprobe,
+                "ivf_threshold": self.ivf_threshold,
+                "ivf_built_size": self._ivf_built_size if self._centroids is not None else 0,
+                "nclusters": len(self._centroids) if self._centroids is not None else 0,
+                # 复制一份：json.dump 在锁外执行，期间的写入不能混进本代
+                "ids": list(self._ids),
+                "metadatas": list(self._metadatas),
+            }
+            for name, array in files.items():
+                with open(os.path.join(gen_path, name), "wb") as f:
+                    np.ascontiguousarray(array).tofile(f)
+            self._write_texts(gen_path, n)
+        # meta.json 原子替换，是指向当前代的唯一入口；替换前读到旧 meta 的进程加载的仍是完整的旧代
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, meta_path)
+        self._generation = generation
+        _remove_stale_generations(path, keep={generation, previous})
+
+    def _write_texts(self, path: str, n: int) -> None:
+        offsets = np.empty(n + 1, dtype="<i8")
+        offsets[0] = 0
+        with open(os.path.join(path, _TEXTS_FILE), "wb") as f:
+            # 逐行写入，已落盘的行直接拷贝字节，不经过解码
+            for row in range(n):
+                data = self._text_bytes(row)
+                f.write(data)
+                offsets[row + 1] = offsets[row] + len(data)
+        with open(os.path.join(path, _TEXT_OFFSETS_FILE), "wb") as f:
+            offsets.tofile(f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "NumpyVectorStore":
+        """加载索引；mmap=True 时向量以只读 memmap 映射，首次写入时才复制到内存。"""
+        with open(os.path.join(path, _META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        version = meta.get("format_version")
+        if version not in (1, 2, FORMAT_VERSION):
+            raise ValueError(f"unsupported vector index format: {meta.get('format_version')}")
+        store = cls(
+            dim=meta["dim"],
+            metric=meta["metric"],
+            index_type=meta["index_type"],
+            nlist=meta["nlist"],
+            nprobe=meta["nprobe"],
+            ivf_threshold=meta["ivf_threshold"],
+        )
+        n = meta["count"]
+        # 格式 3 起数据文件位于 meta 指向的代目录；更早的格式直接放在 path 下
+        data_path = os.path.join(path, meta["generation"]) if meta.get("generation") else path
+
+        def read(name, dtype, shape):
+            file_path = os.path.join(data_path, name)
+            if shape[0] == 0:
+                return np.empty(shape, dtype=dtype)
+            if mmap:
+                return np.memmap(file_path, dtype=dtype, mode="r", shape=shape)
+            return np.fromfile(file_path, dtype=dtype).reshape(shape)
+
+        store._vectors = read(_VECTORS_FILE, "<f4", (n, meta["dim"] or 0))
+        store._size = n
+        store._live = np.ones(n, dtype=bool)
+        if meta.get("nclusters"):
+            store._centroids = read(_CENTROIDS_FILE, "<f4", (meta["nclusters"], meta["dim"]))
+            store._assignments = read(_ASSIGNMENTS_FILE, "<i4", (n,))
+            store._ivf_built_size = meta["ivf_built_size"]
+        else:
+            store._assignments = np.full(n, -1, dtype=np.int32)
+        store._ids = list(meta["ids"])
+        store._metadatas = list(meta["metadatas"])
+        if version == 1:
+            # 旧格式的文本在 metadata 中，下次 persist 时转存到 texts.bin
+            store._texts = [str(metadata.pop("text", "")) for metadata in store._metadatas]
+        else:
+            store._text_offsets = read(_TEXT_OFFSETS_FILE, "<i8", (n + 1,))
+            store._text_data = read(_TEXTS_FILE, np.uint8, (int(store._text_offsets[-1]),))
+            store._texts = list(range(n))
+        store._id_to_row = {doc_id: row for row, doc_id in enumerate(store._ids)}
+        store._generation = meta.get("generation")
+        return store
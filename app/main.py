@@ -2,11 +2,20 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.db.session import init_db
+from app.core.metrics import MetricsMiddleware
+from app.db.leak_check import ConnectionLeakMiddleware
+from app.db.session import async_engine, init_db
+from app.knowledge.llm import close_llm_client
+from app.services.presence import presence
+from app.services.session_cache import session_cache, session_cache_sync
+from app.services.session_reaper import session_reaper
 # include routers
 from app.api.v1.routes import auth as auth_router
-# openapi utils
-from app.utils_openapi import generate_openapi_json
+from app.api.v1.routes import directory as directory_router
+from app.api.v1.routes import internal as internal_router
+from app.api.v1.routes import metrics as metrics_router
+from app.api.v1.routes import presence as presence_router
+from app.api.v1.routes import rag as rag_router
 
 
 
@@ -14,9 +23,23 @@ from app.utils_openapi import generate_openapi_json
 async def lifespan(app: FastAPI):
     # initialize DB / indexes if needed
     init_db()
-    # 生成 openapi.json
-    generate_openapi_json(app, output_path="openapi.json")
+    # openapi.json 不在启动时生成：/openapi.json 首次请求时生成并缓存，
+    # 导出文件使用 `python -m app.utils_openapi`
+    # 后台清理过期 session
+    if settings.SESSION_REAPER_ENABLED:
+        session_reaper.start()
+    # 同步其他 worker 写入的 session 缓存失效记录
+    if session_cache.enabled and settings.SESSION_CACHE_SYNC_SECONDS > 0:
+        session_cache_sync.start()
+    # 在线状态批量写回
+    if settings.PRESENCE_ENABLED:
+        presence.start()
     yield
+    await presence.stop()
+    await session_cache_sync.stop()
+    await session_reaper.stop()
+    await close_llm_client()
+    await async_engine.dispose()
 
 
 
@@ -34,8 +57,21 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# 测试模式下检测请求结束后未归还的数据库连接
+if settings.DB_LEAK_CHECK:
+    app.add_middleware(ConnectionLeakMiddleware)
+
+# 请求延迟、在途数与每请求 SQL 统计，经 /metrics 导出
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # register API routers
 app.include_router(auth_router.router, prefix="/api/auth", tags=["auth"])
+app.include_router(directory_router.router, prefix="/api/directory", tags=["directory"])
+app.include_router(presence_router.router, prefix="/api/presence", tags=["presence"])
+app.include_router(rag_router.router, prefix="/api/rag", tags=["rag"])
+app.include_router(internal_router.router, prefix="/internal", tags=["internal"])
+app.include_router(metrics_router.router)
 
 
 @app.get("/health")
@@ -1,14 +1,78 @@
-from sqlalchemy import Column, BigInteger, String, Boolean, DateTime, JSON, ForeignKeyConstraint
+import ast
+import json
+
+from sqlalchemy import Column, BigInteger, Integer, String, Boolean, DateTime, JSON, ForeignKeyConstraint, Index
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 from app.models import Base
 
 
+# 角色 -> 位，roles_mask 为所有角色位的按位或；新增角色只能追加，不能改动已有位
+ROLE_BITS = {
+    "user": 1 << 0,
+    "family": 1 << 1,
+    "volunteer": 1 << 2,
+    "expert": 1 << 3,
+    "admin": 1 << 4,
+    "maintainer": 1 << 5,
+}
+
+
+def normalize_roles(value):
+    """把 roles 统一为 list[str]；兼容历史数据中的 JSON 字符串（含二次编码）和 str(list)。
+
+    无法解析的历史值按无角色处理（返回 []），不抛异常。
+    """
+    while isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                return []
+    if not isinstance(value, (list, tuple, set)):
+        return []
+    return list(value)
+
+
+def parse_skills(value):
+    """把库中的 skills 解析为 list[str]，任何输入都不抛异常。
+
+    新数据为 JSON 数组，历史数据为 str(list)；两者都解析失败时，
+    非空的裸字符串（如 '绘画'）视为单个技能，其余返回 []。
+    """
+    if value is None:
+        return []
+    raw = value.strip() if isinstance(value, str) else None
+    if raw is not None:
+        if not raw:
+            return []
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            try:
+                value = ast.literal_eval(raw)
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                return [raw]
+    if isinstance(value, (list, tuple, set)):
+        return [str(skill) for skill in value if skill is not None]
+    return [raw] if raw else []
+
+
+def roles_to_mask(roles) -> int:
+    mask = 0
+    for role in roles:
+        mask |= ROLE_BITS.get(role, 0)
+    return mask
+
 
 # 用户主表
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # SQLite 只有 INTEGER PRIMARY KEY 才会自增
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
     username = Column(String(150), nullable=False, unique=True)
     email = Column(String(320), unique=True)
     gender = Column(String(16), default="hidden")  # ['male', 'female', 'hidden']
@@ -16,12 +80,26 @@ class User(Base):
     nickname = Column(String(255))
     avatar = Column(String(512))
     roles = Column(JSON, nullable=False, default=list, comment="用户角色，JSON 数组（如 ['user', 'admin']，原生 JSON 存储）")
+    # 按位与过滤无法走 B-tree 索引，故不建索引
+    roles_mask = Column(BigInteger, nullable=False, default=0, comment="roles 的位掩码镜像，见 ROLE_BITS")
     status = Column(String(32), default="active")  # ['active', 'banned', 'pending_review']
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=False), server_default=func.now())
     updated_at = Column(DateTime(timezone=False), server_default=func.now(), onupdate=func.now())
 
+    @validates("roles")
+    def _sync_roles_mask(self, key, value):
+        # 每次赋值 roles 时同步 roles_mask，保证两列一致
+        roles = normalize_roles(value)
+        self.roles_mask = roles_to_mask(roles)
+        return roles
+
+    @classmethod
+    def has_any_role(cls, roles):
+        """SQL 过滤条件：用户拥有 roles 中任一角色。"""
+        return cls.roles_mask.op("&")(roles_to_mask(roles)) != 0
+
 
 # 志愿者扩展表
 class VolunteerProfile(Base):
@@ -30,6 +108,11 @@ class VolunteerProfile(Base):
     user_id = Column(BigInteger, primary_key=True, nullable=False, comment="外键，关联 users.id")
     __table_args__ = (
         ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        # 公开名录：按可见性/审核状态过滤后按 user_id 翻页（索引序即翻页序，无需排序）
+        Index("ix_volunteer_profiles_public", "is_public_visible", "status", "user_id"),
+        # 同上，附加在线状态过滤时使用
+        Index("ix_volunteer_profiles_directory", "is_public_visible", "status", "work_status", "user_id"),
+        Index("ix_volunteer_profiles_work_status", "work_status"),
     )
     full_name = Column(String(255))
     phone = Column(String(32))
@@ -39,6 +122,9 @@ class VolunteerProfile(Base):
     skills = Column(String(255), default='[]')  # JSON 字符串数组
     status = Column(String(32), default="pending")  # ['pending', 'approved', 'rejected']
     work_status = Column(String(32), default="offline")  # ['online', 'busy', 'offline']
+    # 写入 work_status 的进程与租约到期时间（见 app.services.presence），过期的在线状态视为残留
+    presence_owner = Column(String(64))
+    presence_expires_at = Column(DateTime(timezone=False))
 
 
 # 专家扩展表
@@ -48,6 +134,7 @@ class ExpertProfile(Base):
     user_id = Column(BigInteger, primary_key=True, nullable=False, comment="外键，关联 users.id")
     __table_args__ = (
         ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        Index("ix_expert_profiles_status", "status", "user_id"),
     )
     full_name = Column(String(255))
     phone = Column(String(32))
@@ -58,9 +145,27 @@ class ExpertProfile(Base):
     status = Column(String(32), default="pending")
 
 
+# 技能标签表：profile.skills 的规范化拆分，(profile_type, skill, user_id) 主键即按技能查人的索引
+class SkillTag(Base):
+    __tablename__ = "skill_tags"
+    __table_args__ = (
+        ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        Index("ix_skill_tags_user_id", "user_id"),
+    )
+
+    profile_type = Column(String(16), primary_key=True)  # ['volunteer', 'expert']
+    skill = Column(String(64), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+
+
 # Session 会话表
 class Session(Base):
     __tablename__ = "sessions"
+    __table_args__ = (
+        # 按用户查/清理会话，以及按过期时间批量清理
+        Index("ix_sessions_user_id_expired_at", "user_id", "expired_at"),
+        Index("ix_sessions_expired_at", "expired_at"),
+    )
 
     session_id = Column(String(128), primary_key=True)
     user_id = Column(BigInteger)
@@ -68,3 +173,17 @@ class Session(Base):
     expired_at = Column(DateTime(timezone=False))
     user_agent = Column(String(255))
     ip = Column(String(64))
+
+
+# session 缓存失效记录：登出、用户资料变更/删除时与业务修改同一事务写入，
+# 各 worker 按 id 递增轮询并清除本进程缓存（见 app/services/session_cache.py）
+class SessionRevocation(Base):
+    __tablename__ = "session_revocations"
+    __table_args__ = (
+        Index("ix_session_revocations_created_at", "created_at"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, comment="非空时清除该用户的全部 session 缓存")
+    session_id = Column(String(128), comment="非空时清除单个 session 缓存")
+    created_at = Column(DateTime(timezone=False), nullable=False)
@@ -0,0 +1,18 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+
+class HeartbeatIn(BaseModel):
+    # 不传时只刷新存活时间；服务端为 busy 时传 online 也不会恢复空闲，需调用 /release
+    status: Optional[Literal["online", "busy"]] = None
+
+
+class PresenceOut(BaseModel):
+    user_id: int
+    work_status: Literal["online", "busy", "offline"]
+
+
+class MatchOut(BaseModel):
+    user_id: int
+    skill: Optional[str] = None
@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+
+
+class RAGAskIn(BaseModel):
+    query: str = Field(..., min_length=1, max_length=2000)
+    top_k: int = Field(3, ge=1, le=20)
@@ -1,7 +1,8 @@
-from typing import Optional, List, Literal, Union
+from typing import Optional, List, Literal
 from pydantic import BaseModel, model_validator, field_validator
 from datetime import datetime
-import json
+
+from app.models.user import normalize_roles, parse_skills
 
 # 用户角色类型
 UserRole = Literal["family", "volunteer", "expert", "admin", "maintainer"]
@@ -77,6 +78,11 @@ class VolunteerProfileOut(VolunteerProfileCreate):
     class Config:
         from_attributes = True
 
+    @field_validator("skills", mode="before")
+    @classmethod
+    def coerce_skills(cls, v):
+        return parse_skills(v)
+
 
 class ExpertProfileOut(ExpertProfileCreate):
     user_id: int
@@ -85,6 +91,11 @@ class ExpertProfileOut(ExpertProfileCreate):
     class Config:
         from_attributes = True
 
+    @field_validator("skills", mode="before")
+    @classmethod
+    def coerce_skills(cls, v):
+        return parse_skills(v)
+
 
 class UserOut(UserBase):
     id: int
@@ -97,12 +108,18 @@ class UserOut(UserBase):
     @field_validator("roles", mode="before")
     @classmethod
     def parse_roles(cls, v):
-        """只做 json.loads，保证 roles 为 List[str]"""
+        """兼容历史数据中的字符串 roles，保证 roles 为 List[str]"""
         if isinstance(v, str):
-            return json.loads(v)
+            return normalize_roles(v)
         return v
 
 
+# 移动端登录返回：用户信息 + session_id
+class UserLoginOut(BaseModel):
+    user: UserOut
+    session_id: str
+
+
 # Session Pydantic 模型
 class SessionBase(BaseModel):
     session_id: str
@@ -143,3 +160,23 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
     user_id: Optional[int] = None
+
+
+# 公开名录条目：不含 phone 等非公开字段
+class DirectoryEntryOut(BaseModel):
+    user_id: int
+    profile_type: Literal["volunteer", "expert"]
+    full_name: Optional[str] = None
+    nickname: Optional[str] = None
+    avatar: Optional[str] = None
+    public_email: Optional[str] = None
+    skills: List[str] = []
+    status: Optional[str] = None
+    work_status: Optional[str] = None
+    title: Optional[str] = None
+    org: Optional[str] = None
+
+
+class DirectoryPageOut(BaseModel):
+    items: List[DirectoryEntryOut]
+    next_cursor: Optional[int] = None  # 为空表示没有下一页
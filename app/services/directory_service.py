@@ -0,0 +1,120 @@
+"""志愿者/专家公开名录查询。
+
+- 技能存入 skill_tags（每个技能一行），按技能筛选走 (profile_type, skill, user_id) 主键，
+  不再对每一行 profile 做 json.loads。
+- 翻页使用 keyset：WHERE user_id > cursor ORDER BY user_id LIMIT n+1，
+  每页的查询代价只与页大小有关，与翻到第几页无关。
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.user import ExpertProfile, SkillTag, User, VolunteerProfile, parse_skills
+
+PROFILE_MODELS = {"volunteer": VolunteerProfile, "expert": ExpertProfile}
+_SKILL_MAX_LENGTH = 64
+
+
+def normalize_skills(skills) -> List[str]:
+    """技能去空白、去重（保持顺序）、截断到列宽；字符串形式交给 parse_skills，不会抛异常。"""
+    if isinstance(skills, str):
+        skills = parse_skills(skills)
+    result = []
+    for skill in skills or []:
+        skill = str(skill).strip()[:_SKILL_MAX_LENGTH]
+        if skill and skill not in result:
+            result.append(skill)
+    return result
+
+
+def skill_tag_rows(profile_type: str, user_id: int, skills) -> List[Dict]:
+    return [{"profile_type": profile_type, "user_id": user_id, "skill": s} for s in normalize_skills(skills)]
+
+
+async def sync_skill_tags(db: AsyncSession, profile_type: str, user_id: int, skills: Iterable[str]) -> None:
+    """用 skills 覆盖该用户的技能标签；不提交，由调用方控制事务。"""
+    await db.execute(
+        delete(SkillTag).where(SkillTag.profile_type == profile_type, SkillTag.user_id == user_id)
+    )
+    rows = skill_tag_rows(profile_type, user_id, skills)
+    if rows:
+        await db.execute(insert(SkillTag), rows)
+
+
+async def get_skill_tags(db: AsyncSession, profile_type: str, user_id: int) -> List[str]:
+    rows = await db.execute(
+        select(SkillTag.skill).where(SkillTag.profile_type == profile_type, SkillTag.user_id == user_id)
+    )
+    return list(rows.scalars().all())
+
+
+def _entry(profile_type: str, profile, nickname: Optional[str], avatar: Optional[str]) -> Dict:
+    entry = {
+        "user_id": profile.user_id,
+        "profile_type": profile_type,
+        "full_name": profile.full_name,
+        "nickname": nickname,
+        "avatar": avatar,
+        "public_email": profile.public_email,
+        "skills": normalize_skills(profile.skills),
+        "status": profile.status,
+    }
+    if profile_type == "volunteer":
+        entry["work_status"] = profile.work_status
+    else:
+        entry["title"] = profile.title
+        entry["org"] = profile.org
+    return entry
+
+
+def directory_query(
+    profile_type: str = "volunteer",
+    skill: Optional[str] = None,
+    status: str = "approved",
+    work_status: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = 20,
+):
+    """名录分页查询，结果按 user_id 升序；多取一条用于判断是否还有下一页。"""
+    model = PROFILE_MODELS[profile_type]
+    query = (
+        select(model, User.nickname, User.avatar)
+        .join(User, User.id == model.user_id)
+        .where(model.status == status)
+    )
+    if profile_type == "volunteer":
+        # 名录只展示本人同意公开的志愿者
+        query = query.where(model.is_public_visible.is_(True))
+        if work_status:
+            query = query.where(model.work_status == work_status)
+    key = model.user_id
+    if skill:
+        query = query.join(
+            SkillTag,
+            (SkillTag.user_id == model.user_id)
+            & (SkillTag.profile_type == profile_type)
+            & (SkillTag.skill == skill.strip()),
+        )
+        # 按技能过滤时以 skill_tags 主键 (profile_type, skill, user_id) 驱动，按其 user_id 排序与翻页
+        key = SkillTag.user_id
+    # user_id 从 1 开始；首页也带上范围条件，让优化器按索引顺序扫描而不是排序
+    query = query.where(key > (cursor if cursor is not None else 0))
+    return query.order_by(key).limit(limit + 1)
+
+
+async def list_directory(
+    db: AsyncSession,
+    profile_type: str = "volunteer",
+    skill: Optional[str] = None,
+    status: str = "approved",
+    work_status: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = 20,
+) -> Dict:
+    query = directory_query(profile_type, skill, status, work_status, cursor, limit)
+    rows = (await db.execute(query)).all()
+    items = [_entry(profile_type, profile, nickname, avatar) for profile, nickname, avatar in rows[:limit]]
+    next_cursor = items[-1]["user_id"] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,394 @@
+"""志愿者实时在线状态。
+
+- 志愿者客户端定时发送心跳，状态只在进程内维护；超过 ttl 未心跳视为离线。
+- 按技能维护“空闲志愿者”集合（列表 + 下标字典），加入/移除/随机挑选均为 O(1)，
+  为家庭匹配志愿者时无需轮询 volunteer_profiles 表。
+- 状态变化只记入待写集合，由 lifespan 启动的后台任务按间隔批量写回
+  work_status 列（同一用户多次变化只写最后一次），名录等按列查询的接口最终一致。
+- 多 worker 部署时每个进程各有一份登记表。写回 online/busy 时同时写入本进程标识
+  (presence_owner) 与租约到期时间，并在租约过半时续期；写 offline 只作用于本进程
+  持有（或无人持有）的行。启动时和续期时只清理租约已过期的行（如进程崩溃后的残留），
+  不会覆盖其它存活 worker 维护的状态。
+- 匹配时先在库中以条件更新认领志愿者（claim），同一志愿者被多个 worker 登记时
+  也只会被匹配一次。
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import VolunteerProfile
+
+logger = logging.getLogger(__name__)
+
+ONLINE = "online"
+BUSY = "busy"
+OFFLINE = "offline"
+_ANY = None  # 不限技能的空闲集合
+
+
+def _utcnow() -> datetime:
+    # 与其它 DateTime(timezone=False) 列一致，库中保存不带时区的 UTC 时间
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _IndexedSet:
+    """支持 O(1) 增删与随机取元素的集合。"""
+
+    __slots__ = ("_items", "_index")
+
+    def __init__(self):
+        self._items: List[int] = []
+        self._index: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: int) -> None:
+        if item not in self._index:
+            self._index[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item: int) -> None:
+        pos = self._index.pop(item, None)
+        if pos is None:
+            return
+        last = self._items.pop()
+        if pos < len(self._items):
+            # 用末尾元素填补空位
+            self._items[pos] = last
+            self._index[last] = pos
+
+    def choice(self, rng: random.Random) -> Optional[int]:
+        if not self._items:
+            return None
+        return self._items[rng.randrange(len(self._items))]
+
+
+class PresenceRegistry:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        ttl_seconds: float = 90,
+        flush_interval_seconds: float = 5,
+        flush_batch_size: int = 500,
+        clock: Callable[[], float] = time.monotonic,
+        owner: Optional[str] = None,
+    ):
+        self.session_factory = session_factory
+        # 本进程标识，写入 presence_owner；租约时长与心跳超时一致
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[-64:]
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_batch_size = flush_batch_size
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._status: Dict[int, str] = {}
+        self._skills: Dict[int, Tuple[str, ...]] = {}
+        # 按最近心跳时间排序，过期检查只需从头部开始
+        self._last_seen: "OrderedDict[int, float]" = OrderedDict()
+        self._available: Dict[Optional[str], _IndexedSet] = {_ANY: _IndexedSet()}
+        self._dirty: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_renew: Optional[float] = None
+        # 指标
+        self.heartbeats = 0
+        self.matches = 0
+        self.match_misses = 0
+        self.expired = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.last_flush_seconds = 0.0
+        self.claim_conflicts = 0
+        self.reclaimed = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        with self._lock:
+            return user_id in self._status
+
+    def status(self, user_id: int) -> str:
+        with self._lock:
+            return self._status.get(user_id, OFFLINE)
+
+    def _index(self, user_id: int, available: bool) -> None:
+        keys = (_ANY,) + self._skills.get(user_id, ())
+        for key in keys:
+            if available:
+                self._available.setdefault(key, _IndexedSet()).add(user_id)
+            else:
+                bucket = self._available.get(key)
+                if bucket is not None:
+                    bucket.discard(user_id)
+                    if key is not _ANY and not bucket:
+                        del self._available[key]
+
+    def _set_status(self, user_id: int, status: str) -> None:
+        previous = self._status.get(user_id, OFFLINE)
+        if status == OFFLINE:
+            self._index(user_id, False)
+            self._status.pop(user_id, None)
+            self._skills.pop(user_id, None)
+            self._last_seen.pop(user_id, None)
+        else:
+            self._status[user_id] = status
+            self._index(user_id, status == ONLINE)
+        if status != previous:
+            self._dirty[user_id] = status
+
+    def heartbeat(self, user_id: int, status: Optional[str] = None, skills: Optional[Iterable[str]] = None) -> str:
+        """记录心跳并返回当前状态。
+
+        status 为 None 时只刷新存活时间（未登记的用户视为 online）；
+        心跳不会把 busy 降为 online，被匹配后只能由 release() 恢复空闲。
+        skills 为 None 时沿用已登记的技能。
+        """
+        with self._lock:
+            self.heartbeats += 1
+            current = self._status.get(user_id)
+            if current == BUSY or (status is None and current is not None):
+                status = current
+            status = status or ONLINE
+            if skills is not None:
+                # 技能变化时先从旧技能集合中移除
+                self._index(user_id, False)
+                self._skills[user_id] = tuple(skills)
+            self._set_status(user_id, status)
+            self._last_seen[user_id] = self.clock()
+            self._last_seen.move_to_end(user_id)
+            return status
+
+    def set_offline(self, user_id: int) -> None:
+        with self._lock:
+            self._set_status(user_id, OFFLINE)
+            # 未登记的用户（如重启后）库中可能仍为 online，同样需要写回；
+            # flush 时只会覆盖本进程持有或无人持有的行
+            self._dirty[user_id] = OFFLINE
+
+    def pick(self, skill: Optional[str] = None) -> Optional[int]:
+        """随机挑选一名空闲志愿者并置为 busy，返回 user_id；无人可用时返回 None。"""
+        with self._lock:
+            bucket = self._available.get(skill or _ANY)
+            user_id = bucket.choice(self._rng) if bucket is not None else None
+            if user_id is None:
+                self.match_misses += 1
+                return None
+            self.matches += 1
+            self._set_status(user_id, BUSY)
+            return user_id
+
+    def forget(self, user_id: int) -> None:
+        """只从本进程登记表中移除，不写库（状态由其它 worker 维护）。"""
+        with self._lock:
+            self._index(user_id, False)
+            self._status.pop(user_id, None)
+            self._skills.pop(user_id, None)
+            self._last_seen.pop(user_id, None)
+            self._dirty.pop(user_id, None)
+
+    async def claim(self, db: AsyncSession, user_id: int) -> bool:
+        """pick() 之后在库中认领该志愿者：已被其它 worker 置为 busy 时返回 False 并移出本地登记。"""
+        result = await db.execute(
+            update(VolunteerProfile)
+            .where(
+                VolunteerProfile.user_id == user_id,
+                or_(
+                    VolunteerProfile.work_status.is_(None),
+                    VolunteerProfile.work_status != BUSY,
+                    VolunteerProfile.presence_owner == self.owner,
+                    VolunteerProfile.presence_expires_at < _utcnow(),
+                ),
+            )
+            .values(**self._lease_values(BUSY))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        if result.rowcount:
+            return True
+        with self._lock:
+            self.claim_conflicts += 1
+        self.forget(user_id)
+        return False
+
+    def release(self, user_id: int) -> None:
+        """服务结束，busy -> online（已离线则忽略）。"""
+        with self._lock:
+            if self._status.get(user_id) == BUSY:
+                self._set_status(user_id, ONLINE)
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """将超过 ttl 未心跳的志愿者置为离线，返回人数。"""
+        now = self.clock() if now is None else now
+        cutoff = now - self.ttl_seconds
+        expired = 0
+        with self._lock:
+            while self._last_seen:
+                user_id, seen = next(iter(self._last_seen.items()))
+                if seen > cutoff:
+                    break
+                self._set_status(user_id, OFFLINE)
+                expired += 1
+            self.expired += expired
+        return expired
+
+    def _lease_values(self, status: str) -> Dict:
+        if status == OFFLINE:
+            return {"work_status": OFFLINE, "presence_owner": None, "presence_expires_at": None}
+        return {
+            "work_status": status,
+            "presence_owner": self.owner,
+            "presence_expires_at": _utcnow() + timedelta(seconds=self.ttl_seconds),
+        }
+
+    def renew(self) -> None:
+        """把已登记用户重新记入待写集合，下次 flush 时续期租约（也修复被误清理的行）。"""
+        with self._lock:
+            self._dirty.update(self._status)
+            self._last_renew = self.clock()
+
+    def flush(self) -> int:
+        """把待写状态批量写回 volunteer_profiles.work_status，返回写入的用户数。"""
+        with self._lock:
+            pending, self._dirty = self._dirty, {}
+        if not pending:
+            return 0
+        started = time.perf_counter()
+        by_status: Dict[str, List[int]] = {}
+        for user_id, status in pending.items():
+            by_status.setdefault(status, []).append(user_id)
+        db = self.session_factory()
+        try:
+            for status, user_ids in by_status.items():
+                values = self._lease_values(status)
+                for i in range(0, len(user_ids), self.flush_batch_size):
+                    query = update(VolunteerProfile).where(
+                        VolunteerProfile.user_id.in_(user_ids[i:i + self.flush_batch_size])
+                    )
+                    if status == OFFLINE:
+                        # 不覆盖其它 worker 仍在维护的行
+                        query = query.where(or_(
+                            VolunteerProfile.presence_owner.is_(None),
+                            VolunteerProfile.presence_owner == self.owner,
+                        ))
+                    db.execute(query.values(**values).execution_options(synchronize_session=False))
+            db.commit()
+        except Exception:
+            db.rollback()
+            # 写失败时放回待写集合，期间更新过的用户以新状态为准
+            with self._lock:
+                for user_id, status in pending.items():
+                    self._dirty.setdefault(user_id, status)
+            raise
+        finally:
+            db.close()
+        self.flushes += 1
+        self.rows_written += len(pending)
+        self.last_flush_seconds = time.perf_counter() - started
+        return len(pending)
+
+    def reclaim_expired(self) -> int:
+        """把租约已过期（或没有租约）的 online/busy 行置为 offline，返回更新行数。
+
+        在线状态只存在于进程内，进程退出或崩溃后库中残留的状态已无心跳支撑；
+        存活的 worker 会按时续期，它们维护的行不受影响。
+        """
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                update(VolunteerProfile)
+                .where(
+                    VolunteerProfile.work_status != OFFLINE,
+                    or_(
+                        VolunteerProfile.presence_expires_at.is_(None),
+                        VolunteerProfile.presence_expires_at < _utcnow(),
+                    ),
+                )
+                .values(**self._lease_values(OFFLINE))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        self.reclaimed += result.rowcount
+        return result.rowcount
+
+    async def run(self) -> None:
+        while True:
+            try:
+                # 启动时及每半个租约周期：清理过期残留，并续期本进程持有的行
+                if self._last_renew is None or self.clock() - self._last_renew >= self.ttl_seconds / 2:
+                    # 数据库操作为同步调用，放到线程中执行，避免阻塞事件循环
+                    reclaimed = await asyncio.to_thread(self.reclaim_expired)
+                    if reclaimed:
+                        logger.info("presence reclaimed %d stale work_status rows", reclaimed)
+                    self.renew()
+                self.expire()
+                await asyncio.to_thread(self.flush)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("presence flush failed")
+            await asyncio.sleep(self.flush_interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 进程退出后心跳无人接收，本进程登记的志愿者置为离线后写回（只覆盖本进程持有的行）
+        with self._lock:
+            for user_id in list(self._status):
+                self._set_status(user_id, OFFLINE)
+        try:
+            await asyncio.to_thread(self.flush)
+        except Exception:
+            logger.exception("presence final flush failed")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            online = len(self._available[_ANY])
+            tracked = len(self._status)
+            return {
+                "tracked": tracked,
+                "online": online,
+                "busy": tracked - online,
+                "skills": len(self._available) - 1,
+                "pending_writes": len(self._dirty),
+                "heartbeats": self.heartbeats,
+                "matches": self.matches,
+                "match_misses": self.match_misses,
+                "expired": self.expired,
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "last_flush_seconds": self.last_flush_seconds,
+                "claim_conflicts": self.claim_conflicts,
+                "reclaimed": self.reclaimed,
+            }
+
+
+presence = PresenceRegistry(
+    ttl_seconds=settings.PRESENCE_TTL_SECONDS,
+    flush_interval_seconds=settings.PRESENCE_FLUSH_INTERVAL_SECONDS,
+    flush_batch_size=settings.PRESENCE_FLUSH_BATCH_SIZE,
+)
@@ -0,0 +1,249 @@
+"""进程内 session -> user 缓存。
+
+`get_current_user_from_context` 命中缓存时直接返回用户快照，不再访问数据库。
+缓存为有界 LRU，每个条目的过期时间取 TTL 与 session 自身过期时间的较小值，
+写入时一次性计算，读取时只比较时间戳。
+
+多 worker 部署时每个进程各有一份缓存：登出、用户资料变更/删除除了清除本进程缓存，
+还通过 `record_revocation` 在同一事务中写入 session_revocations 表；
+lifespan 启动的 `SessionCacheSync` 按 SESSION_CACHE_SYNC_SECONDS 间隔读取新增记录并清除
+本进程的对应条目，其他 worker 的失效延迟由 TTL 缩短为一个同步间隔，命中路径仍不访问数据库。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import SessionRevocation, User
+
+logger = logging.getLogger(__name__)
+
+
+def _to_timestamp(expired_at: Optional[datetime]) -> Optional[float]:
+    """数据库中的 naive datetime 按 UTC 处理，转换为 epoch 秒。"""
+    if expired_at is None:
+        return None
+    if expired_at.tzinfo is None:
+        expired_at = expired_at.replace(tzinfo=timezone.utc)
+    return expired_at.timestamp()
+
+
+class SessionCache:
+    """线程安全的 TTL + LRU 缓存，key 为 session_id，value 为用户列快照。"""
+
+    def __init__(self, maxsize: int = 10000, ttl_seconds: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        # session_id -> (deadline, user_id, user 列值)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict]]" = OrderedDict()
+        # user_id -> {session_id}，按用户失效时无需扫描全表
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl_seconds > 0
+
+    def get(self, session_id: str) -> Optional[User]:
+        """命中返回一个新的 detached User 实例，未命中或已过期返回 None。"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            deadline, _, values = entry
+            if deadline <= now:
+                self._remove(session_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+        # 每次命中都构造独立实例，避免多个请求共享同一个 ORM 对象
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def set(self, session_id: str, user: User, expired_at: Optional[datetime] = None) -> None:
+        if not self.enabled:
+            return
+        deadline = time.time() + self.ttl_seconds
+        session_deadline = _to_timestamp(expired_at)
+        if session_deadline is not None:
+            deadline = min(deadline, session_deadline)
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        user_id = values["id"]
+        with self._lock:
+            self._remove(session_id)
+            self._entries[session_id] = (deadline, user_id, values)
+            self._by_user.setdefault(user_id, set()).add(session_id)
+            while len(self._entries) > self.maxsize:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, session_id: str) -> None:
+        """调用方需持有锁。"""
+        entry = self._entries.pop(session_id, None)
+        if entry is None:
+            return
+        sids = self._by_user.get(entry[1])
+        if sids is not None:
+            sids.discard(session_id)
+            if not sids:
+                del self._by_user[entry[1]]
+
+    def invalidate(self, session_id: str) -> None:
+        with self._lock:
+            self._remove(session_id)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """清除某个用户的全部 session 条目（用户资料变更/删除时调用）。"""
+        with self._lock:
+            for sid in list(self._by_user.get(user_id, ())):
+                self._remove(sid)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = len(self._entries)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _utcnow() -> datetime:
+    # 数据库中存的是 naive UTC 时间
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record_revocation(db, user_id: Optional[int] = None, session_id: Optional[str] = None) -> None:
+    """在调用方的事务中写入一条失效记录，随业务修改一起提交（同步/异步 Session 均可）。"""
+    db.add(SessionRevocation(user_id=user_id, session_id=session_id, created_at=_utcnow()))
+
+
+class SessionCacheSync:
+    """轮询 session_revocations，把其他 worker 写入的失效记录应用到本进程缓存。"""
+
+    def __init__(
+        self,
+        cache: SessionCache,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval_seconds: float = 1.0,
+        batch_size: int = 1000,
+    ):
+        self.cache = cache
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        # 已处理的最大记录 id；None 表示尚未初始化
+        self.last_id: Optional[int] = None
+        self.last_synced = 0.0
+        self._task: Optional[asyncio.Task] = None
+        # 指标
+        self.applied = 0
+        self.resets = 0
+
+    def sync(self) -> int:
+        """读取并应用新增的失效记录，返回本次应用的条数。"""
+        now = time.monotonic()
+        db = self.session_factory()
+        try:
+            if self.last_id is None:
+                # 启动时本地缓存为空，此前的记录无需处理
+                self.last_id = db.execute(select(func.max(SessionRevocation.id))).scalar() or 0
+                self.last_synced = now
+                return 0
+            rows = []
+            while True:
+                batch = db.execute(
+                    select(SessionRevocation.id, SessionRevocation.user_id, SessionRevocation.session_id)
+                    .where(SessionRevocation.id > (rows[-1][0] if rows else self.last_id))
+                    .order_by(SessionRevocation.id)
+                    .limit(self.batch_size)
+                ).all()
+                rows.extend(batch)
+                if len(batch) < self.batch_size:
+                    break
+        finally:
+            db.close()
+        if now - self.last_synced > self.cache.ttl_seconds:
+            # 同步中断超过 TTL 时，期间的记录可能已被清理，整体清空最稳妥
+            self.cache.clear()
+            self.resets += 1
+        for _, user_id, session_id in rows:
+            if session_id is not None:
+                self.cache.invalidate(session_id)
+            if user_id is not None:
+                self.cache.invalidate_user(user_id)
+        if rows:
+            self.last_id = rows[-1][0]
+        self.last_synced = now
+        self.applied += len(rows)
+        return len(rows)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                # 数据库操作为同步调用，放到线程中执行，避免阻塞事件循环
+                await asyncio.to_thread(self.sync)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("session cache sync failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "last_id": self.last_id,
+            "applied": self.applied,
+            "resets": self.resets,
+        }
+
+
+session_cache = SessionCache(
+    maxsize=settings.SESSION_CACHE_MAXSIZE,
+    ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS,
+)
+session_cache_sync = SessionCacheSync(
+    session_cache,
+    interval_seconds=settings.SESSION_CACHE_SYNC_SECONDS,
+)
@@ -0,0 +1,141 @@
+"""后台清理过期 session。
+
+login 每次都会写入 sessions 表，过期记录只在读取时被拒绝、从不删除。
+这里由 lifespan 启动一个后台任务，按固定间隔分批删除过期记录，
+每批先按 expired_at 索引取出一批主键再按主键删除，兼容 SQLite/MySQL/PostgreSQL。
+同一任务顺带删除 session_revocations 中已不可能影响任何缓存条目的旧记录。
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import Session as SessionModel, SessionRevocation
+
+logger = logging.getLogger(__name__)
+
+
+class SessionReaper:
+    """分批删除过期 session，并记录每轮清理的条数。"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval_seconds: float = 300,
+        batch_size: int = 1000,
+    ):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        # 失效记录保留时长：超过缓存 TTL 后对应条目必然已过期，留 2 倍余量
+        self.revocation_retention_seconds = 2 * max(
+            settings.SESSION_CACHE_TTL_SECONDS, settings.SESSION_CACHE_SYNC_SECONDS
+        )
+        self._task: Optional[asyncio.Task] = None
+        # 指标
+        self.cycles = 0
+        self.total_purged = 0
+        self.total_revocations_purged = 0
+        self.last_purged = 0
+        self.last_duration_seconds = 0.0
+        self.last_run_at: Optional[datetime] = None
+        self.recent_cycles: deque = deque(maxlen=20)
+
+    def purge_batch(self, db: Session, now: datetime) -> int:
+        """删除至多 batch_size 条过期 session，返回删除条数。"""
+        # 数据库中存的是 naive UTC 时间
+        cutoff = now.astimezone(timezone.utc).replace(tzinfo=None)
+        ids = db.execute(
+            select(SessionModel.session_id)
+            .where(SessionModel.expired_at < cutoff)
+            .limit(self.batch_size)
+        ).scalars().all()
+        if not ids:
+            return 0
+        db.execute(delete(SessionModel).where(SessionModel.session_id.in_(ids)))
+        db.commit()
+        return len(ids)
+
+    def purge_revocations(self, db: Session, now: datetime) -> int:
+        """删除早于保留时长的 session 缓存失效记录，返回删除条数。"""
+        cutoff = now.astimezone(timezone.utc).replace(tzinfo=None) - timedelta(
+            seconds=self.revocation_retention_seconds
+        )
+        result = db.execute(delete(SessionRevocation).where(SessionRevocation.created_at < cutoff))
+        db.commit()
+        return result.rowcount or 0
+
+    def purge_expired(self, now: Optional[datetime] = None) -> int:
+        """执行一轮清理：循环删除直到某一批不满，返回本轮删除总数。"""
+        now = now or datetime.now(timezone.utc)
+        started = time.perf_counter()
+        purged = 0
+        db = self.session_factory()
+        try:
+            while True:
+                n = self.purge_batch(db, now)
+                purged += n
+                if n < self.batch_size:
+                    break
+            self.total_revocations_purged += self.purge_revocations(db, now)
+        finally:
+            db.close()
+        self.cycles += 1
+        self.total_purged += purged
+        self.last_purged = purged
+        self.last_duration_seconds = time.perf_counter() - started
+        self.last_run_at = now
+        self.recent_cycles.append({"at": now.isoformat(), "purged": purged})
+        return purged
+
+    async def run(self) -> None:
+        while True:
+            try:
+                # 数据库操作为同步调用，放到线程中执行，避免阻塞事件循环
+                purged = await asyncio.to_thread(self.purge_expired)
+                if purged:
+                    logger.info("session reaper purged %d expired sessions", purged)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("session reaper cycle failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "cycles": self.cycles,
+            "total_purged": self.total_purged,
+            "total_revocations_purged": self.total_revocations_purged,
+            "last_purged": self.last_purged,
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "recent_cycles": list(self.recent_cycles),
+        }
+
+
+session_reaper = SessionReaper(
+    interval_seconds=settings.SESSION_REAPER_INTERVAL_SECONDS,
+    batch_size=settings.SESSION_REAPER_BATCH_SIZE,
+)
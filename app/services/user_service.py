@@ -1,49 +1,58 @@
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import IntegrityError
+from typing import Optional
 
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import password_hasher
 from app.models.user import User
+from app.services.session_cache import record_revocation, session_cache
 
 
-def create_user(db: Session, user_in):
+async def create_user(db: AsyncSession, user_in, password_hash: Optional[str] = None):
     """
     创建用户，roles 支持多角色，兼容 UserRegisterRequest。
+    password_hash 可由调用方预先计算好传入，未传入时同样在哈希线程池中计算，不阻塞事件循环。
     """
-    from app.services.auth import get_password_hash
-    from app.models.user import User
-    import json
+    if password_hash is None:
+        password_hash = await password_hasher.hash(user_in.password)
     user = User(
         username=user_in.username,
         email=getattr(user_in, "email", None),
         gender=getattr(user_in, "gender", "hidden"),
-        password_hash=get_password_hash(user_in.password),
+        password_hash=password_hash,
         nickname=getattr(user_in, "nickname", None),
         avatar=getattr(user_in, "avatar", None),
-        roles=json.dumps(user_in.roles) if hasattr(user_in, "roles") else '[]',
+        roles=list(getattr(user_in, "roles", None) or []),
         status=getattr(user_in, "status", "active"),
     )
     db.add(user)
-    db.flush()  # 不提交，便于后续 profile 关联
+    await db.flush()  # 不提交，便于后续 profile 关联
     return user
 
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+async def get_user_by_username(db: AsyncSession, username: str):
+    return (await db.execute(select(User).where(User.username == username))).scalars().first()
 
 
-def get_user_by_id(db: Session, user_id: int):
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    return await db.get(User, user_id)
 
 
-def update_user(db: Session, user: User, data: dict):
+async def update_user(db: AsyncSession, user: User, data: dict):
     for field, value in data.items():
         if hasattr(user, field) and value is not None:
             setattr(user, field, value)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    record_revocation(db, user_id=user.id)
+    await db.commit()
+    await db.refresh(user)
+    session_cache.invalidate_user(user.id)
     return user
 
 
-def delete_user(db: Session, user: User):
-    db.delete(user)
-    db.commit()
+async def delete_user(db: AsyncSession, user: User):
+    user_id = user.id
+    await db.delete(user)
+    record_revocation(db, user_id=user_id)
+    await db.commit()
+    session_cache.invalidate_user(user_id)
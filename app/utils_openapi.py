@@ -1,15 +1,33 @@
+"""OpenAPI 文档导出。
+
+运行时 `/openapi.json` 由 FastAPI 在首次请求时生成并缓存在内存中（app.openapi_schema），
+启动阶段不再生成/写文件。需要导出到文件时使用命令行：
+
+    python -m app.utils_openapi --output openapi.json
+"""
+
+import argparse
 import json
 from fastapi import FastAPI
-from fastapi.openapi.utils import get_openapi
-import os
 
 
 def generate_openapi_json(app: FastAPI, output_path: str = "openapi.json"):
-    openapi_schema = get_openapi(
-        title=app.title,
-        version=app.version if hasattr(app, 'version') else "1.0.0",
-        description=app.description if hasattr(app, 'description') else None,
-        routes=app.routes,
-    )
+    # app.openapi() 与 /openapi.json 返回同一份（已缓存的）schema
+    openapi_schema = app.openapi()
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(openapi_schema, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="导出 OpenAPI schema 到文件")
+    parser.add_argument("--output", "-o", default="openapi.json", help="输出路径（默认 openapi.json）")
+    args = parser.parse_args(argv)
+
+    from app.main import app
+
+    generate_openapi_json(app, output_path=args.output)
+    print(f"OpenAPI schema written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Backfill users.roles_mask for databases created before the column existed.
+
+- init_db adds the roles_mask column and backfills it
+  (app/db/migrations.py), so this script is no longer needed for that
+- rewrites legacy string roles ('["family"]', "['family']") as native JSON lists
+- recomputes roles_mask from roles
+
+Run with: `python scripts/backfill_roles_mask.py`
+"""
+from sqlalchemy import select
+
+from app.db.session import SessionLocal, init_db
+from app.models.user import User, normalize_roles, roles_to_mask
+
+
+def main():
+    # 加列并回填 roles_mask
+    init_db()
+
+    db = SessionLocal()
+    updated = 0
+    try:
+        for user in db.execute(select(User)).scalars():
+            roles = normalize_roles(user.roles)
+            if user.roles != roles or user.roles_mask != roles_to_mask(roles):
+                user.roles = roles  # 触发 roles_mask 同步
+                updated += 1
+        db.commit()
+    finally:
+        db.close()
+    print(f"roles_mask backfilled for {updated} users.")
+
+
+if __name__ == "__main__":
+    main()
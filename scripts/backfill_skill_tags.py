@@ -0,0 +1,37 @@
+"""Backfill skill_tags from volunteer/expert profile skills.
+
+- creates the skill_tags table and the directory indexes if they are missing
+- rebuilds every profile's tags from its `skills` column (JSON or legacy str(list))
+
+Run with: `python scripts/backfill_skill_tags.py`
+"""
+from sqlalchemy import delete, insert, select
+
+from app.db.session import SessionLocal, init_db
+from app.models.user import ExpertProfile, SkillTag, VolunteerProfile
+from app.services.directory_service import skill_tag_rows
+
+
+def main():
+    # 建表并补建 ix_volunteer_profiles_directory 等索引
+    init_db()
+
+    db = SessionLocal()
+    total = 0
+    try:
+        for profile_type, model in (("volunteer", VolunteerProfile), ("expert", ExpertProfile)):
+            db.execute(delete(SkillTag).where(SkillTag.profile_type == profile_type))
+            rows = []
+            for user_id, skills in db.execute(select(model.user_id, model.skills)):
+                rows.extend(skill_tag_rows(profile_type, user_id, skills))
+            if rows:
+                db.execute(insert(SkillTag), rows)
+            total += len(rows)
+        db.commit()
+    finally:
+        db.close()
+    print(f"skill_tags rebuilt: {total} rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.db.session import SessionLocal
+from app.models.user import Session as SessionModel, User
+
+BENCH_PASSWORD = "bench-password"
+
+
+@pytest.fixture
+def bench_user():
+    """带有效 session 的家庭用户：(user_id, username, password, session_id)。"""
+    db = SessionLocal()
+    try:
+        user = User(
+            username=f"bench_{uuid.uuid4().hex[:8]}",
+            password_hash=get_password_hash(BENCH_PASSWORD),
+            roles=["family"],
+            nickname="bench",
+        )
+        db.add(user)
+        db.flush()
+        session_id = uuid.uuid4().hex
+        db.add(SessionModel(
+            session_id=session_id,
+            user_id=user.id,
+            expired_at=datetime.now(timezone.utc) + timedelta(hours=1),
+        ))
+        db.commit()
+        return user.id, user.username, BENCH_PASSWORD, session_id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    # 压测同一 IP 的登录/注册，需关闭限流
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
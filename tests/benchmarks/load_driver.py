@@ -0,0 +1,156 @@
+"""进程内并发压测驱动。
+
+通过 httpx.ASGITransport 直接调用 ASGI 应用（不走网络），concurrency 个 worker
+协程共享请求序号并发发送，记录每个请求的延迟与状态码；每请求 SQL 条数取自
+/metrics 的 http_request_db_queries 直方图（按路由模板）。
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.metrics import http_request_db_queries
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+# 延迟基线只对生成它的机器有意义，默认写在本地（已加入 .gitignore），可用环境变量指定
+LATENCY_BASELINES_PATH = Path(
+    os.environ.get("BENCHMARK_LATENCY_BASELINES", Path(__file__).with_name("latency_baselines.local.json"))
+)
+
+RequestFactory = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class LoadResult:
+    name: str
+    requests: int
+    concurrency: int
+    seconds: float
+    latencies: List[float] = field(repr=False)
+    statuses: Dict[int, int]
+    db_queries_per_request: Optional[float] = None
+
+    @property
+    def errors(self) -> int:
+        return sum(count for code, count in self.statuses.items() if code >= 500 or code == 0)
+
+    def summary(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "throughput_rps": round(self.requests / self.seconds, 1) if self.seconds else 0.0,
+            "p50_ms": round(_percentile(self.latencies, 0.5) * 1000, 3),
+            "p95_ms": round(_percentile(self.latencies, 0.95) * 1000, 3),
+            "p99_ms": round(_percentile(self.latencies, 0.99) * 1000, 3),
+            "db_queries_per_request": self.db_queries_per_request,
+        }
+
+
+async def _drive(app, make_request: RequestFactory, total: int, concurrency: int):
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    next_index = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            nonlocal next_index
+            while next_index < total:
+                index = next_index
+                next_index += 1
+                started = time.perf_counter()
+                try:
+                    status = (await make_request(client, index)).status_code
+                except Exception:
+                    status = 0
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started, latencies, statuses
+
+
+def run_load(
+    app,
+    name: str,
+    make_request: RequestFactory,
+    total: int = 200,
+    concurrency: int = 16,
+    method: str = "GET",
+    route: Optional[str] = None,
+) -> LoadResult:
+    """并发执行 total 个请求；给出 route（路由模板）时同时统计每请求 SQL 条数。"""
+    before = http_request_db_queries.snapshot(method=method, route=route) if route else None
+    seconds, latencies, statuses = asyncio.run(_drive(app, make_request, total, concurrency))
+    result = LoadResult(name, total, concurrency, seconds, latencies, statuses)
+    if route:
+        after = http_request_db_queries.snapshot(method=method, route=route) or {"count": 0, "sum": 0}
+        before = before or {"count": 0, "sum": 0}
+        count = after["count"] - before["count"]
+        if count:
+            result.db_queries_per_request = (after["sum"] - before["sum"]) / count
+    return result
+
+
+def _read_json(path: Path) -> Dict:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_json(path: Path, data: Dict) -> None:
+    path.write_text(json.dumps(data, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+
+def load_baselines() -> Dict:
+    return _read_json(BASELINES_PATH)
+
+
+def check_against_baseline(result: LoadResult) -> Dict:
+    """与基线比较；BENCHMARK_UPDATE=1 时改为写回本次结果。
+
+    - SQL 条数是确定值，提交在 baselines.json 中，必须与基线一致（多出一条查询即视为回归）。
+    - 延迟与机器相关，不入库：BENCHMARK_UPDATE=1 时写入本机的 LATENCY_BASELINES_PATH，
+      BENCHMARK_LATENCY=1 时检查 p95 不得超过该基线的 BENCHMARK_TOLERANCE 倍（默认 2）。
+    """
+    summary = result.summary()
+    if os.environ.get("BENCHMARK_UPDATE") == "1":
+        baselines = load_baselines()
+        baselines[result.name] = {"db_queries_per_request": summary["db_queries_per_request"]}
+        _write_json(BASELINES_PATH, baselines)
+        latency = _read_json(LATENCY_BASELINES_PATH)
+        latency[result.name] = summary
+        _write_json(LATENCY_BASELINES_PATH, latency)
+        return summary
+    baseline = load_baselines().get(result.name)
+    assert baseline is not None, f"no baseline for {result.name}; run with BENCHMARK_UPDATE=1"
+    if baseline.get("db_queries_per_request") is not None:
+        assert summary["db_queries_per_request"] == baseline["db_queries_per_request"], (
+            f"{result.name}: {summary['db_queries_per_request']} queries/request, "
+            f"baseline {baseline['db_queries_per_request']}"
+        )
+    if os.environ.get("BENCHMARK_LATENCY") == "1":
+        latency = _read_json(LATENCY_BASELINES_PATH).get(result.name)
+        assert latency is not None, (
+            f"no latency baseline for {result.name} in {LATENCY_BASELINES_PATH}; "
+            "run with BENCHMARK_UPDATE=1 on this machine first"
+        )
+        tolerance = float(os.environ.get("BENCHMARK_TOLERANCE", "2"))
+        assert summary["p95_ms"] <= latency["p95_ms"] * tolerance, (
+            f"{result.name}: p95 {summary['p95_ms']}ms > {tolerance} x baseline {latency['p95_ms']}ms"
+        )
+    return summary
@@ -0,0 +1,65 @@
+"""认证热路径的并发压测，结果与 baselines.json 比较。
+
+    pytest tests/benchmarks -q                       # 检查 SQL 条数与错误
+    BENCHMARK_UPDATE=1 pytest tests/benchmarks -q    # 重新生成基线（延迟基线只写本地）
+    BENCHMARK_LATENCY=1 pytest tests/benchmarks -q   # 同时检查 p95 延迟
+"""
+
+import uuid
+
+from load_driver import check_against_baseline, run_load
+
+from app.main import app
+from app.services.session_cache import session_cache
+
+
+def test_me_with_session_cache(bench_user):
+    _, _, _, session_id = bench_user
+    headers = {"X-Session-ID": session_id}
+    # 预热：第一次请求写入 session 缓存
+    run_load(app, "warmup", lambda c, i: c.get("/api/auth/me", headers=headers), total=1, concurrency=1)
+    result = run_load(
+        app, "auth_me_cached",
+        lambda c, i: c.get("/api/auth/me", headers=headers),
+        total=300, concurrency=16, route="/api/auth/me",
+    )
+    assert result.statuses == {200: 300}
+    check_against_baseline(result)
+
+
+def test_me_session_validation_uncached(bench_user, monkeypatch):
+    _, _, _, session_id = bench_user
+    headers = {"X-Session-ID": session_id}
+    # 关闭缓存，每个请求都走 session + user 的 JOIN 校验
+    monkeypatch.setattr(session_cache, "maxsize", 0)
+    result = run_load(
+        app, "auth_me_uncached",
+        lambda c, i: c.get("/api/auth/me", headers=headers),
+        total=200, concurrency=16, route="/api/auth/me",
+    )
+    assert result.statuses == {200: 200}
+    check_against_baseline(result)
+
+
+def test_login(bench_user, no_rate_limit):
+    _, username, password, _ = bench_user
+    result = run_load(
+        app, "login",
+        lambda c, i: c.post("/api/auth/login", json={"username": username, "password": password}),
+        total=40, concurrency=8, method="POST", route="/api/auth/login",
+    )
+    assert result.statuses == {200: 40}
+    check_against_baseline(result)
+
+
+def test_register(no_rate_limit):
+    prefix = uuid.uuid4().hex[:8]
+    result = run_load(
+        app, "register",
+        lambda c, i: c.post("/api/auth/register", json={
+            "username": f"reg_{prefix}_{i}", "password": "bench-password", "roles": ["family"],
+        }),
+        total=40, concurrency=8, method="POST", route="/api/auth/register",
+    )
+    assert result.statuses == {200: 40}
+    check_against_baseline(result)
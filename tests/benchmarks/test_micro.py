@@ -0,0 +1,85 @@
+"""认证热路径的微基准（需安装 bench 可选依赖 pytest-benchmark，未安装时跳过）。
+
+    pytest tests/benchmarks/test_micro.py --benchmark-autosave
+    pytest tests/benchmarks/test_micro.py --benchmark-compare --benchmark-compare-fail=mean:25%
+"""
+
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.api.v1.responses import PydanticJSONResponse
+from app.core.security import get_password_hash, verify_password
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.schemas.user import UserOut
+from app.services.auth import get_current_user_from_context, require_roles
+from app.services.session_cache import session_cache
+
+pytest.importorskip("pytest_benchmark")
+
+
+def _request(session_id: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/auth/me",
+        "headers": [(b"x-session-id", session_id.encode())],
+    })
+
+
+def _run(coro):
+    """驱动不会真正挂起的协程（缓存命中、纯计算），避免事件循环调度开销混入结果。"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("coroutine suspended")
+
+
+def test_current_user_cache_hit(benchmark, bench_user):
+    _, _, _, session_id = bench_user
+    request = _request(session_id)
+    asyncio.run(_validate_with_db(request))  # 写入缓存
+    user = benchmark(lambda: _run(get_current_user_from_context(request, db=None)))
+    assert user.id == bench_user[0]
+
+
+async def _validate_with_db(request):
+    async with AsyncSessionLocal() as db:
+        return await get_current_user_from_context(request, db=db)
+
+
+def test_current_user_db_lookup(benchmark, bench_user, monkeypatch):
+    _, _, _, session_id = bench_user
+    request = _request(session_id)
+    monkeypatch.setattr(session_cache, "maxsize", 0)
+    loop = asyncio.new_event_loop()
+    try:
+        user = benchmark(lambda: loop.run_until_complete(_validate_with_db(request)))
+    finally:
+        loop.close()
+    assert user.id == bench_user[0]
+
+
+def test_require_roles(benchmark):
+    @require_roles(["user", "family", "volunteer", "expert", "admin"])
+    async def endpoint(current_user=None):
+        return current_user
+
+    user = User(id=1, username="bench", password_hash="x", roles=["family"])
+    assert benchmark(lambda: _run(endpoint(current_user=user))) is user
+
+
+def test_userout_serialization(benchmark):
+    user = User(id=1, username="bench", nickname="bench", password_hash="x", roles=["family", "volunteer"], status="active")
+    body = benchmark(lambda: PydanticJSONResponse(UserOut.model_validate(user)).body)
+    assert b'"username":"bench"' in body
+
+
+def test_password_verify(benchmark):
+    # 登录的主要 CPU 开销；测试环境的 argon2 参数见 tests/conftest.py
+    password_hash = get_password_hash("bench-password")
+    assert benchmark(verify_password, "bench-password", password_hash)
@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+# 测试使用独立的临时 SQLite 库，避免污染仓库中的 dev.db；需在导入 app 之前设置
+_TEST_DB = os.path.join(tempfile.mkdtemp(prefix="yh-test-"), "test.db")
+os.environ.setdefault("DB_URL", f"sqlite:///{_TEST_DB}")
+# 测试中降低 argon2 成本，加快哈希相关用例
+os.environ.setdefault("ARGON2_TIME_COST", "1")
+os.environ.setdefault("ARGON2_MEMORY_COST", "1024")
+os.environ.setdefault("ARGON2_PARALLELISM", "1")
+# 任何请求结束后残留已借出的数据库连接都会让用例失败
+os.environ.setdefault("DB_LEAK_CHECK", "1")
+
+import asyncio  # noqa: E402
+
+import pytest  # noqa: E402
+
+from app.db.session import async_engine, init_db  # noqa: E402
+
+init_db()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _dispose_async_engine():
+    yield
+    # aiosqlite 的连接线程需显式关闭，否则进程退出时会被阻塞
+    asyncio.run(async_engine.dispose())
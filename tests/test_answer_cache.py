@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+from app.knowledge import rag_pipeline
+from app.knowledge.answer_cache import SemanticAnswerCache, answer_cache
+from app.knowledge.ingest import ingest_documents
+from app.knowledge.vectorstore import NumpyVectorStore
+
+
+def test_threshold_ttl_and_top_k(monkeypatch):
+    cache = SemanticAnswerCache(maxsize=2, ttl_seconds=60, threshold=0.9)
+    cache.set([1.0, 0.0], 3, {"answer": "a"})
+    assert cache.get([0.99, 0.05], 3) == {"answer": "a"}
+    assert cache.get([0.6, 0.8], 3) is None
+    assert cache.get([1.0, 0.0], 5) is None
+
+    cache.set([0.0, 1.0], 3, {"answer": "b"})
+    cache.set([0.7, 0.7], 3, {"answer": "c"})  # 容量为 2，覆盖最早的 "a"
+    assert cache.get([1.0, 0.0], 3) is None
+    assert cache.stats()["size"] == 2
+
+    now = time.time()
+    monkeypatch.setattr("app.knowledge.answer_cache.time.time", lambda: now + 61)
+    assert cache.get([0.0, 1.0], 3) is None
+
+
+def test_answer_query_reuses_answer_until_reingest(monkeypatch):
+    calls = []
+
+    async def fake_retrieve(query, top_k=5):
+        calls.append(query)
+        return [{"id": "c1", "text": "早期干预", "score": 1.0, "metadata": {"doc_id": "d1"}}]
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", fake_retrieve)
+    answer_cache.invalidate()
+
+    first = asyncio.run(rag_pipeline.answer_query("孩子不说话怎么办？"))
+    second = asyncio.run(rag_pipeline.answer_query("孩子不说话怎么办"))
+    assert first["cached"] is False and second["cached"] is True
+    assert second["sources"] == first["sources"]
+    assert len(calls) == 1
+
+    ingest_documents(["新增的知识库文章。"], store=NumpyVectorStore())
+    third = asyncio.run(rag_pipeline.answer_query("孩子不说话怎么办？"))
+    assert third["cached"] is False
+    assert len(calls) == 2
+
+
+def test_server_reloads_index_persisted_by_another_process(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.knowledge import vectorstore
+
+    calls = []
+
+    async def fake_retrieve(query, top_k=5):
+        calls.append(query)
+        return [{"id": "c1", "text": "早期干预", "score": 1.0, "metadata": {"doc_id": "d1"}}]
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", fake_retrieve)
+    monkeypatch.setattr(settings, "VECTOR_STORE_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "VECTOR_STORE_RELOAD_SECONDS", 0.001)
+    ingest_documents(["第一版知识库。"], store=NumpyVectorStore(), persist_path=str(tmp_path))
+    vectorstore.set_vector_store(None)
+    try:
+        served = vectorstore.get_vector_store()
+        assert asyncio.run(rag_pipeline.answer_query("孩子挑食怎么办？"))["cached"] is False
+        assert asyncio.run(rag_pipeline.answer_query("孩子挑食怎么办？"))["cached"] is True
+
+        # 导入脚本在另一个进程中写出新一代索引：服务进程的 invalidate() 不会被调用
+        monkeypatch.setattr(answer_cache, "invalidate", lambda: None)
+        other = NumpyVectorStore.load(str(tmp_path))
+        ingest_documents(["第二版新增文章。"], store=other, persist_path=str(tmp_path))
+        time.sleep(0.01)
+        reloaded = vectorstore.get_vector_store()
+        assert reloaded is not served and len(reloaded) == len(other)
+        assert asyncio.run(rag_pipeline.answer_query("孩子挑食怎么办？"))["cached"] is False
+        assert len(calls) == 2
+    finally:
+        vectorstore.set_vector_store(None)
@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.security import get_password_hash
+from app.db.leak_check import ConnectionLeakError, ConnectionLeakMiddleware
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.main import app
+from app.models.user import User
+
+client = TestClient(app)
+
+
+def test_login_logout_return_connections():
+    username = f"leak_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        db.add(User(id=uuid.uuid4().int % 10**12, username=username, password_hash=get_password_hash("pw"), roles=["family"]))
+        db.commit()
+    finally:
+        db.close()
+    # DB_LEAK_CHECK 已在 conftest 中开启，泄漏会以 ConnectionLeakError 抛出
+    r = client.post("/api/auth/login", json={"username": username, "password": "pw"}, headers={"user-agent": "web"})
+    assert r.status_code == 200
+    session_id = r.cookies["session_id"]
+    assert client.get("/api/auth/me", headers={"X-Session-ID": session_id}).status_code == 200
+    assert client.post("/api/auth/logout", headers={"X-Session-ID": session_id}).status_code == 200
+    assert client.post("/api/auth/login", json={"username": username, "password": "bad"}).status_code == 401
+
+
+def test_leak_detector_flags_unclosed_session():
+    leaky = FastAPI()
+    leaky.add_middleware(ConnectionLeakMiddleware)
+    held = []
+
+    @leaky.get("/leak")
+    async def leak():
+        db = AsyncSessionLocal()
+        await db.connection()
+        held.append(db)
+        return {}
+
+    with pytest.raises(ConnectionLeakError):
+        TestClient(leaky).get("/leak")
+
+    async def close():
+        await held[0].close()
+
+    asyncio.run(close())
@@ -0,0 +1,128 @@
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.db.session import SessionLocal, engine
+from app.main import app
+from app.models.user import SkillTag, User, VolunteerProfile
+from app.services.directory_service import directory_query, skill_tag_rows
+
+client = TestClient(app)
+
+
+def _add_volunteers(skill, specs):
+    """specs: [(work_status, is_public_visible), ...]，返回按创建顺序的 user_id。"""
+    db = SessionLocal()
+    try:
+        ids = []
+        for work_status, visible in specs:
+            user = User(username=f"dir_{uuid.uuid4().hex[:8]}", password_hash="x", roles=["volunteer"], nickname="v")
+            db.add(user)
+            db.flush()
+            db.add(VolunteerProfile(
+                user_id=user.id,
+                full_name="志愿者",
+                skills=json.dumps([skill, "陪伴"], ensure_ascii=False),
+                status="approved",
+                is_public_visible=visible,
+                work_status=work_status,
+            ))
+            for row in skill_tag_rows("volunteer", user.id, [skill, "陪伴"]):
+                db.add(SkillTag(**row))
+            ids.append(user.id)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+def test_directory_keyset_pagination_and_filters():
+    skill = f"skill-{uuid.uuid4().hex[:8]}"
+    ids = _add_volunteers(skill, [("online", True), ("offline", True), ("online", False), ("online", True), ("busy", True)])
+    visible = [ids[0], ids[1], ids[3], ids[4]]
+
+    seen, cursor = [], None
+    while True:
+        params = {"skill": skill, "limit": 3}
+        if cursor is not None:
+            params["cursor"] = cursor
+        resp = client.get("/api/directory", params=params)
+        assert resp.status_code == 200
+        page = resp.json()
+        seen.extend(item["user_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == visible
+
+    resp = client.get("/api/directory", params={"skill": skill, "work_status": "online"})
+    items = resp.json()["items"]
+    assert [item["user_id"] for item in items] == [ids[0], ids[3]]
+    assert items[0]["skills"] == [skill, "陪伴"]
+    assert items[0]["nickname"] == "v"
+
+
+def test_directory_tolerates_legacy_skills_rows():
+    db = SessionLocal()
+    try:
+        ids = []
+        for raw in ("绘画", "", "3", "[unclosed"):
+            user = User(username=f"dir_{uuid.uuid4().hex[:8]}", password_hash="x", roles=["volunteer"])
+            db.add(user)
+            db.flush()
+            db.add(VolunteerProfile(user_id=user.id, full_name="旧数据", skills=raw, status="approved", is_public_visible=True))
+            ids.append(user.id)
+        db.commit()
+    finally:
+        db.close()
+
+    resp = client.get("/api/directory", params={"cursor": ids[0] - 1, "limit": 4})
+    assert resp.status_code == 200
+    skills = {item["user_id"]: item["skills"] for item in resp.json()["items"]}
+    assert skills == {ids[0]: ["绘画"], ids[1]: [], ids[2]: ["3"], ids[3]: ["[unclosed"]}
+    assert skill_tag_rows("volunteer", ids[0], "绘画") == [{"profile_type": "volunteer", "user_id": ids[0], "skill": "绘画"}]
+
+
+def test_directory_rejects_bad_params():
+    assert client.get("/api/directory", params={"limit": 0}).status_code == 422
+    assert client.get("/api/directory", params={"profile_type": "family"}).status_code == 422
+
+
+def test_directory_skill_filter_uses_index():
+    with engine.connect() as conn:
+        plan = conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT user_id FROM skill_tags "
+            "WHERE profile_type = 'volunteer' AND skill = 'x' ORDER BY user_id"
+        )).fetchall()
+    detail = " ".join(str(row[-1]) for row in plan)
+    assert "SCAN skill_tags" not in detail
+    assert "TEMP B-TREE" not in detail
+
+
+def test_directory_queries_page_in_index_order():
+    with engine.connect() as conn:
+        for kwargs in ({}, {"cursor": 10}, {"work_status": "online"}, {"skill": "x"}, {"skill": "x", "cursor": 10}, {"profile_type": "expert", "skill": "x"}):
+            sql = str(directory_query(**kwargs).compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql)).fetchall()
+            detail = " ".join(str(row[-1]) for row in plan)
+            assert "TEMP B-TREE" not in detail, (kwargs, detail)
+            assert "SCAN" not in detail, (kwargs, detail)
+
+
+def test_directory_lists_only_approved_profiles():
+    db = SessionLocal()
+    try:
+        user = User(username=f"dir_{uuid.uuid4().hex[:8]}", password_hash="x", roles=["volunteer"])
+        db.add(user)
+        db.flush()
+        db.add(VolunteerProfile(user_id=user.id, full_name="待审核", status="pending", is_public_visible=True))
+        db.commit()
+        user_id = user.id
+    finally:
+        db.close()
+
+    resp = client.get("/api/directory", params={"status": "pending", "cursor": user_id - 1, "limit": 100})
+    assert resp.status_code == 200
+    assert user_id not in {item["user_id"] for item in resp.json()["items"]}
@@ -0,0 +1,70 @@
+import numpy as np
+
+from app.knowledge.embedding_cache import CachedEmbedder, EmbeddingCache, text_key
+from app.knowledge.embeddings import HashingEmbedder
+from app.knowledge.ingest import ingest_documents
+from app.knowledge.retriever import dense_retrieve
+from app.knowledge.vectorstore import NumpyVectorStore
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=32)
+        self.texts = []
+
+    def embed(self, texts):
+        self.texts.extend(texts)
+        return super().embed(texts)
+
+
+def test_text_key_normalizes_width_and_whitespace():
+    assert text_key("孩子 不说话？") == text_key("  孩子   不说话?  ")
+    assert text_key("孩子不说话") != text_key("孩子说话")
+
+
+def test_memory_tier_batches_misses_and_reports_hit_rate():
+    inner = CountingEmbedder()
+    cache = EmbeddingCache(maxsize=2)
+    embedder = CachedEmbedder(inner, cache)
+
+    first = embedder.embed(["甲", "乙", "甲"])
+    assert inner.texts == ["甲", "乙"]
+    assert np.allclose(first[0], first[2])
+
+    embedder.embed(["乙"])
+    assert inner.texts == ["甲", "乙"]
+    embedder.embed(["丙"])  # 超出容量，淘汰最久未用的“甲”
+    embedder.embed(["甲"])
+    assert inner.texts == ["甲", "乙", "丙", "甲"]
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["hits"] == 1 and stats["misses"] == 5
+    assert 0 < stats["hit_rate"] < 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "emb.sqlite3")
+    inner = CountingEmbedder()
+    cache = EmbeddingCache(maxsize=10, path=path)
+    expected = CachedEmbedder(inner, cache).embed(["志愿者如何报名"])
+    cache.close()
+
+    restarted = EmbeddingCache(maxsize=10, path=path)
+    other = CountingEmbedder()
+    got = CachedEmbedder(other, restarted).embed(["志愿者如何报名"])
+    assert other.texts == []
+    assert np.allclose(got, expected)
+    assert restarted.stats()["disk_hits"] == 1
+    restarted.close()
+
+
+def test_ingest_and_retrieve_share_the_cache():
+    inner = CountingEmbedder()
+    embedder = CachedEmbedder(inner, EmbeddingCache())
+    store = NumpyVectorStore()
+    ingest_documents(["如何帮助孩子建立日常作息？", "志愿者服务时长怎么计算？"], store=store, embedder=embedder)
+
+    hits = dense_retrieve("如何帮助孩子建立日常作息？", top_k=1, store=store, embedder=embedder)
+    assert hits[0]["text"] == "如何帮助孩子建立日常作息？"
+    # 查询文本与已导入的 chunk 相同，直接命中缓存
+    assert len(inner.texts) == 2
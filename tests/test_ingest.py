@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+
+from app.knowledge.embeddings import HashingEmbedder
+from app.knowledge.ingest import chunk_text, html_to_text, ingest_paths, iter_documents, markdown_to_text
+from app.knowledge.vectorstore import NumpyVectorStore
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=64)
+        self.calls = 0
+        self.texts = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return super().embed(texts)
+
+
+def _write_kb(root):
+    (root / "guide").mkdir()
+    (root / "guide" / "intro.md").write_text("# 入门\n\n孤独症儿童的**早期干预**非常重要。\n\n[链接](http://x)", encoding="utf-8")
+    (root / "faq.html").write_text("<html><script>var a=1</script><p>如何申请志愿者？</p><p>登录后填写资料。</p></html>", encoding="utf-8")
+    (root / "notes.txt").write_text("康复训练需要家庭长期配合。" * 40, encoding="utf-8")
+    (root / "image.png").write_bytes(b"\x89PNG")
+
+
+def test_loaders_strip_markup():
+    assert markdown_to_text("## 标题\n- **要点** [文档](http://a)") == "标题\n要点 文档"
+    assert html_to_text("<style>p{}</style><p>一</p><p>二</p>") == "一\n二"
+
+
+def test_chunk_text_overlaps_and_prefers_sentence_boundary():
+    text = "第一句话。" * 30
+    chunks = list(chunk_text(text, chunk_size=50, overlap=10))
+    assert all(len(c) <= 50 for c in chunks)
+    assert all(c.endswith("。") for c in chunks[:-1])
+    assert chunks[0][-10:] == chunks[1][:10]
+    assert "".join(chunks).replace("第一句话。", "") == ""
+
+
+def test_chunk_text_large_overlap_terminates():
+    # 句子边界把 end 拉回到窗口 80% 处时，end - overlap 不前进，曾导致死循环
+    text = "a" * 40 + "。" + "b" * 200
+    chunks = list(chunk_text(text, chunk_size=50, overlap=45))
+    assert chunks[0] == "a" * 40 + "。"
+    assert chunks[-1].endswith("b")
+    assert len(chunks) < len(text)
+
+
+def test_chunk_text_rejects_overlap_not_smaller_than_size():
+    with pytest.raises(ValueError):
+        chunk_text("abc", chunk_size=10, overlap=10)
+
+
+def test_ingest_directory_then_reingest_is_noop(tmp_path):
+    _write_kb(tmp_path)
+    docs = list(iter_documents(str(tmp_path)))
+    assert sorted(d.doc_id for d in docs) == ["faq.html", "guide/intro.md", "notes.txt"]
+
+    store = NumpyVectorStore()
+    embedder = CountingEmbedder()
+    stats = ingest_paths(str(tmp_path), store=store, embedder=embedder, batch_size=2, workers=2)
+    assert stats["ingested"] == 3
+    assert stats["embedded"] == stats["chunks"] == len(store) == embedder.texts
+    assert embedder.calls == -(-stats["chunks"] // 2)
+
+    hit = store.search(embedder.embed(["早期干预"])[0], top_k=1)[0]
+    assert hit["metadata"]["doc_id"] == "guide/intro.md"
+
+    embedder.calls = 0
+    again = ingest_paths(str(tmp_path), store=store, embedder=embedder)
+    assert again["embedded"] == 0 and again["skipped"] == again["chunks"]
+    assert embedder.calls == 0
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=32)
+    a, b = embedder.embed(["志愿者 报名", "志愿者 报名"])
+    assert np.allclose(a, b)
+    assert np.isclose(np.linalg.norm(a), 1.0)
+    assert not embedder.embed([""]).any()
+
+
+def test_incremental_sync_only_embeds_changes(tmp_path):
+    from app.knowledge.ingest import sync_paths, wait_for_compaction
+    from app.knowledge.manifest import IngestManifest
+
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    for i in range(4):
+        (kb / f"doc{i}.txt").write_text(f"第{i}篇文章。" + "内容段落。" * 20, encoding="utf-8")
+    store = NumpyVectorStore()
+    embedder = CountingEmbedder()
+    manifest_path = str(tmp_path / "manifest.json")
+
+    first = sync_paths(str(kb), manifest=IngestManifest(manifest_path), store=store, embedder=embedder)
+    assert first["embedded"] == len(store)
+
+    # 修改一篇、删除一篇
+    (kb / "doc0.txt").write_text("第0篇文章已经更新。", encoding="utf-8")
+    (kb / "doc3.txt").unlink()
+    embedder.texts = 0
+    second = sync_paths(str(kb), manifest=IngestManifest(manifest_path), store=store, embedder=embedder)
+    assert second["unchanged"] == 2
+    assert second["removed_docs"] == 1
+    assert embedder.texts == second["embedded"] == 1
+    assert second["deleted"] > 0
+
+    manifest = IngestManifest(manifest_path)
+    assert sorted(manifest) == ["doc0.txt", "doc1.txt", "doc2.txt"]
+    live_ids = {cid for doc_id in manifest for cid in manifest.chunk_ids(doc_id)}
+    hits = store.search(embedder.embed(["内容段落"])[0], top_k=50)
+    assert {h["id"] for h in hits} == live_ids
+
+    wait_for_compaction()
+    assert store.compact() == 0
+    assert len(store) == store.stats()["rows"] == len(live_ids)
+
+
+def test_manifest_saved_only_after_persist(tmp_path, monkeypatch):
+    from app.knowledge.ingest import sync_paths
+    from app.knowledge.manifest import IngestManifest
+
+    kb = tmp_path / "kb"
+    kb.mkdir()
+    (kb / "doc.txt").write_text("志愿者报名流程。", encoding="utf-8")
+    store = NumpyVectorStore()
+    manifest_path = tmp_path / "manifest.json"
+
+    def broken_persist(path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "persist", broken_persist)
+    with pytest.raises(OSError):
+        sync_paths(str(kb), manifest=IngestManifest(str(manifest_path)), store=store, embedder=CountingEmbedder(), persist_path=str(tmp_path / "store"))
+    assert not manifest_path.exists()
+
+    monkeypatch.undo()
+    sync_paths(str(kb), manifest=IngestManifest(str(manifest_path)), store=store, embedder=CountingEmbedder(), persist_path=str(tmp_path / "store"))
+    assert list(IngestManifest(str(manifest_path))) == ["doc.txt"]
+    assert len(NumpyVectorStore.load(str(tmp_path / "store"))) == len(store)
@@ -0,0 +1,88 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.metrics import (
+    MetricsRegistry,
+    http_request_db_queries,
+    http_requests_total,
+    stats_collector,
+)
+from app.db.session import SessionLocal
+from app.main import app
+from app.models.user import Session as SessionModel, User
+
+client = TestClient(app)
+
+
+def test_histogram_and_collector_rendering():
+    registry = MetricsRegistry()
+    hist = registry.histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        hist.observe(value, route='/a"b')
+    registry.add_collector(stats_collector("pool", lambda: {"sync": {"size": 5, "pool_class": "X"}}, label="engine"))
+    text = registry.render()
+    assert 'demo_seconds_bucket{route="/a\\"b",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/a\\"b",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/a\\"b",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/a\\"b"} 3' in text
+    assert 'pool_size{engine="sync"} 5' in text
+    assert "pool_class" not in text
+
+
+def test_requests_are_labelled_by_route_template(monkeypatch):
+    db = SessionLocal()
+    try:
+        user = User(username=f"m_{uuid.uuid4().hex[:8]}", password_hash="x", roles=["family"])
+        db.add(user)
+        db.flush()
+        session_id = uuid.uuid4().hex
+        db.add(SessionModel(session_id=session_id, user_id=user.id, expired_at=datetime.now(timezone.utc) + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+    before = http_requests_total.value(method="GET", route="/api/auth/me", status="200")
+    before_queries = http_request_db_queries.snapshot(method="GET", route="/api/auth/me") or {"count": 0, "sum": 0}
+    # 第一次未命中 session 缓存，会查库
+    assert client.get("/api/auth/me", headers={"X-Session-ID": session_id}).status_code == 200
+    assert http_requests_total.value(method="GET", route="/api/auth/me", status="200") == before + 1
+    after_queries = http_request_db_queries.snapshot(method="GET", route="/api/auth/me")
+    assert after_queries["count"] == before_queries["count"] + 1
+    assert after_queries["sum"] > before_queries["sum"]
+
+    client.get(f"/no-such-path/{uuid.uuid4().hex}")
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "scrape-token")
+    resp = client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = resp.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/auth/me"}' in body
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in body
+    assert "no-such-path" not in body
+    assert 'db_queries_total{engine="async"}' in body
+    assert "session_cache_hits" in body and 'db_pool_checkouts{engine="sync"}' in body
+
+
+def test_internal_endpoints_require_token_or_admin(monkeypatch):
+    monkeypatch.setattr(settings, "INTERNAL_API_TOKEN", "scrape-token")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/internal/presence", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/internal/presence", headers={"Authorization": "Bearer scrape-token"}).status_code == 200
+
+    db = SessionLocal()
+    try:
+        sessions = {}
+        for role in ("family", "admin"):
+            user = User(username=f"i_{uuid.uuid4().hex[:8]}", password_hash="x", roles=[role])
+            db.add(user)
+            db.flush()
+            sessions[role] = uuid.uuid4().hex
+            db.add(SessionModel(session_id=sessions[role], user_id=user.id, expired_at=datetime.now(timezone.utc) + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/internal/db/pool", headers={"X-Session-ID": sessions["family"]}).status_code == 403
+    assert client.get("/internal/db/pool", headers={"X-Session-ID": sessions["admin"]}).status_code == 200
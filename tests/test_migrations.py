@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.db.migrations import run_migrations
+from app.models.user import ROLE_BITS
+
+
+def test_roles_mask_added_and_backfilled_on_legacy_users_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(150), roles JSON NOT NULL)"))
+        conn.execute(text(
+            "INSERT INTO users (id, username, roles) VALUES "
+            "(1, 'a', '[\"family\", \"admin\"]'), (2, 'b', '[''volunteer'']'), (3, 'c', 'not a list')"
+        ))
+
+    run_migrations(engine)
+    run_migrations(engine)  # 可重复执行
+
+    with engine.connect() as conn:
+        masks = dict(conn.execute(text("SELECT id, roles_mask FROM users")).fetchall())
+    assert masks == {1: ROLE_BITS["family"] | ROLE_BITS["admin"], 2: ROLE_BITS["volunteer"], 3: 0}
+    engine.dispose()
+
+
+def test_presence_lease_columns_added_to_legacy_profiles(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE volunteer_profiles (user_id INTEGER PRIMARY KEY, work_status VARCHAR(32))"))
+        conn.execute(text("INSERT INTO volunteer_profiles VALUES (1, 'online')"))
+
+    run_migrations(engine)
+    run_migrations(engine)
+
+    columns = {c["name"] for c in inspect(engine).get_columns("volunteer_profiles")}
+    assert {"presence_owner", "presence_expires_at"} <= columns
+    engine.dispose()
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.security import PasswordHasherPool, password_hasher, verify_password
+from app.db.session import AsyncSessionLocal
+from app.schemas.user import UserRegisterRequest
+from app.services.user_service import create_user
+
+
+def test_hash_and_verify_in_pool():
+    pool = PasswordHasherPool(max_workers=2, max_pending=4)
+
+    async def run():
+        hashed = await pool.hash("secret")
+        return hashed, await pool.verify("secret", hashed), await pool.verify("wrong", hashed)
+
+    hashed, ok, bad = asyncio.run(run())
+    assert ok and not bad
+    assert verify_password("secret", hashed)
+    assert pool.stats()["completed"] == 3
+
+
+def test_pool_rejects_when_full():
+    pool = PasswordHasherPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def run():
+        blocked = asyncio.ensure_future(pool._submit(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc:
+            await pool.hash("secret")
+        release.set()
+        await blocked
+        return exc.value
+
+    err = asyncio.run(run())
+    assert err.status_code == 503
+    assert pool.stats()["rejected"] == 1
+
+
+def test_cancelled_request_keeps_slot_until_job_finishes():
+    pool = PasswordHasherPool(max_workers=1, max_pending=1)
+    release = threading.Event()
+    finished = threading.Event()
+
+    def job():
+        release.wait()
+        finished.set()
+
+    async def run():
+        task = asyncio.ensure_future(pool._submit(job))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0)
+        # 线程中的计算仍在进行，名额不能提前释放
+        assert pool.stats()["pending"] == 1
+        with pytest.raises(HTTPException):
+            await pool.hash("secret")
+        release.set()
+        await asyncio.to_thread(finished.wait)
+
+    asyncio.run(run())
+    pool._executor.shutdown(wait=True)
+    assert pool.stats()["pending"] == 0
+
+
+def test_create_user_hashes_in_pool_when_no_hash_given():
+    user_in = UserRegisterRequest(username=f"pool_{uuid.uuid4().hex[:8]}", password="secret", roles=["family"])
+    completed = password_hasher.stats()["completed"]
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            user = await create_user(db, user_in)
+            await db.rollback()
+            return user.password_hash
+
+    hashed = asyncio.run(run())
+    assert verify_password("secret", hashed)
+    assert password_hasher.stats()["completed"] == completed + 1
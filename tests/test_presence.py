@@ -0,0 +1,225 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.main import app
+from app.models.user import Session as SessionModel, SkillTag, User, VolunteerProfile
+from app.services.presence import BUSY, OFFLINE, ONLINE, PresenceRegistry, presence
+
+client = TestClient(app)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _new_user(roles, volunteer_skills=None):
+    db = SessionLocal()
+    try:
+        user = User(username=f"pr_{uuid.uuid4().hex[:8]}", password_hash="x", roles=roles)
+        db.add(user)
+        db.flush()
+        if volunteer_skills is not None:
+            db.add(VolunteerProfile(user_id=user.id, full_name="v", status="approved", work_status=OFFLINE))
+            for skill in volunteer_skills:
+                db.add(SkillTag(profile_type="volunteer", skill=skill, user_id=user.id))
+        session_id = uuid.uuid4().hex
+        db.add(SessionModel(
+            session_id=session_id,
+            user_id=user.id,
+            expired_at=datetime.now(timezone.utc) + timedelta(hours=1),
+        ))
+        db.commit()
+        return user.id, {"X-Session-ID": session_id}
+    finally:
+        db.close()
+
+
+def _work_status(user_id):
+    db = SessionLocal()
+    try:
+        return db.get(VolunteerProfile, user_id).work_status
+    finally:
+        db.close()
+
+
+def test_pick_by_skill_marks_busy_until_release():
+    registry = PresenceRegistry()
+    registry.heartbeat(1, skills=["绘画"])
+    registry.heartbeat(2, skills=["音乐"])
+
+    assert registry.pick("绘画") == 1
+    assert registry.status(1) == BUSY
+    assert registry.pick("绘画") is None
+    assert registry.pick() == 2
+    assert registry.pick() is None
+
+    registry.release(1)
+    assert registry.status(1) == ONLINE
+    assert registry.pick("绘画") == 1
+    stats = registry.stats()
+    assert stats["matches"] == 3 and stats["match_misses"] == 2
+
+
+def test_heartbeat_does_not_downgrade_busy():
+    registry = PresenceRegistry()
+    registry.heartbeat(1, skills=["a"])
+    assert registry.pick("a") == 1
+    # 客户端例行心跳（含显式 online）只刷新存活时间，不会让已匹配的志愿者重新可选
+    assert registry.heartbeat(1) == BUSY
+    assert registry.heartbeat(1, ONLINE) == BUSY
+    assert registry.pick("a") is None
+    registry.release(1)
+    assert registry.heartbeat(1) == ONLINE
+    assert registry.pick("a") == 1
+
+
+def test_expire_marks_stale_volunteers_offline():
+    clock = _Clock()
+    registry = PresenceRegistry(ttl_seconds=30, clock=clock)
+    registry.heartbeat(1)
+    clock.now += 20
+    registry.heartbeat(2)
+    clock.now += 15
+    assert registry.expire() == 1
+    assert registry.status(1) == OFFLINE and registry.status(2) == ONLINE
+    assert registry.pick() == 2
+
+
+def test_flush_coalesces_heartbeats_into_one_write():
+    user_id, _ = _new_user(["volunteer"], volunteer_skills=[])
+    registry = PresenceRegistry(flush_batch_size=1)
+    for _ in range(5):
+        registry.heartbeat(user_id)
+    assert registry.stats()["pending_writes"] == 1
+    assert registry.flush() == 1
+    assert _work_status(user_id) == ONLINE
+
+    registry.heartbeat(user_id)
+    assert registry.flush() == 0
+    registry.set_offline(user_id)
+    registry.flush()
+    assert _work_status(user_id) == OFFLINE
+
+
+def test_stale_status_cleared_on_start_and_stop():
+    stale_id, _ = _new_user(["volunteer"], volunteer_skills=[])
+    tracked_id, _ = _new_user(["volunteer"], volunteer_skills=[])
+    db = SessionLocal()
+    try:
+        db.get(VolunteerProfile, stale_id).work_status = ONLINE
+        db.commit()
+    finally:
+        db.close()
+
+    registry = PresenceRegistry(flush_interval_seconds=3600)
+    registry.heartbeat(tracked_id)
+
+    async def lifecycle():
+        registry.start()
+        await asyncio.sleep(0.05)
+        registry.flush()
+        statuses = (_work_status(stale_id), _work_status(tracked_id))
+        await registry.stop()
+        return statuses
+
+    # 启动时重置残留的 online；已登记用户的状态随后重新写回
+    assert asyncio.run(lifecycle()) == (OFFLINE, ONLINE)
+    # 停止时所有已登记用户写回 offline
+    assert _work_status(tracked_id) == OFFLINE
+
+    # 未登记用户下线同样写回
+    db = SessionLocal()
+    try:
+        db.get(VolunteerProfile, stale_id).work_status = ONLINE
+        db.commit()
+    finally:
+        db.close()
+    registry.set_offline(stale_id)
+    registry.flush()
+    assert _work_status(stale_id) == OFFLINE
+
+
+def _lease(user_id):
+    db = SessionLocal()
+    try:
+        profile = db.get(VolunteerProfile, user_id)
+        return profile.work_status, profile.presence_owner
+    finally:
+        db.close()
+
+
+def test_workers_do_not_overwrite_each_others_rows():
+    user_id, _ = _new_user(["volunteer"], volunteer_skills=[])
+    worker_a = PresenceRegistry(owner="worker-a", flush_interval_seconds=3600)
+    worker_b = PresenceRegistry(owner="worker-b", flush_interval_seconds=3600)
+    worker_a.heartbeat(user_id)
+    worker_a.flush()
+    assert _lease(user_id) == (ONLINE, "worker-a")
+
+    async def restart_b():
+        worker_b.start()
+        await asyncio.sleep(0.05)
+        await worker_b.stop()
+
+    # 另一个 worker 启动、停止或为未登记用户写 offline，都不会覆盖租约未过期的行
+    asyncio.run(restart_b())
+    worker_b.set_offline(user_id)
+    worker_b.flush()
+    assert _lease(user_id) == (ONLINE, "worker-a")
+
+    # 租约过期（持有者已退出）后由任一 worker 清理
+    db = SessionLocal()
+    try:
+        db.get(VolunteerProfile, user_id).presence_expires_at = datetime(2000, 1, 1)
+        db.commit()
+    finally:
+        db.close()
+    assert worker_b.reclaim_expired() >= 1
+    assert _lease(user_id) == (OFFLINE, None)
+
+
+def test_volunteer_tracked_by_two_workers_is_claimed_once():
+    user_id, _ = _new_user(["volunteer"], volunteer_skills=[])
+    worker_a = PresenceRegistry(owner="worker-a")
+    worker_b = PresenceRegistry(owner="worker-b")
+    worker_a.heartbeat(user_id)
+    worker_b.heartbeat(user_id)
+
+    async def claim(registry):
+        async with AsyncSessionLocal() as db:
+            return await registry.claim(db, registry.pick())
+
+    assert asyncio.run(claim(worker_a)) is True
+    assert asyncio.run(claim(worker_b)) is False
+    assert user_id not in worker_b and worker_b.stats()["claim_conflicts"] == 1
+    assert _lease(user_id) == (BUSY, "worker-a")
+
+
+def test_heartbeat_then_match_over_http():
+    skill = f"skill-{uuid.uuid4().hex[:8]}"
+    volunteer_id, volunteer_headers = _new_user(["volunteer"], volunteer_skills=[skill])
+    _, family_headers = _new_user(["family"])
+    try:
+        resp = client.post("/api/presence/heartbeat", json={}, headers=volunteer_headers)
+        assert resp.status_code == 200
+        assert resp.json() == {"user_id": volunteer_id, "work_status": "online"}
+
+        resp = client.post("/api/presence/match", params={"skill": skill}, headers=family_headers)
+        assert resp.status_code == 200 and resp.json()["user_id"] == volunteer_id
+        resp = client.post("/api/presence/match", params={"skill": skill}, headers=family_headers)
+        assert resp.status_code == 404
+
+        resp = client.post("/api/presence/release", headers=volunteer_headers)
+        assert resp.json()["work_status"] == "online"
+        # 家庭用户不能发送志愿者心跳
+        assert client.post("/api/presence/heartbeat", json={}, headers=family_headers).status_code == 403
+    finally:
+        presence.set_offline(volunteer_id)
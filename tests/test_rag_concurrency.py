@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.knowledge import rag_pipeline, retriever
+from app.knowledge.answer_cache import answer_cache
+from app.knowledge.llm import FakeLLMClient
+from app.knowledge.singleflight import StreamGroup
+
+
+def test_concurrent_identical_questions_share_one_generation(monkeypatch):
+    retrievals = []
+
+    async def fake_retrieve(query, top_k=3):
+        retrievals.append(query)
+        await asyncio.sleep(0.02)
+        return [{"id": "c1", "text": "资料", "score": 1.0, "metadata": {}}]
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", fake_retrieve)
+    answer_cache.invalidate()
+    llm = FakeLLMClient(answer="同一个回答", delay=0.01, chunk_size=2)
+
+    async def burst():
+        return await asyncio.gather(*[rag_pipeline.answer_query("合并测试问题", llm=llm) for _ in range(5)])
+
+    answers = asyncio.run(burst())
+    assert {a["answer"] for a in answers} == {"同一个回答"}
+    assert len(retrievals) == 1
+    assert llm.calls == 1
+
+
+def test_stream_group_propagates_errors_to_every_subscriber():
+    group = StreamGroup()
+
+    async def failing():
+        yield 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def consume():
+        items = []
+        with pytest.raises(RuntimeError):
+            async for item in group.subscribe("k", failing):
+                items.append(item)
+        return items
+
+    async def main():
+        return await asyncio.gather(consume(), consume())
+
+    assert asyncio.run(main()) == [[1], [1]]
+    assert group.stats() == {"in_flight": 0, "started": 1, "coalesced": 1}
+
+
+def test_hybrid_stage_timeout_falls_back_to_other_stage(monkeypatch):
+    def slow_dense(*args, **kwargs):
+        time.sleep(0.3)
+        return [{"id": "dense", "text": "", "score": 1.0, "metadata": {}}]
+
+    monkeypatch.setattr(retriever, "dense_retrieve", slow_dense)
+    monkeypatch.setattr(retriever, "sparse_retrieve", lambda *a, **k: [{"id": "sparse", "text": "", "score": 1.0, "metadata": {}}])
+    monkeypatch.setattr(settings, "RETRIEVAL_MODE", "hybrid")
+    monkeypatch.setattr(settings, "RETRIEVAL_STAGE_TIMEOUT_SECONDS", 0.05)
+    before = retriever.stage_failures["dense"]
+
+    async def timed():
+        started = time.perf_counter()
+        hits = await retriever.aretrieve("问题", top_k=3)
+        return hits, time.perf_counter() - started
+
+    hits, elapsed = asyncio.run(timed())
+    assert [h["id"] for h in hits] == ["sparse"]
+    assert elapsed < 0.25
+    assert retriever.stage_failures["dense"] == before + 1
@@ -0,0 +1,97 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.db.session import SessionLocal
+from app.knowledge import rag_pipeline
+from app.knowledge.answer_cache import answer_cache
+from app.knowledge.llm import FakeLLMClient, set_llm_client
+from app.main import app
+from app.models.user import Session as SessionModel, User
+
+client = TestClient(app)
+
+
+def _session_for_new_user():
+    db = SessionLocal()
+    try:
+        user = User(username=f"rag_{uuid.uuid4().hex[:8]}", password_hash="x", roles=["family"])
+        db.add(user)
+        db.flush()
+        session_id = uuid.uuid4().hex
+        db.add(SessionModel(
+            session_id=session_id,
+            user_id=user.id,
+            expired_at=datetime.now(timezone.utc) + timedelta(hours=1),
+        ))
+        db.commit()
+        return session_id
+    finally:
+        db.close()
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_ask_streams_sources_then_tokens(monkeypatch):
+    async def fake_retrieve(query, top_k=3):
+        return [
+            {"id": "c1", "text": "固定作息有助于睡眠。", "score": 0.9, "metadata": {"doc_id": "sleep.md", "source": "/srv/kb/sleep.md"}},
+        ]
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", fake_retrieve)
+    llm = FakeLLMClient(answer="建议固定作息时间。", chunk_size=3)
+    set_llm_client(llm)
+    answer_cache.invalidate()
+    headers = {"X-Session-ID": _session_for_new_user()}
+    try:
+        resp = client.post("/api/rag/ask", json={"query": "孩子晚上睡不着"}, headers=headers)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        events = _parse_sse(resp.text)
+        names = [name for name, _ in events]
+        assert names[0] == "sources" and names[-1] == "done"
+        assert set(names[1:-1]) == {"token"}
+        assert events[0][1]["sources"][0]["doc_id"] == "sleep.md"
+        # 不向客户端暴露服务器上的文件路径
+        assert events[0][1]["sources"][0]["source"] == "sleep.md"
+        assert "".join(data["text"] for name, data in events if name == "token") == "建议固定作息时间。"
+        done = events[-1][1]
+        assert done["cached"] is False and done["total_ms"] >= done["ttft_ms"] >= 0
+
+        # 相同问题第二次命中答案缓存，不再调用 LLM
+        again = _parse_sse(client.post("/api/rag/ask", json={"query": "孩子晚上睡不着"}, headers=headers).text)
+        assert again[-1][1]["cached"] is True
+        assert llm.calls == 1
+        assert rag_pipeline.rag_metrics.stats()["requests"] >= 2
+    finally:
+        set_llm_client(None)
+
+
+def test_ask_requires_session():
+    assert client.post("/api/rag/ask", json={"query": "你好"}).status_code == 401
+
+
+def test_ask_logs_failure_and_sends_generic_error(monkeypatch, caplog):
+    async def broken_retrieve(query, top_k=3):
+        raise RuntimeError("vector store unavailable at /srv/kb")
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", broken_retrieve)
+    set_llm_client(FakeLLMClient())
+    answer_cache.invalidate()
+    try:
+        with caplog.at_level("ERROR", logger="app.api.v1.routes.rag"):
+            resp = client.post("/api/rag/ask", json={"query": "检索失败"}, headers={"X-Session-ID": _session_for_new_user()})
+    finally:
+        set_llm_client(None)
+    events = _parse_sse(resp.text)
+    assert events[-1] == ("error", {"detail": "回答生成失败，请稍后重试"})
+    assert "/srv/kb" not in resp.text
+    assert any(record.exc_info and "vector store unavailable" in str(record.exc_info[1]) for record in caplog.records)
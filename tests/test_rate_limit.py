@@ -0,0 +1,116 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.core.config import Settings, settings
+from app.core.rate_limit import InMemoryTokenBucketStore, parse_rule, rate_limiter
+from app.core.security import get_password_hash, password_hasher
+from app.db.session import SessionLocal
+from app.main import app
+from app.models.user import User
+
+client = TestClient(app)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_rule():
+    assert parse_rule("10/minute") == (10, 10 / 60)
+    assert parse_rule("2/seconds") == (2, 2.0)
+    assert parse_rule("") is None
+    with pytest.raises(ValueError):
+        parse_rule("10/fortnight")
+
+
+@pytest.mark.parametrize("rule", ["10/fortnight", "ten/minute", "0/minute", "10"])
+def test_invalid_rule_rejected_when_settings_load(rule):
+    with pytest.raises(ValidationError):
+        Settings(RATE_LIMIT_LOGIN_USER=rule)
+
+
+def test_token_bucket_refills_over_time():
+    clock = _Clock()
+    store = InMemoryTokenBucketStore(clock=clock)
+
+    async def take():
+        return await store.consume("k", capacity=2, refill_per_second=1.0)
+
+    assert asyncio.run(take()) == 0
+    assert asyncio.run(take()) == 0
+    assert asyncio.run(take()) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert asyncio.run(take()) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert asyncio.run(take()) == 0
+
+
+def test_store_evicts_oldest_keys():
+    store = InMemoryTokenBucketStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        asyncio.run(store.consume(key, capacity=1, refill_per_second=1.0))
+    assert len(store) == 2
+
+
+def test_login_rejected_before_hashing(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_store", InMemoryTokenBucketStore())
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_IP", "100/minute")
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_USER", "2/minute")
+    calls = []
+    verify = password_hasher.verify
+
+    async def counting_verify(password, password_hash):
+        calls.append(password)
+        return await verify(password, password_hash)
+
+    monkeypatch.setattr(password_hasher, "verify", counting_verify)
+    username = f"rl_{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        db.add(User(username=username, password_hash=get_password_hash("pw"), roles=["family"]))
+        db.commit()
+    finally:
+        db.close()
+    codes = [
+        client.post("/api/auth/login", json={"username": username, "password": "bad"}).status_code
+        for _ in range(2)
+    ]
+    assert codes == [401, 401]
+    # 用户名不区分大小写计入同一个桶
+    resp = client.post("/api/auth/login", json={"username": username.upper(), "password": "bad"})
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    # 被拒绝的请求没有进入密码校验
+    assert len(calls) == 2
+    # 其他用户名不受影响
+    other = client.post("/api/auth/login", json={"username": username + "x", "password": "bad"})
+    assert other.status_code == 401
+    assert rate_limiter.stats()["rejected"]["login:user"] >= 1
+
+
+def test_register_limited_per_ip(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_store", InMemoryTokenBucketStore())
+    monkeypatch.setattr(settings, "RATE_LIMIT_REGISTER_IP", "1/hour")
+    hashed = []
+
+    async def counting_hash(password):
+        hashed.append(password)
+        return "x"
+
+    monkeypatch.setattr(password_hasher, "hash", counting_hash)
+    payload = {"username": "", "password": "pw", "roles": ["family"], "email": "bad-email"}
+    client.post("/api/auth/register", json=payload)
+    resp = client.post("/api/auth/register", json=payload)
+    assert resp.status_code == 429
+    assert len(hashed) <= 1
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    assert client.post("/api/auth/register", json=payload).status_code != 429
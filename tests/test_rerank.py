@@ -0,0 +1,98 @@
+import asyncio
+
+from app.core.config import settings
+from app.knowledge import rag_pipeline
+from app.knowledge.answer_cache import answer_cache
+from app.knowledge.llm import FakeLLMClient
+from app.knowledge import rerank as rerank_module
+from app.knowledge.rerank import LexicalReranker, rerank, set_reranker
+
+CANDIDATES = [
+    {"id": f"c{i}", "text": text, "score": 1.0 - i * 0.01, "metadata": {}}
+    for i, text in enumerate([
+        "平台介绍与使用说明",
+        "志愿者注册流程说明",
+        "睡眠问题的家庭干预方法",
+        "饮食结构建议",
+        "孩子睡眠不规律怎么办：固定作息、减少屏幕时间",
+    ])
+]
+
+
+class RecordingLLM(FakeLLMClient):
+    def __init__(self):
+        super().__init__(answer="好的")
+        self.messages = None
+
+    async def stream(self, messages):
+        self.messages = messages
+        async for delta in super().stream(messages):
+            yield delta
+
+
+def test_rerank_scores_in_batches_and_keeps_top_n():
+    reranker = LexicalReranker()
+    top = rerank("孩子睡眠不规律", CANDIDATES, top_n=2, reranker=reranker, batch_size=2)
+    assert reranker.batches == 3
+    assert [d["id"] for d in top] == ["c4", "c2"]
+    assert top[0]["retrieval_score"] == CANDIDATES[4]["score"]
+
+
+def test_pipeline_overfetches_and_sends_only_top_k_to_llm(monkeypatch):
+    fetched = []
+
+    async def fake_retrieve(query, top_k=3):
+        fetched.append(top_k)
+        return CANDIDATES[:top_k]
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", fake_retrieve)
+    monkeypatch.setattr(settings, "RERANK_ENABLED", True)
+    monkeypatch.setattr(settings, "RERANK_FETCH_K", 5)
+    set_reranker(LexicalReranker())
+    answer_cache.invalidate()
+    llm = RecordingLLM()
+    try:
+        result = asyncio.run(rag_pipeline.answer_query("孩子睡眠不规律", top_k=1, llm=llm))
+    finally:
+        set_reranker(None)
+    assert fetched == [5]
+    assert [s["id"] for s in result["sources"]] == ["c4"]
+    assert "固定作息" in llm.messages[-1]["content"]
+    assert "平台介绍" not in llm.messages[-1]["content"]
+
+
+def test_pipeline_falls_back_to_retrieval_order_when_rerank_fails(monkeypatch):
+    class BrokenReranker:
+        model_id = "broken"
+
+        def score(self, query, texts):
+            raise RuntimeError("model not loaded")
+
+    async def fake_retrieve(query, top_k=3):
+        return CANDIDATES[:top_k]
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", fake_retrieve)
+    monkeypatch.setattr(settings, "RERANK_ENABLED", True)
+    set_reranker(BrokenReranker())
+    answer_cache.invalidate()
+    try:
+        result = asyncio.run(rag_pipeline.answer_query("重排失败", top_k=2, llm=FakeLLMClient()))
+    finally:
+        set_reranker(None)
+    assert [s["id"] for s in result["sources"]] == ["c0", "c1"]
+
+
+def test_pipeline_falls_back_when_reranker_cannot_load(monkeypatch):
+    async def fake_retrieve(query, top_k=3):
+        return CANDIDATES[:top_k]
+
+    def missing_model(model=None):
+        raise ImportError("需要安装 sentence-transformers")
+
+    monkeypatch.setattr(rag_pipeline, "aretrieve", fake_retrieve)
+    monkeypatch.setattr(settings, "RERANK_ENABLED", True)
+    monkeypatch.setattr(rerank_module, "create_reranker", missing_model)
+    set_reranker(None)
+    answer_cache.invalidate()
+    result = asyncio.run(rag_pipeline.answer_query("模型缺失", top_k=2, llm=FakeLLMClient()))
+    assert [s["id"] for s in result["sources"]] == ["c0", "c1"]
@@ -0,0 +1,62 @@
+from app.knowledge.bm25 import BM25Index
+from app.knowledge.embedding_cache import CachedEmbedder, EmbeddingCache
+from app.knowledge.embeddings import HashingEmbedder
+from app.knowledge.ingest import Document, ingest_documents
+from app.knowledge.retriever import hybrid_retrieve, rrf_fuse, sparse_retrieve
+from app.knowledge.vectorstore import NumpyVectorStore
+
+DOCS = [
+    Document("asd", "孤独症谱系障碍的早期筛查一般在18个月到24个月进行。"),
+    Document("abc", "ABA 应用行为分析是常见的干预方法，需要家长长期配合。"),
+    Document("vol", "志愿者报名需要填写技能标签，并通过平台审核。"),
+    Document("sleep", "孩子睡眠不规律时，可以固定作息并减少睡前屏幕时间。"),
+]
+
+
+def _store():
+    store = NumpyVectorStore()
+    embedder = CachedEmbedder(HashingEmbedder(dim=64), EmbeddingCache())
+    ingest_documents(DOCS, store=store, embedder=embedder)
+    return store, embedder
+
+
+def test_bm25_ranks_keyword_matches_and_handles_removal():
+    index = BM25Index()
+    for doc in DOCS:
+        index.add(doc.doc_id, doc.text)
+    assert index.search("ABA 干预", top_k=2)[0][0] == "abc"
+    assert index.search("志愿者审核", top_k=1)[0][0] == "vol"
+    assert index.search("xyz", top_k=3) == []
+
+    assert index.remove("vol")
+    assert all(doc_id != "vol" for doc_id, _ in index.search("志愿者审核", top_k=5))
+    index.add("abc", "睡眠")  # 覆盖旧内容
+    assert index.compact() == 2
+    assert len(index) == 3
+    assert index.search("睡眠", top_k=1)[0][0] in ("abc", "sleep")
+    assert index.search("ABA", top_k=1) == []
+
+
+def test_rrf_fuse_rewards_agreement():
+    a = [{"id": "x"}, {"id": "y"}, {"id": "z"}]
+    b = [{"id": "y"}, {"id": "w"}]
+    fused = rrf_fuse([a, b], top_k=3, k=60)
+    assert [d["id"] for d in fused] == ["y", "x", "w"]
+    assert fused[0]["score"] == 1 / 62 + 1 / 61
+
+
+def test_sparse_index_follows_store_changes():
+    store, embedder = _store()
+    assert sparse_retrieve("早期筛查", top_k=1, store=store)[0]["metadata"]["doc_id"] == "asd"
+
+    [chunk_id] = [doc_id for doc_id, meta in store.items() if meta["doc_id"] == "asd"]
+    store.delete([chunk_id])
+    assert all(h["metadata"]["doc_id"] != "asd" for h in sparse_retrieve("早期筛查", top_k=5, store=store))
+
+
+def test_hybrid_retrieve_returns_fused_chunks_with_text():
+    store, embedder = _store()
+    hits = hybrid_retrieve("志愿者 报名 技能", top_k=2, store=store, embedder=embedder)
+    assert hits[0]["metadata"]["doc_id"] == "vol"
+    assert hits[0]["text"].startswith("志愿者报名")
+    assert len(hits) == 2
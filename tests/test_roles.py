@@ -0,0 +1,78 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.db.session import SessionLocal
+from app.main import app
+from app.models.user import ROLE_BITS, User, normalize_roles, roles_to_mask
+from app.services.auth import require_roles
+
+client = TestClient(app)
+
+
+def test_normalize_legacy_roles():
+    assert normalize_roles(["family"]) == ["family"]
+    assert normalize_roles('["family", "expert"]') == ["family", "expert"]
+    assert normalize_roles('"[\\"family\\"]"') == ["family"]  # 二次编码
+    assert normalize_roles("['volunteer']") == ["volunteer"]  # str(list)
+    assert normalize_roles(None) == []
+
+
+def test_malformed_legacy_roles_mean_no_roles():
+    assert normalize_roles("not a list") == []
+    assert normalize_roles("['family'") == []
+    assert normalize_roles("5") == []
+
+    @require_roles(["family"])
+    async def endpoint(current_user=None):
+        return "ok"
+
+    # 未回填 roles_mask 的历史用户，roles 无法解析时应得到 403 而不是 500
+    legacy = User(username="l", password_hash="x")
+    legacy.__dict__["roles"] = "['family'"
+    legacy.__dict__["roles_mask"] = None
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(endpoint(current_user=legacy))
+    assert exc.value.status_code == 403
+
+
+def test_roles_mask_mirrors_roles():
+    user = User(username="m", password_hash="x", roles=["family", "expert"])
+    assert user.roles_mask == ROLE_BITS["family"] | ROLE_BITS["expert"]
+    user.roles = ["admin"]
+    assert user.roles_mask == ROLE_BITS["admin"]
+
+
+def test_require_roles_bitmask():
+    @require_roles(["expert", "admin"])
+    async def endpoint(current_user=None):
+        return "ok"
+
+    expert = User(username="e", password_hash="x", roles=["expert"])
+    family = User(username="f", password_hash="x", roles=["family"])
+    assert asyncio.run(endpoint(current_user=expert)) == "ok"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(endpoint(current_user=family))
+    assert exc.value.status_code == 403
+
+
+def test_register_stores_native_roles_and_filters_in_sql():
+    username = f"roles_{uuid.uuid4().hex[:8]}"
+    r = client.post("/api/auth/register", json={"username": username, "password": "pw", "roles": ["family"]})
+    assert r.status_code == 200, r.text
+    assert r.json()["roles"] == ["family"]
+
+    db = SessionLocal()
+    try:
+        user = db.execute(select(User).where(User.username == username)).scalar_one()
+        assert user.roles == ["family"]
+        assert user.roles_mask == roles_to_mask(["family"])
+        family_ids = db.execute(select(User.id).where(User.has_any_role(["family"]))).scalars().all()
+        expert_ids = db.execute(select(User.id).where(User.has_any_role(["expert"]))).scalars().all()
+    finally:
+        db.close()
+    assert user.id in family_ids and user.id not in expert_ids
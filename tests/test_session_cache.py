@@ -0,0 +1,147 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.main import app
+from app.models.user import Session as SessionModel, User
+from app.services.session_cache import SessionCache, SessionCacheSync, session_cache
+from app.services.user_service import update_user
+
+client = TestClient(app)
+
+
+def _create_user_with_session(expire_minutes=60):
+    db = SessionLocal()
+    try:
+        user_id = uuid.uuid4().int % 10**12
+        user = User(
+            id=user_id,
+            username=f"cache_{uuid.uuid4().hex[:8]}",
+            password_hash="x",
+            roles=["family"],
+        )
+        session_id = uuid.uuid4().hex
+        db.add(user)
+        db.add(SessionModel(
+            session_id=session_id,
+            user_id=user_id,
+            expired_at=datetime.now(timezone.utc) + timedelta(minutes=expire_minutes),
+        ))
+        db.commit()
+        return user_id, session_id
+    finally:
+        db.close()
+
+
+def test_cache_lru_eviction_and_ttl():
+    cache = SessionCache(maxsize=2, ttl_seconds=60)
+    users = [User(id=i, username=f"u{i}", password_hash="x", roles=[]) for i in range(3)]
+    cache.set("a", users[0])
+    cache.set("b", users[1])
+    assert cache.get("a").username == "u0"  # a 变为最近使用
+    cache.set("c", users[2])  # 淘汰 b
+    assert cache.get("b") is None
+    assert cache.get("c").id == 2
+    assert cache.stats()["evictions"] == 1
+
+    # session 过期时间早于 TTL 时以 session 为准
+    cache.set("d", users[0], datetime.now(timezone.utc) - timedelta(seconds=1))
+    assert cache.get("d") is None
+
+
+def test_cache_invalidate_user():
+    cache = SessionCache(maxsize=10, ttl_seconds=60)
+    user = User(id=7, username="u7", password_hash="x", roles=[])
+    cache.set("s1", user)
+    cache.set("s2", user)
+    cache.invalidate_user(7)
+    assert cache.get("s1") is None and cache.get("s2") is None
+
+
+def test_me_served_from_cache_and_invalidated():
+    user_id, session_id = _create_user_with_session()
+    headers = {"X-Session-ID": session_id}
+    session_cache.clear()
+    hits = session_cache.hits
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+    r = client.get("/api/auth/me", headers=headers)
+    assert r.status_code == 200
+    assert session_cache.hits == hits + 1
+
+    # update_user 后缓存失效，读取到新值
+    async def rename():
+        async with AsyncSessionLocal() as db:
+            await update_user(db, await db.get(User, user_id), {"nickname": "renamed"})
+
+    asyncio.run(rename())
+    assert client.get("/api/auth/me", headers=headers).json()["nickname"] == "renamed"
+
+    # 登出后缓存条目被清除
+    client.post("/api/auth/logout", headers={"x-session-id": session_id})
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+
+def test_other_worker_drops_entries_after_logout_and_profile_change():
+    user_id, session_id = _create_user_with_session()
+    _, other_sid = _create_user_with_session()
+    # 另一个 worker：独立的缓存与同步任务
+    other_cache = SessionCache(maxsize=10, ttl_seconds=60)
+    sync = SessionCacheSync(other_cache)
+    sync.sync()
+    db = SessionLocal()
+    try:
+        other_cache.set(session_id, db.get(User, user_id))
+        other_cache.set(other_sid, db.get(User, user_id))
+    finally:
+        db.close()
+
+    # 本 worker 修改资料：另一个 worker 同步后该用户的全部条目失效
+    async def rename():
+        async with AsyncSessionLocal() as db:
+            await update_user(db, await db.get(User, user_id), {"nickname": "renamed"})
+
+    asyncio.run(rename())
+    assert other_cache.get(session_id) is not None
+    assert sync.sync() == 1
+    assert other_cache.get(session_id) is None and other_cache.get(other_sid) is None
+
+    # 本 worker 登出：另一个 worker 同步后不再放行该 session
+    db = SessionLocal()
+    try:
+        other_cache.set(session_id, db.get(User, user_id))
+    finally:
+        db.close()
+    client.post("/api/auth/logout", headers={"x-session-id": session_id})
+    assert sync.sync() == 1
+    assert other_cache.get(session_id) is None
+
+
+def test_sync_gap_longer_than_ttl_clears_cache():
+    cache = SessionCache(maxsize=10, ttl_seconds=60)
+    sync = SessionCacheSync(cache)
+    sync.sync()
+    cache.set("s1", User(id=7, username="u7", password_hash="x", roles=[]))
+    # 中断超过 TTL 期间的记录可能已被清理，只能整体清空
+    sync.last_synced -= 120
+    sync.sync()
+    assert cache.get("s1") is None and sync.resets == 1
+
+
+def test_session_lookup_rejects_expired_and_orphaned():
+    session_cache.clear()
+    _, expired_sid = _create_user_with_session(expire_minutes=-1)
+    assert client.get("/api/auth/me", headers={"X-Session-ID": expired_sid}).status_code == 401
+
+    db = SessionLocal()
+    try:
+        orphan_sid = uuid.uuid4().hex
+        db.add(SessionModel(session_id=orphan_sid, user_id=-1))
+        db.commit()
+    finally:
+        db.close()
+    r = client.get("/api/auth/me", headers={"X-Session-ID": orphan_sid})
+    assert r.status_code == 401
+    assert "关联用户不存在" in r.json()["detail"]
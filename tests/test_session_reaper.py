@@ -0,0 +1,62 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.db.session import SessionLocal
+from app.models.user import Session as SessionModel, SessionRevocation
+from app.services.session_reaper import SessionReaper
+
+
+def _count(user_id):
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(SessionModel).where(SessionModel.user_id == user_id))
+    finally:
+        db.close()
+
+
+def test_reaper_purges_expired_in_batches():
+    user_id = uuid.uuid4().int % 10**12
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        for i in range(7):
+            db.add(SessionModel(session_id=uuid.uuid4().hex, user_id=user_id, expired_at=now - timedelta(minutes=i + 1)))
+        for i in range(2):
+            db.add(SessionModel(session_id=uuid.uuid4().hex, user_id=user_id, expired_at=now + timedelta(minutes=i + 1)))
+        db.commit()
+    finally:
+        db.close()
+
+    reaper = SessionReaper(batch_size=3)
+    purged = reaper.purge_expired(now)
+    assert purged >= 7
+    assert _count(user_id) == 2
+    stats = reaper.stats()
+    assert stats["cycles"] == 1 and stats["last_purged"] == purged
+    assert reaper.purge_expired(now) == 0
+
+
+def test_reaper_purges_old_session_revocations():
+    user_id = uuid.uuid4().int % 10**12
+    now = datetime.now(timezone.utc)
+    naive_now = now.replace(tzinfo=None)
+    reaper = SessionReaper()
+    db = SessionLocal()
+    try:
+        old = naive_now - timedelta(seconds=reaper.revocation_retention_seconds + 1)
+        db.add(SessionRevocation(user_id=user_id, created_at=old))
+        db.add(SessionRevocation(user_id=user_id, created_at=naive_now))
+        db.commit()
+    finally:
+        db.close()
+
+    reaper.purge_expired(now)
+    db = SessionLocal()
+    try:
+        remaining = db.scalars(select(SessionRevocation.created_at).where(SessionRevocation.user_id == user_id)).all()
+    finally:
+        db.close()
+    assert remaining == [naive_now]
+    assert reaper.stats()["total_revocations_purged"] >= 1
@@ -0,0 +1,59 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_register_with_profile_and_login_app_path():
+    username = f"resp_{uuid.uuid4().hex[:8]}"
+    r = client.post("/api/auth/register", json={
+        "username": username,
+        "password": "pw",
+        "roles": ["family", "volunteer"],
+        "volunteer_info": {"full_name": "志愿者张三", "phone": "13800000000", "skills": ["陪伴", "心理疏导"]},
+    })
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert data["roles"] == ["family", "volunteer"]
+    assert data["volunteer_profile"]["skills"] == ["陪伴", "心理疏导"]
+    assert data["volunteer_profile"]["status"] == "pending"
+
+    # App 端登录返回 {user, session_id}
+    r = client.post("/api/auth/login", json={"username": username, "password": "pw"})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["user"]["username"] == username
+    me = client.get("/api/auth/me", headers={"X-Session-ID": body["session_id"]})
+    assert me.status_code == 200
+    assert me.headers["content-type"] == "application/json"
+    assert me.json()["username"] == username
+
+
+def test_login_web_path_sets_cookie():
+    username = f"resp_{uuid.uuid4().hex[:8]}"
+    client.post("/api/auth/register", json={"username": username, "password": "pw", "roles": ["family"]})
+    r = client.post("/api/auth/login", json={"username": username, "password": "pw"}, headers={"user-agent": "web"})
+    assert r.status_code == 200
+    assert r.json()["username"] == username
+    assert "session_id" in r.cookies
+
+
+def test_profile_out_tolerates_legacy_skills():
+    from app.schemas.user import ExpertProfileOut, VolunteerProfileOut
+
+    base = {"user_id": 1, "full_name": "x", "phone": "1"}
+    cases = {
+        '["绘画", "音乐"]': ["绘画", "音乐"],
+        "['绘画']": ["绘画"],
+        "绘画": ["绘画"],
+        "": [],
+        "3": ["3"],
+        "[unclosed": ["[unclosed"],
+        None: [],
+    }
+    for raw, expected in cases.items():
+        assert VolunteerProfileOut.model_validate({**base, "skills": raw}).skills == expected
+        assert ExpertProfileOut.model_validate({**base, "skills": raw}).skills == expected
@@ -0,0 +1,177 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.knowledge.vectorstore import NumpyVectorStore, create_vector_store
+
+
+def _random_unit(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def test_flat_search_matches_brute_force():
+    vecs = _random_unit(500, 32)
+    store = NumpyVectorStore(index_type="flat")
+    store.add_documents([f"d{i}" for i in range(500)], vecs, [{"n": i} for i in range(500)])
+    queries = _random_unit(4, 32, seed=1)
+
+    results = store.search_batch(queries, top_k=5)
+    expected = np.argsort(-(queries @ vecs.T), axis=1)[:, :5]
+    for hits, exp in zip(results, expected):
+        assert [h["id"] for h in hits] == [f"d{i}" for i in exp]
+        assert hits[0]["metadata"] == {"n": int(exp[0])}
+        assert hits[0]["score"] >= hits[-1]["score"]
+
+
+def test_upsert_overwrites_by_id_and_checks_dim():
+    store = NumpyVectorStore()
+    store.add_documents(["a", "b"], np.eye(2, dtype=np.float32))
+    store.add_documents(["a"], [[0.0, 1.0]], [{"v": 2}])
+    assert len(store) == 2
+    hits = store.search([0.0, 1.0], top_k=2)
+    assert {h["id"] for h in hits} == {"a", "b"}
+    assert hits[0]["score"] == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        store.add_documents(["c"], [[1.0, 0.0, 0.0]])
+
+
+def test_ivf_recall_on_clustered_data():
+    rng = np.random.default_rng(2)
+    centers = _random_unit(20, 16, seed=3)
+    vecs = centers[rng.integers(0, 20, 4000)] + 0.05 * rng.standard_normal((4000, 16)).astype(np.float32)
+    store = NumpyVectorStore(index_type="auto", ivf_threshold=1000, nlist=20, nprobe=4)
+    store.add_documents([str(i) for i in range(4000)], vecs)
+    flat = NumpyVectorStore(index_type="flat")
+    flat.add_documents([str(i) for i in range(4000)], vecs)
+
+    queries = vecs[:20]
+    ivf_hits = store.search_batch(queries, top_k=10)
+    flat_hits = flat.search_batch(queries, top_k=10)
+    assert store._centroids is not None
+    recall = np.mean([
+        len({h["id"] for h in a} & {h["id"] for h in b}) / 10 for a, b in zip(ivf_hits, flat_hits)
+    ])
+    assert recall >= 0.9
+
+
+def test_persist_and_load_roundtrip(tmp_path):
+    vecs = _random_unit(50, 8)
+    store = NumpyVectorStore()
+    store.add_documents([f"d{i}" for i in range(50)], vecs, [{"n": i} for i in range(50)])
+    store.persist(str(tmp_path))
+
+    loaded = NumpyVectorStore.load(str(tmp_path))
+    assert isinstance(loaded._vectors, np.memmap)
+    assert len(loaded) == 50
+    assert loaded.search(vecs[7], top_k=1)[0]["id"] == "d7"
+    assert loaded.search(vecs[7], top_k=1)[0]["metadata"] == {"n": 7}
+
+    # 只读映射在第一次写入时复制到内存，磁盘上的索引不受影响
+    loaded.add_documents(["d7"], vecs[8:9])
+    loaded.add_documents(["new"], vecs[9:10])
+    assert len(loaded) == 51
+    assert len(NumpyVectorStore.load(str(tmp_path))) == 50
+
+
+def test_persist_keeps_ivf_index(tmp_path):
+    vecs = _random_unit(300, 8)
+    store = NumpyVectorStore(index_type="ivf", nlist=8, nprobe=8)
+    store.add_documents([str(i) for i in range(300)], vecs)
+    expected = [h["id"] for h in store.search(vecs[0], top_k=5)]
+    store.persist(str(tmp_path))
+
+    loaded = NumpyVectorStore.load(str(tmp_path))
+    assert loaded._centroids is not None
+    assert [h["id"] for h in loaded.search(vecs[0], top_k=5)] == expected
+
+
+def test_factory_uses_settings_and_rejects_unknown_backend():
+    assert isinstance(create_vector_store(), NumpyVectorStore)
+    with pytest.raises(ValueError):
+        create_vector_store("chroma")
+
+
+def test_delete_tombstones_then_compact():
+    vecs = _random_unit(10, 4)
+    store = NumpyVectorStore()
+    store.add_documents([f"d{i}" for i in range(10)], vecs, [{"n": i} for i in range(10)])
+    assert store.delete(["d3", "d3", "missing"]) == 1
+    assert "d3" not in store and len(store) == 9
+    assert "d3" not in {h["id"] for h in store.search(vecs[3], top_k=10)}
+
+    assert store.compact() == 1
+    assert store.stats()["rows"] == 9
+    assert store.search(vecs[5], top_k=1)[0]["metadata"] == {"n": 5}
+
+
+def test_chunk_texts_stored_outside_meta(tmp_path):
+    vecs = _random_unit(20, 4)
+    store = NumpyVectorStore()
+    store.add_documents([f"d{i}" for i in range(20)], vecs, [{"n": i} for i in range(20)], [f"正文 {i}" for i in range(20)])
+    store.delete(["d3"])
+    store.persist(str(tmp_path))
+
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    assert "正文" not in json.dumps(meta, ensure_ascii=False)
+
+    loaded = NumpyVectorStore.load(str(tmp_path))
+    # 加载时不解码文本，命中时才按偏移读取
+    assert all(isinstance(t, int) for t in loaded._texts)
+    hit = loaded.search(vecs[7], top_k=1)[0]
+    assert hit["text"] == "正文 7" and hit["metadata"] == {"n": 7}
+    assert loaded.get_texts(["d19", "d3"]) == ["正文 19", ""]
+
+    # 再次持久化直接拷贝已落盘的文本
+    loaded.add_documents(["new"], vecs[3:4], texts=["新增"])
+    loaded.persist(str(tmp_path / "again"))
+    again = NumpyVectorStore.load(str(tmp_path / "again"))
+    assert again.get_texts(["d0", "new"]) == ["正文 0", "新增"]
+
+
+def test_load_legacy_format_with_text_in_metadata(tmp_path):
+    store = NumpyVectorStore()
+    store.add_documents(["a", "b"], np.eye(2, dtype=np.float32))
+    store.persist(str(tmp_path))
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    meta["format_version"] = 1
+    meta["metadatas"] = [{"text": "甲"}, {"text": "乙"}]
+    (tmp_path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    loaded = NumpyVectorStore.load(str(tmp_path))
+    hit = loaded.search([0.0, 1.0], top_k=1)[0]
+    assert hit["text"] == "乙" and hit["metadata"] == {}
+
+
+def test_load_during_persist_sees_a_consistent_generation(tmp_path, monkeypatch):
+    vecs = _random_unit(30, 8)
+    store = NumpyVectorStore()
+    store.add_documents([f"d{i}" for i in range(30)], vecs, texts=[f"t{i}" for i in range(30)])
+    store.persist(str(tmp_path))
+
+    # 删除后 compact 会让行号整体前移
+    store.delete([f"d{i}" for i in range(10)])
+    seen = {}
+    write_texts = NumpyVectorStore._write_texts
+
+    def load_midway(self, path, n):
+        # 新代的向量已写出、meta.json 尚未替换时加载
+        loaded = NumpyVectorStore.load(str(tmp_path))
+        hit = loaded.search(vecs[15], top_k=1)[0]
+        seen["midway"] = (len(loaded), hit["id"], hit["text"])
+        write_texts(self, path, n)
+
+    monkeypatch.setattr(NumpyVectorStore, "_write_texts", load_midway)
+    store.persist(str(tmp_path))
+    assert seen["midway"] == (30, "d15", "t15")
+
+    monkeypatch.undo()
+    loaded = NumpyVectorStore.load(str(tmp_path))
+    hit = loaded.search(vecs[15], top_k=1)[0]
+    assert (len(loaded), hit["id"], hit["text"]) == (20, "d15", "t15")
+
+    # 只保留当前代与上一代
+    store.persist(str(tmp_path))
+    assert len([p for p in tmp_path.iterdir() if p.name.startswith("gen-")]) == 2